@@ -26,13 +26,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'app.core',
     'app.accounts',
     'app.posts',
     'app.notifications',
     'app.dashboard',
     'app.stores',
     'app.shelters',
-    
+    'app.jobs',
 ]
 
 MIDDLEWARE = [
@@ -84,6 +85,27 @@ else:
         }
     }
 
+# Cache
+# Local memory by default; point CACHE_BACKEND / CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production so
+# every worker shares one fragment cache.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "adoptme"),
+    }
+}
+
+# Rendered post cards / product tiles (app/posts/fragments.py)
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Background jobs (app/jobs): most jobs of each queue running at once,
+# across all `manage.py run_jobs` workers
+JOB_QUEUE_CONCURRENCY = {
+    'default': 4,
+    'images': 2,   # AVIF encoding is CPU heavy
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -103,9 +125,42 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Generated static files are written to STATIC_BUILD_DIR, where collectstatic
+# picks them up: the site CSS compiled from the templates' utility classes
+# (app/core/stylesheet.py) and the AVIF/WebP variants of static/img
+# (app/core/static_images.py).
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'app.core.stylesheet.CompiledCssFinder',
+    'app.core.static_images.StaticImageFinder',
+]
+STATIC_BUILD_DIR = BASE_DIR / "build" / "static"
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media is served by app.core.media.serve_media (access checks for
+# verification documents, Range/ETag). In production set MEDIA_ACCEL to
+# "nginx" (X-Accel-Redirect to MEDIA_ACCEL_PREFIX, an `internal` location
+# with `alias` MEDIA_ROOT) or "sendfile" (X-Sendfile) so the proxy sends
+# the bytes instead of a worker.
+MEDIA_ACCEL = os.getenv("MEDIA_ACCEL", "")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", 60 * 60 * 24))
+
+# Uploads are stored once per distinct content (app/core/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'app.core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Chunked, resumable uploads (app/core/uploads.py)
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", 20 * 1024 * 1024))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRY = int(os.getenv("CHUNKED_UPLOAD_EXPIRY", 60 * 60 * 24))
+CHUNKED_UPLOAD_MAX_ACTIVE = int(os.getenv("CHUNKED_UPLOAD_MAX_ACTIVE", 5))  # per user
+
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
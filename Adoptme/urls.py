@@ -17,8 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from app.posts import views
+from app.core.media import serve_media
+from app.core.uploads import chunked_upload, start_chunked_upload
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,6 +31,7 @@ urlpatterns = [
     path('stores/', include('app.stores.urls')),
     path('shelters/', include('app.shelters.urls')),
     path('dashboard/', include('app.dashboard.urls')),
+    path('uploads/', start_chunked_upload, name='start_chunked_upload'),
+    path('uploads/<uuid:upload_id>/', chunked_upload, name='chunked_upload'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
 ]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    login_page and register_page look users up by email, but auth.User has
+    no index on it. auth.User is not ours to add Meta.indexes to, so create
+    the index directly.
+    """
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS auth_user_email_idx ON auth_user (email)",
+            "DROP INDEX IF EXISTS auth_user_email_idx",
+        ),
+    ]
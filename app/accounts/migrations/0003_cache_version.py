@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auth_user_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -8,6 +8,11 @@ class Profile(models.Model):
     city = models.CharField(max_length=100)
     score = models.IntegerField(default=100, verbose_name="User Score")
     image = models.ImageField(default='default.jpg', upload_to='profile_pics', verbose_name="Profile Image")
+    # cleaned and resized on upload, size and placeholder in image_meta
+    # (see app/posts/images.py)
+    image_fields = ('image',)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
+    cache_version = models.BigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.user.username
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from .models import Profile
 from app.posts.models import Post
+from app.posts.viewer import viewer_state
 from .forms import UserUpdateForm, ProfileUpdateForm
 import re
 
@@ -124,12 +125,13 @@ def profile_page(request):
         }
     
     )
-    user_posts = Post.objects.filter(author=user).order_by('-created_at')
+    user_posts = Post.objects.for_listing().filter(author=user).order_by('-created_at')
 
     context = {
         'profile_user': user,
         'profile': profile,
         'posts': user_posts,
+        **viewer_state(request.user, user_posts),
     }
 
     return render(request, 'accounts/profile_page.html', context)
@@ -182,21 +184,23 @@ def user_profile_page(request, username):
         }
     )
 
-    user_posts = Post.objects.filter(author=user_obj).order_by('-created_at')
+    user_posts = Post.objects.for_listing().filter(author=user_obj).order_by('-created_at')
 
     context = {
         'profile_user': user_obj,
         'profile': profile,
         'posts': user_posts,
+        **viewer_state(request.user, user_posts),
     }
     return render(request, 'accounts/user_profile_page.html', context)
 
 
 @login_required
 def my_bookmarks_page(request):
-    bookmarked_posts = request.user.bookmarked_posts.all().order_by('-created_at')
+    bookmarked_posts = Post.objects.for_listing().filter(bookmarks=request.user).order_by('-created_at')
     
     context = {
-        'posts': bookmarked_posts
+        'posts': bookmarked_posts,
+        **viewer_state(request.user, bookmarked_posts),
     }
     return render(request, 'accounts/my_bookmarks_page.html', context)
\ No newline at end of file
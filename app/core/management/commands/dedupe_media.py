@@ -0,0 +1,69 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.storage import BLOB_DIR, ContentAddressedStorage, file_digest
+
+STALE_TMP_SECONDS = 24 * 60 * 60
+
+
+class Command(BaseCommand):
+    help = ("Store existing media files once per distinct content (as hard links to "
+            "content-addressed blobs) and remove blobs no file uses any more.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report what would be shared and removed.",
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("The default storage is not ContentAddressedStorage.")
+        dry_run = options['dry_run']
+        root = storage.location
+        blob_root = os.path.join(root, BLOB_DIR)
+
+        linked = saved = 0
+        for directory, dirs, files in os.walk(root):
+            if directory == root and BLOB_DIR in dirs:
+                dirs.remove(BLOB_DIR)
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if os.path.islink(path):
+                    continue
+                blob = storage.path(storage.blob_name(file_digest(path)))
+                if os.path.exists(blob):
+                    if os.path.samefile(blob, path):
+                        continue
+                    # same content stored twice: make this name share the blob
+                    linked += 1
+                    saved += os.path.getsize(path)
+                    if not dry_run:
+                        tmp = f'{path}.dedupe'
+                        os.link(blob, tmp)
+                        os.replace(tmp, path)
+                elif not dry_run:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.link(path, blob)
+
+        orphans = 0
+        now = time.time()
+        for directory, dirs, files in os.walk(blob_root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                in_tmp = os.path.basename(directory) == 'tmp'
+                if (stat.st_nlink == 1 and not in_tmp) or (in_tmp and now - stat.st_mtime > STALE_TMP_SECONDS):
+                    orphans += 1
+                    if not dry_run:
+                        os.remove(path)
+
+        verb = "Would share" if dry_run else "Shared"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {linked} duplicate file(s) ({saved / 1024:.0f} KB), "
+            f"{'would remove' if dry_run else 'removed'} {orphans} unused blob(s)."
+        ))
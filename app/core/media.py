@@ -0,0 +1,170 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from app.shelters.models import ShelterProfile
+from app.stores.models import Store
+
+from .storage import BLOB_DIR
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+
+# ----------------------------------------
+# MEDIA SERVING (/media/<path>)
+# ----------------------------------------
+# Replaces django.conf.urls.static, which serves everything to everyone
+# (verification documents included) and only in DEBUG. Every request is
+# checked against PRIVATE_MEDIA first. Files are then either
+#   * handed to the front proxy (settings.MEDIA_ACCEL): "nginx" answers with
+#     X-Accel-Redirect to MEDIA_ACCEL_PREFIX (an `internal` location aliased
+#     to MEDIA_ROOT), "sendfile" with X-Sendfile (Apache mod_xsendfile,
+#     lighttpd), so no worker streams the bytes, or
+#   * streamed here, with single byte ranges (206, If-Range) for media
+#     players and resumed downloads.
+# ETag/Last-Modified come from the file's inode, size and mtime, so revisits
+# revalidate with a 304 instead of downloading the file again.
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _own_store_document(user, name):
+    return Store.objects.filter(verification_document=name, owner=user).exists()
+
+
+def _own_shelter_document(user, name):
+    return ShelterProfile.objects.filter(verification_document=name, user=user).exists()
+
+
+# upload_to prefix -> may `user` (signed in, not a superuser) read file `name`?
+PRIVATE_MEDIA = {
+    'store_verification_docs/': _own_store_document,
+    'shelter_verification_docs/': _own_shelter_document,
+}
+
+
+def is_private(name):
+    return name.startswith(tuple(PRIVATE_MEDIA))
+
+
+def can_read(user, name):
+    if name == BLOB_DIR or name.startswith(BLOB_DIR + '/'):
+        return False  # content-addressed blobs are only reachable by their names
+    for prefix, check in PRIVATE_MEDIA.items():
+        if name.startswith(prefix):
+            return user.is_authenticated and (user.is_superuser or check(user, name))
+    return True
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, inclusive; None to ignore the
+    header and send the whole file (also for multiple ranges); False if the
+    range cannot be satisfied.
+    """
+    match = RANGE.match(header.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        suffix = int(match[2])  # "bytes=-500": the last 500 bytes
+        return (max(0, size - suffix), size - 1) if suffix and size else False
+    start = int(match[1])
+    if match[2] and int(match[2]) < start:
+        return None
+    if start >= size:
+        return False
+    end = int(match[2]) if match[2] else size - 1
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_response(request, path, name, st, etag, last_modified):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    accel = settings.MEDIA_ACCEL
+    if accel == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name)
+        return response
+    if accel == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    size = st.st_size
+    header = request.headers.get('Range')
+    span = byte_range(header, size) if header and _range_applies(request, etag, last_modified) else None
+    if span is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if span is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = span
+    response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206,
+                                     content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    if name.startswith('..') or not can_read(request.user, name):
+        raise Http404("No such file.")  # private files look missing to others
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("No such file.")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("No such file.")
+
+    etag = f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+    last_modified = int(st.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, name, st, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if is_private(name):
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
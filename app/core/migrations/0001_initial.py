@@ -0,0 +1,39 @@
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0012_chunked_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # ChunkedUpload moved here from the posts app; its table stays as it is
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ChunkedUpload',
+                    fields=[
+                        ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                        ('filename', models.CharField(max_length=255)),
+                        ('size', models.BigIntegerField()),
+                        ('sha256', models.CharField(max_length=64)),
+                        ('offset', models.BigIntegerField(default=0)),
+                        ('complete', models.BooleanField(default=False)),
+                        ('created_at', models.DateTimeField(auto_now_add=True)),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'posts_chunkedupload',
+                        'indexes': [models.Index(fields=['created_at'], name='chunked_upload_created_idx')],
+                    },
+                ),
+            ],
+        ),
+    ]
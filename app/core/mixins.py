@@ -0,0 +1,45 @@
+from django.http import HttpResponseForbidden
+
+
+# ----------------------------------------
+# ONE OBJECT PER REQUEST (class-based views)
+# ----------------------------------------
+# Detail/update views used to call self.get_object() in dispatch (for the
+# ownership check), again in get()/post() and once more in
+# get_context_data/get_success_url: the same row fetched two or three
+# times per request, plus a query for its owner. RequestObjectMixin
+# resolves the object once per view instance (= per request), with
+# `related_fields` joined in, and hands the same instance to every caller.
+#
+# With `owner_field` set, dispatch answers 403 to anyone but the owner
+# before the handler runs, so a refused POST never reaches the form.
+# List it after LoginRequiredMixin, so anonymous users are redirected first.
+class RequestObjectMixin:
+    related_fields = ()     # select_related() on the object's queryset
+    owner_field = None      # FK to the user who may use the view
+    owner_denied_message = "You do not have permission to access this page."
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.related_fields:
+            queryset = queryset.select_related(*self.related_fields)
+        return queryset
+
+    def lookup_object(self, queryset=None):
+        """Fetch the object; override instead of get_object() to change the lookup."""
+        return super().get_object(queryset)
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return self.lookup_object(queryset)
+        if getattr(self, '_request_object', None) is None:
+            self._request_object = self.lookup_object()
+        return self._request_object
+
+    def is_owner(self, obj, user):
+        return getattr(obj, f'{self.owner_field}_id') == user.pk
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.owner_field is not None and not self.is_owner(self.get_object(), request.user):
+            return HttpResponseForbidden(self.owner_denied_message)
+        return super().dispatch(request, *args, **kwargs)
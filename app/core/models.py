@@ -0,0 +1,27 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import models
+
+
+# ================================
+# CHUNKED UPLOADS (see app/core/uploads.py)
+# ================================
+class ChunkedUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()                  # announced by the client
+    sha256 = models.CharField(max_length=64)         # of the whole file, hex
+    offset = models.BigIntegerField(default=0)       # bytes received so far
+    complete = models.BooleanField(default=False)    # all there and checksum matched
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'posts_chunkedupload'  # created by the posts app, which had it first
+        indexes = [
+            models.Index(fields=['created_at'], name='chunked_upload_created_idx'),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f'{self.filename} ({self.offset}/{self.size})'
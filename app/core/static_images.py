@@ -0,0 +1,169 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import FileSystemStorage
+from django.templatetags.static import static
+from PIL import Image
+
+from app.posts.images import RENDITION_FORMATS, rendition_name
+
+from .storage import file_digest
+from .stylesheet import CompiledCssFinder, build_dir
+
+
+# ----------------------------------------
+# STATIC ART (static/img -> AVIF/WebP variants)
+# ----------------------------------------
+# The welcome page draws full-width PNG/WebP art (branches, bars, the shop)
+# that ships at 3840px and up to 390 KB each, to phones included. The same
+# treatment as uploads (app/posts/images.py), done at build time instead of
+# upload time: for every image under STATIC_IMAGE_DIRS, StaticImageFinder
+# writes a copy at each STATIC_WIDTHS (never wider than the original) in
+# every RENDITION_FORMATS to STATIC_BUILD_DIR, and `collectstatic` ships
+# them with the rest. Under runserver a variant is built on its first request.
+#
+# Variants are named after the source's content hash, e.g.
+# renditions/img/Shop.1f2e3d4c/640.avif, so a changed image gets new URLs.
+# {% static_picture %} (app/posts/templatetags/images.py) offers them in a
+# <picture> and gives the <img> the original's width/height, so the browser
+# reserves the space before the file arrives.
+STATIC_IMAGE_DIRS = ('img/',)
+STATIC_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+STATIC_WIDTHS = (640, 1280, 1920, 2560)
+
+
+class StaticImage(NamedTuple):
+    path: str      # static path, e.g. "img/Shop.png"
+    source: str    # file it was found at
+    width: int
+    height: int
+    digest: str
+
+    @property
+    def widths(self):
+        return [w for w in STATIC_WIDTHS if w < self.width] + [min(self.width, STATIC_WIDTHS[-1])]
+
+    def variant(self, width, fmt):
+        stem, ext = os.path.splitext(self.path)
+        return rendition_name(f'{stem}.{self.digest[:8]}{ext}', width, fmt)
+
+    def variants(self):
+        return [(self.variant(w, fmt), w, fmt) for w in self.widths for fmt in RENDITION_FORMATS]
+
+
+def is_static_image(path):
+    return path.startswith(STATIC_IMAGE_DIRS) and path.lower().endswith(STATIC_IMAGE_EXTENSIONS)
+
+
+_images = {}
+
+
+def static_image(path):
+    """The StaticImage for static `path`, or None if it is not a processed image."""
+    if not is_static_image(path):
+        return None
+    source = finders.find(path)
+    if source is None and staticfiles_storage.exists(path):
+        source = staticfiles_storage.path(path)  # only collected, e.g. a slim deploy
+    if source is None:
+        return None
+    try:
+        mtime = os.stat(source).st_mtime_ns
+    except OSError:
+        return None
+    cached = _images.get(path)
+    if cached is not None and cached[0] == (source, mtime):
+        return cached[1]
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError):
+        return None
+    image = StaticImage(path, source, width, height, file_digest(source))
+    _images[path] = ((source, mtime), image)
+    return image
+
+
+def static_srcset(image, fmt):
+    return ', '.join(f'{static(image.variant(w, fmt))} {w}w' for w in image.widths)
+
+
+def build_variant(image, width, fmt):
+    """Write one variant of `image` to the build directory (once) and return its path."""
+    target = build_dir() / image.variant(width, fmt)
+    if target.exists():
+        return target
+    with Image.open(image.source) as source:
+        source.load()
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands() or 'transparency' in source.info
+                                    else 'RGB')
+        if source.width > width:
+            source = source.resize((width, max(1, round(source.height * width / source.width))), Image.LANCZOS)
+        out = BytesIO()
+        source.save(out, format=fmt.upper(), **RENDITION_FORMATS[fmt])
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(out.getvalue())
+    os.replace(tmp, target)
+    return target
+
+
+def source_images(ignore_patterns=None):
+    """Every processed image the other static finders know about."""
+    seen = set()
+    for finder in finders.get_finders():
+        if isinstance(finder, (StaticImageFinder, CompiledCssFinder)):
+            continue
+        try:
+            listing = list(finder.list(ignore_patterns or []))
+        except NotImplementedError:
+            continue
+        for path, _ in listing:
+            path = path.replace('\\', '/')
+            if path not in seen and is_static_image(path):
+                seen.add(path)
+                image = static_image(path)
+                if image is not None:
+                    yield image
+
+
+VARIANT = re.compile(r'^renditions/(?P<stem>.+)\.(?P<digest>[0-9a-f]{8})/(?P<width>\d+)\.(?P<fmt>\w+)$')
+
+
+class StaticImageFinder(BaseFinder):
+    """
+    Staticfiles finder for the variants of static/img: `collectstatic` builds
+    and copies all of them, runserver builds each one when first asked for.
+    """
+
+    def find(self, path, find_all=False, **kwargs):
+        match = VARIANT.match(path)
+        if match and match['fmt'] in RENDITION_FORMATS:
+            for ext in STATIC_IMAGE_EXTENSIONS:
+                image = static_image(f"{match['stem']}{ext}")
+                if image is not None and image.digest[:8] == match['digest']:
+                    width = int(match['width'])
+                    if width in image.widths:
+                        found = str(build_variant(image, width, match['fmt']))
+                        return [found] if find_all or kwargs.get('all') else found
+        return []
+
+    def list(self, ignore_patterns):
+        jobs = [(image, variant, width, fmt)
+                for image in source_images(ignore_patterns)
+                for variant, width, fmt in image.variants()]
+        # the encoders release the GIL: build the variants side by side
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            for _ in pool.map(lambda job: build_variant(job[0], job[2], job[3]), jobs):
+                pass
+        storage = FileSystemStorage(location=build_dir())
+        for _, variant, _, _ in jobs:
+            yield variant, storage
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+
+# ----------------------------------------
+# CONTENT-ADDRESSED MEDIA STORAGE
+# ----------------------------------------
+# Every uploaded file is stored once per distinct content, as a blob named
+# by its SHA-256 under MEDIA_ROOT/.blobs/. The name Django gives the file
+# (from `upload_to`, e.g. post_images/cat.jpg) is a hard link to that blob,
+# so the same photo uploaded as a post image and as a verification document
+# takes the disk space of one file, while every existing name, URL and
+# `.path` keeps working unchanged (static serving, web server, backups with
+# `rsync -H` / `tar` see ordinary files).
+#
+# The link count of the blob is its reference count: deleting a name drops
+# one link, and the blob goes when the last name pointing at it is deleted.
+# Files stored before this (or on filesystems without hard links) are
+# ordinary files and behave as before; `manage.py dedupe_media` converts
+# them and removes orphaned blobs.
+BLOB_DIR = '.blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_name(self, digest):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def references(self, name):
+        """How many names share the content of `name` (1 for an unshared file)."""
+        return max(1, os.stat(self.path(name)).st_nlink - 1)
+
+    def _write_temp(self, content):
+        """Copy `content` into a temporary file next to the blobs. Returns (digest, path)."""
+        tmp_dir = self.path(f'{BLOB_DIR}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in content.chunks(CHUNK_SIZE):
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                digest.update(chunk)
+                out.write(chunk)
+        # mkstemp() makes it private; the blob and its names share this mode
+        os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+        return digest.hexdigest(), tmp_path
+
+    def _link_blob(self, tmp_path, blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(tmp_path, blob_path)
+        except FileExistsError:
+            pass  # already stored: the new name shares it
+
+    def _save(self, name, content):
+        digest, tmp_path = self._write_temp(content)
+        blob_path = self.path(self.blob_name(digest))
+        try:
+            while True:
+                full_path = self.path(name)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                self._link_blob(tmp_path, blob_path)
+                try:
+                    os.link(blob_path, full_path)
+                except FileExistsError:
+                    # another upload took the name meanwhile
+                    name = self.get_available_name(name)
+                except FileNotFoundError:
+                    pass  # blob deleted meanwhile by its last delete(); store it again
+                else:
+                    break
+        except OSError:
+            # no hard links here (other filesystem, some container mounts):
+            # store a plain copy the way FileSystemStorage does
+            name = self.get_available_name(name)
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(tmp_path, full_path, allow_overwrite=False)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return str(name).replace('\\', '/')
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        full_path = self.path(name)
+        try:
+            links = os.stat(full_path).st_nlink
+        except (FileNotFoundError, IsADirectoryError):
+            return super().delete(name)
+
+        blob_path = None
+        if links == 2 and os.path.isfile(full_path):
+            # probably the last name of a blob: find the blob to drop it too
+            candidate = self.path(self.blob_name(file_digest(full_path)))
+            if os.path.exists(candidate) and os.path.samefile(candidate, full_path):
+                blob_path = candidate
+
+        super().delete(name)
+        if blob_path is not None:
+            try:
+                if os.stat(blob_path).st_nlink == 1:
+                    os.remove(blob_path)
+            except FileNotFoundError:
+                pass
+
+    def listdir(self, path):
+        directories, files = super().listdir(path)
+        if not path:
+            directories = [d for d in directories if d != BLOB_DIR]
+        return directories, files
@@ -0,0 +1,1051 @@
+import hashlib
+import os
+import re
+from fractions import Fraction
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+
+# ----------------------------------------
+# SITE STYLESHEET (build step, replaces the Tailwind CDN)
+# ----------------------------------------
+# The pages used to load cdn.tailwindcss.com, a ~400 KB script that scans the
+# page in the browser and writes the CSS on every visit, before anything is
+# painted. Instead the utility classes are compiled here, once, in Python:
+#
+#   1. every file matched by CONTENT (templates, the widget `attrs` in the
+#      apps' forms.py, template tags, static JS) is scanned for candidate
+#      class names, the way Tailwind's own extractor does,
+#   2. each candidate Tailwind (v3, darkMode "class") would understand is
+#      turned into its rule; everything else (words, Django syntax) is ignored,
+#   3. the result, preflight and THEME_COLORS included, is written as
+#      css/site.<content hash>.css.
+#
+# CompiledCssFinder (settings.STATICFILES_FINDERS) hands that file to
+# `collectstatic`, so build.sh ships it with the other static files, and to
+# runserver in development. {% stylesheet %} (templatetags/stylesheet.py)
+# links it; the hash in the name lets it be cached forever.
+#
+# Only the classes listed in the scanned files exist: a class assembled at
+# run time (e.g. "bg-" + color) must appear in full somewhere in them.
+CONTENT = (
+    'templates/**/*.html',
+    'app/*/templates/**/*.html',
+    'app/*/forms.py',
+    'app/*/templatetags/*.py',
+    'static/js/**/*.js',
+)
+OUTPUT_DIR = 'css'
+OUTPUT_PREFIX = 'site.'
+
+# tailwind.config theme.extend.colors of the old base.html
+THEME_COLORS = {
+    'background': '#f8fafc',
+    'surface': '#ffffff',
+    'border': '#e2e8f0',
+    'text': '#0f172a',
+    'accent': '#3b82f6',
+    'darkbg': '#0d1117',
+    'darksurface': '#161b22',
+    'darkborder': '#30363d',
+    'darktext': '#e6edf3',
+}
+
+SCREENS = {'sm': 640, 'md': 768, 'lg': 1024, 'xl': 1280, '2xl': 1536}
+
+
+def build_dir():
+    return Path(settings.STATIC_BUILD_DIR)
+
+
+# ----------------------------------------
+# THEME (Tailwind v3 defaults)
+# ----------------------------------------
+SHADES = (50, 100, 200, 300, 400, 500, 600, 700, 800, 900, 950)
+PALETTE = {
+    'slate': '#f8fafc #f1f5f9 #e2e8f0 #cbd5e1 #94a3b8 #64748b #475569 #334155 #1e293b #0f172a #020617',
+    'gray': '#f9fafb #f3f4f6 #e5e7eb #d1d5db #9ca3af #6b7280 #4b5563 #374151 #1f2937 #111827 #030712',
+    'red': '#fef2f2 #fee2e2 #fecaca #fca5a5 #f87171 #ef4444 #dc2626 #b91c1c #991b1b #7f1d1d #450a0a',
+    'orange': '#fff7ed #ffedd5 #fed7aa #fdba74 #fb923c #f97316 #ea580c #c2410c #9a3412 #7c2d12 #431407',
+    'amber': '#fffbeb #fef3c7 #fde68a #fcd34d #fbbf24 #f59e0b #d97706 #b45309 #92400e #78350f #451a03',
+    'yellow': '#fefce8 #fef9c3 #fef08a #fde047 #facc15 #eab308 #ca8a04 #a16207 #854d0e #713f12 #422006',
+    'green': '#f0fdf4 #dcfce7 #bbf7d0 #86efac #4ade80 #22c55e #16a34a #15803d #166534 #14532d #052e16',
+    'emerald': '#ecfdf5 #d1fae5 #a7f3d0 #6ee7b7 #34d399 #10b981 #059669 #047857 #065f46 #064e3b #022c22',
+    'teal': '#f0fdfa #ccfbf1 #99f6e4 #5eead4 #2dd4bf #14b8a6 #0d9488 #0f766e #115e59 #134e4a #042f2e',
+    'sky': '#f0f9ff #e0f2fe #bae6fd #7dd3fc #38bdf8 #0ea5e9 #0284c7 #0369a1 #075985 #0c4a6e #082f49',
+    'blue': '#eff6ff #dbeafe #bfdbfe #93c5fd #60a5fa #3b82f6 #2563eb #1d4ed8 #1e40af #1e3a8a #172554',
+    'indigo': '#eef2ff #e0e7ff #c7d2fe #a5b4fc #818cf8 #6366f1 #4f46e5 #4338ca #3730a3 #312e81 #1e1b4b',
+    'purple': '#faf5ff #f3e8ff #e9d5ff #d8b4fe #c084fc #a855f7 #9333ea #7e22ce #6b21a8 #581c87 #3b0764',
+    'pink': '#fdf2f8 #fce7f3 #fbcfe8 #f9a8d4 #f472b6 #ec4899 #db2777 #be185d #9d174d #831843 #500724',
+    'rose': '#fff1f2 #ffe4e6 #fecdd3 #fda4af #fb7185 #f43f5e #e11d48 #be123c #9f1239 #881337 #4c0519',
+}
+COLORS = {'white': '#ffffff', 'black': '#000000', **THEME_COLORS}
+for _name, _hexes in PALETTE.items():
+    COLORS.update({f'{_name}-{shade}': hex_ for shade, hex_ in zip(SHADES, _hexes.split())})
+SPECIAL_COLORS = {'transparent': 'transparent', 'current': 'currentColor', 'inherit': 'inherit'}
+
+FONT_SANS = ('ui-sans-serif, system-ui, sans-serif, "Apple Color Emoji", "Segoe UI Emoji", '
+             '"Segoe UI Symbol", "Noto Color Emoji"')
+FONT_MONO = ('ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, "Liberation Mono", '
+             '"Courier New", monospace')
+FONT_FAMILIES = {'sans': FONT_SANS, 'mono': FONT_MONO,
+                 'serif': 'ui-serif, Georgia, Cambria, "Times New Roman", Times, serif'}
+FONT_SIZES = {
+    'xs': ('0.75rem', '1rem'), 'sm': ('0.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'),
+    'lg': ('1.125rem', '1.75rem'), 'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'),
+    '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'), '5xl': ('3rem', '1'),
+    '6xl': ('3.75rem', '1'), '7xl': ('4.5rem', '1'), '8xl': ('6rem', '1'), '9xl': ('8rem', '1'),
+}
+FONT_WEIGHTS = {
+    'thin': '100', 'extralight': '200', 'light': '300', 'normal': '400', 'medium': '500',
+    'semibold': '600', 'bold': '700', 'extrabold': '800', 'black': '900',
+}
+LINE_HEIGHTS = {'none': '1', 'tight': '1.25', 'snug': '1.375', 'normal': '1.5', 'relaxed': '1.625', 'loose': '2'}
+LETTER_SPACING = {'tighter': '-0.05em', 'tight': '-0.025em', 'normal': '0em', 'wide': '0.025em',
+                  'wider': '0.05em', 'widest': '0.1em'}
+RADII = {'none': '0px', 'sm': '0.125rem', '': '0.25rem', 'md': '0.375rem', 'lg': '0.5rem', 'xl': '0.75rem',
+         '2xl': '1rem', '3xl': '1.5rem', 'full': '9999px'}
+MAX_WIDTHS = {
+    'none': 'none', 'xs': '20rem', 'sm': '24rem', 'md': '28rem', 'lg': '32rem', 'xl': '36rem',
+    '2xl': '42rem', '3xl': '48rem', '4xl': '56rem', '5xl': '64rem', '6xl': '72rem', '7xl': '80rem',
+    'full': '100%', 'min': 'min-content', 'max': 'max-content', 'fit': 'fit-content', 'prose': '65ch',
+    **{f'screen-{name}': f'{px}px' for name, px in SCREENS.items()},
+}
+SHADOWS = {
+    'sm': '0 1px 2px 0 rgb(0 0 0 / 0.05)',
+    '': '0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)',
+    'md': '0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)',
+    'lg': '0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)',
+    'xl': '0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)',
+    '2xl': '0 25px 50px -12px rgb(0 0 0 / 0.25)',
+    'inner': 'inset 0 2px 4px 0 rgb(0 0 0 / 0.05)',
+    'none': '0 0 #0000',
+}
+DROP_SHADOWS = {
+    'sm': 'drop-shadow(0 1px 1px rgb(0 0 0 / 0.05))',
+    '': 'drop-shadow(0 1px 2px rgb(0 0 0 / 0.1)) drop-shadow(0 1px 1px rgb(0 0 0 / 0.06))',
+    'md': 'drop-shadow(0 4px 3px rgb(0 0 0 / 0.07)) drop-shadow(0 2px 2px rgb(0 0 0 / 0.06))',
+    'lg': 'drop-shadow(0 10px 8px rgb(0 0 0 / 0.04)) drop-shadow(0 4px 3px rgb(0 0 0 / 0.1))',
+    'xl': 'drop-shadow(0 20px 13px rgb(0 0 0 / 0.03)) drop-shadow(0 8px 5px rgb(0 0 0 / 0.08))',
+    '2xl': 'drop-shadow(0 25px 25px rgb(0 0 0 / 0.15))',
+    'none': 'drop-shadow(0 0 #0000)',
+}
+BLURS = {'none': '0', 'sm': '4px', '': '8px', 'md': '12px', 'lg': '16px', 'xl': '24px', '2xl': '40px', '3xl': '64px'}
+EASINGS = {'linear': 'linear', 'in': 'cubic-bezier(0.4, 0, 1, 1)', 'out': 'cubic-bezier(0, 0, 0.2, 1)',
+           'in-out': 'cubic-bezier(0.4, 0, 0.2, 1)'}
+TRANSITIONS = {
+    '': ('color, background-color, border-color, text-decoration-color, fill, stroke, opacity, '
+         'box-shadow, transform, filter, backdrop-filter'),
+    'all': 'all',
+    'colors': 'color, background-color, border-color, text-decoration-color, fill, stroke',
+    'opacity': 'opacity',
+    'shadow': 'box-shadow',
+    'transform': 'transform',
+}
+GRADIENT_DIRECTIONS = {'t': 'top', 'tr': 'top right', 'r': 'right', 'br': 'bottom right', 'b': 'bottom',
+                       'bl': 'bottom left', 'l': 'left', 'tl': 'top left'}
+
+TRANSFORM = ('translate(var(--tw-translate-x), var(--tw-translate-y)) rotate(var(--tw-rotate)) '
+             'skewX(var(--tw-skew-x)) skewY(var(--tw-skew-y)) '
+             'scaleX(var(--tw-scale-x)) scaleY(var(--tw-scale-y))')
+BOX_SHADOW = 'var(--tw-ring-offset-shadow, 0 0 #0000), var(--tw-ring-shadow, 0 0 #0000), var(--tw-shadow)'
+FILTER = 'var(--tw-blur) var(--tw-drop-shadow)'
+
+
+# ----------------------------------------
+# VALUES
+# ----------------------------------------
+def arbitrary(value):
+    """`[500px]` -> '500px' (underscores are spaces, as in Tailwind); None if not bracketed."""
+    if len(value) > 2 and value[0] == '[' and value[-1] == ']':
+        return value[1:-1].replace('_', ' ')
+    return None
+
+
+def _number(text):
+    return format(float(text), 'g') if re.fullmatch(r'\d+(\.\d+)?', text) else None
+
+
+def spacing(value):
+    """Tailwind's spacing scale: 4 -> 1rem, 0.5 -> 0.125rem, px -> 1px."""
+    if value == 'px':
+        return '1px'
+    if value == '0':
+        return '0px'
+    number = _number(value)
+    if number is not None and float(number) * 2 == int(float(number) * 2):
+        return f'{format(float(number) / 4, "g")}rem'
+    return arbitrary(value)
+
+
+def fraction(value):
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not int(match[2]):
+        return None
+    percent = Fraction(int(match[1]), int(match[2])) * 100
+    return f'{format(float(percent), ".6g")}%'
+
+
+def hex_channels(value):
+    """'#3b82f6' -> ('59 130 246', alpha or None); None if not a hex color."""
+    match = re.fullmatch(r'#([0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})', value)
+    if not match:
+        return None
+    digits = match[1]
+    if len(digits) <= 4:
+        digits = ''.join(c * 2 for c in digits)
+    channels = ' '.join(str(int(digits[i:i + 2], 16)) for i in (0, 2, 4))
+    alpha = format(int(digits[6:8], 16) / 255, '.3g') if len(digits) == 8 else None
+    return channels, alpha
+
+
+def color(value):
+    """
+    Resolve a color name (`red-500`, `accent`, `[#44bcec66]`), with an optional
+    `/<opacity>` modifier. Returns (channels, alpha) for hex colors — alpha is
+    None when the utility's opacity variable applies — or (css, None) for
+    keywords; None if `value` is not a color.
+    """
+    name, _, modifier = value.partition('/')
+    alpha = None
+    if modifier:
+        alpha = (format(int(modifier) / 100, 'g') if modifier.isdigit() and int(modifier) <= 100
+                 else arbitrary(modifier))
+        if alpha is None:
+            return None
+    if name in SPECIAL_COLORS:
+        return (SPECIAL_COLORS[name], None) if not modifier else None
+    raw = COLORS.get(name) or arbitrary(name)
+    parsed = hex_channels(raw) if raw else None
+    if parsed is None:
+        return None
+    channels, own_alpha = parsed
+    return channels, alpha or own_alpha
+
+
+def color_rule(prop, value, opacity_var=None):
+    resolved = color(value)
+    if resolved is None:
+        return None
+    channels, alpha = resolved
+    if channels in SPECIAL_COLORS.values():
+        return [(prop, channels)]
+    if alpha is not None:
+        return [(prop, f'rgb({channels} / {alpha})')]
+    if opacity_var is None:
+        return [(prop, f'rgb({channels})')]
+    return [(opacity_var, '1'), (prop, f'rgb({channels} / var({opacity_var}))')]
+
+
+# ----------------------------------------
+# UTILITIES
+# ----------------------------------------
+# Each entry maps a class (without variants) to its declarations; the order of
+# UTILITIES is the order of the rules in the stylesheet (Tailwind's: layout,
+# spacing, sizing, typography, backgrounds, borders, effects, transitions),
+# so "p-4 px-2" and "border border-b-2" resolve the same as on the CDN.
+# A handler returns a list of (property, value) pairs, or a (selector suffix,
+# pairs) tuple for rules on children ("space-x-4"), or None.
+STATIC = {
+    # layout
+    'block': [('display', 'block')], 'inline-block': [('display', 'inline-block')],
+    'inline': [('display', 'inline')], 'flex': [('display', 'flex')],
+    'inline-flex': [('display', 'inline-flex')], 'table': [('display', 'table')],
+    'table-row': [('display', 'table-row')], 'table-cell': [('display', 'table-cell')],
+    'grid': [('display', 'grid')], 'inline-grid': [('display', 'inline-grid')],
+    'contents': [('display', 'contents')], 'list-item': [('display', 'list-item')],
+    'hidden': [('display', 'none')],
+    'static': [('position', 'static')], 'fixed': [('position', 'fixed')],
+    'absolute': [('position', 'absolute')], 'relative': [('position', 'relative')],
+    'sticky': [('position', 'sticky')],
+    'visible': [('visibility', 'visible')], 'invisible': [('visibility', 'hidden')],
+    'isolate': [('isolation', 'isolate')],
+    'float-left': [('float', 'left')], 'float-right': [('float', 'right')], 'float-none': [('float', 'none')],
+    'clear-both': [('clear', 'both')],
+    'object-contain': [('object-fit', 'contain')], 'object-cover': [('object-fit', 'cover')],
+    'object-fill': [('object-fit', 'fill')], 'object-none': [('object-fit', 'none')],
+    'object-center': [('object-position', 'center')], 'object-top': [('object-position', 'top')],
+    'aspect-auto': [('aspect-ratio', 'auto')], 'aspect-square': [('aspect-ratio', '1 / 1')],
+    'aspect-video': [('aspect-ratio', '16 / 9')],
+    'sr-only': [('position', 'absolute'), ('width', '1px'), ('height', '1px'), ('padding', '0'),
+                ('margin', '-1px'), ('overflow', 'hidden'), ('clip', 'rect(0, 0, 0, 0)'),
+                ('white-space', 'nowrap'), ('border-width', '0')],
+    # flexbox & grid
+    'flex-row': [('flex-direction', 'row')], 'flex-row-reverse': [('flex-direction', 'row-reverse')],
+    'flex-col': [('flex-direction', 'column')], 'flex-col-reverse': [('flex-direction', 'column-reverse')],
+    'flex-wrap': [('flex-wrap', 'wrap')], 'flex-wrap-reverse': [('flex-wrap', 'wrap-reverse')],
+    'flex-nowrap': [('flex-wrap', 'nowrap')],
+    'flex-1': [('flex', '1 1 0%')], 'flex-auto': [('flex', '1 1 auto')],
+    'flex-initial': [('flex', '0 1 auto')], 'flex-none': [('flex', 'none')],
+    'flex-grow': [('flex-grow', '1')], 'flex-grow-0': [('flex-grow', '0')],
+    'grow': [('flex-grow', '1')], 'grow-0': [('flex-grow', '0')],
+    'flex-shrink': [('flex-shrink', '1')], 'flex-shrink-0': [('flex-shrink', '0')],
+    'shrink': [('flex-shrink', '1')], 'shrink-0': [('flex-shrink', '0')],
+    'col-span-full': [('grid-column', '1 / -1')],
+    'items-start': [('align-items', 'flex-start')], 'items-end': [('align-items', 'flex-end')],
+    'items-center': [('align-items', 'center')], 'items-baseline': [('align-items', 'baseline')],
+    'items-stretch': [('align-items', 'stretch')],
+    'justify-start': [('justify-content', 'flex-start')], 'justify-end': [('justify-content', 'flex-end')],
+    'justify-center': [('justify-content', 'center')], 'justify-between': [('justify-content', 'space-between')],
+    'justify-around': [('justify-content', 'space-around')], 'justify-evenly': [('justify-content', 'space-evenly')],
+    'content-center': [('align-content', 'center')], 'content-start': [('align-content', 'flex-start')],
+    'self-auto': [('align-self', 'auto')], 'self-start': [('align-self', 'flex-start')],
+    'self-end': [('align-self', 'flex-end')], 'self-center': [('align-self', 'center')],
+    'self-stretch': [('align-self', 'stretch')],
+    'place-items-center': [('place-items', 'center')],
+    # typography
+    'italic': [('font-style', 'italic')], 'not-italic': [('font-style', 'normal')],
+    'text-left': [('text-align', 'left')], 'text-center': [('text-align', 'center')],
+    'text-right': [('text-align', 'right')], 'text-justify': [('text-align', 'justify')],
+    'align-top': [('vertical-align', 'top')], 'align-middle': [('vertical-align', 'middle')],
+    'align-bottom': [('vertical-align', 'bottom')],
+    'uppercase': [('text-transform', 'uppercase')], 'lowercase': [('text-transform', 'lowercase')],
+    'capitalize': [('text-transform', 'capitalize')], 'normal-case': [('text-transform', 'none')],
+    'underline': [('text-decoration-line', 'underline')], 'line-through': [('text-decoration-line', 'line-through')],
+    'no-underline': [('text-decoration-line', 'none')],
+    'antialiased': [('-webkit-font-smoothing', 'antialiased'), ('-moz-osx-font-smoothing', 'grayscale')],
+    'truncate': [('overflow', 'hidden'), ('text-overflow', 'ellipsis'), ('white-space', 'nowrap')],
+    'text-ellipsis': [('text-overflow', 'ellipsis')],
+    'whitespace-normal': [('white-space', 'normal')], 'whitespace-nowrap': [('white-space', 'nowrap')],
+    'whitespace-pre': [('white-space', 'pre')], 'whitespace-pre-line': [('white-space', 'pre-line')],
+    'whitespace-pre-wrap': [('white-space', 'pre-wrap')],
+    'break-words': [('overflow-wrap', 'break-word')], 'break-all': [('word-break', 'break-all')],
+    'list-none': [('list-style-type', 'none')], 'list-disc': [('list-style-type', 'disc')],
+    'list-decimal': [('list-style-type', 'decimal')], 'list-inside': [('list-style-position', 'inside')],
+    # backgrounds
+    'bg-cover': [('background-size', 'cover')], 'bg-contain': [('background-size', 'contain')],
+    'bg-center': [('background-position', 'center')], 'bg-no-repeat': [('background-repeat', 'no-repeat')],
+    'bg-fixed': [('background-attachment', 'fixed')], 'bg-none': [('background-image', 'none')],
+    # borders
+    'border-solid': [('border-style', 'solid')], 'border-dashed': [('border-style', 'dashed')],
+    'border-dotted': [('border-style', 'dotted')], 'border-none': [('border-style', 'none')],
+    'border-collapse': [('border-collapse', 'collapse')], 'border-separate': [('border-collapse', 'separate')],
+    'outline-none': [('outline', '2px solid transparent'), ('outline-offset', '2px')],
+    'outline': [('outline-style', 'solid')],
+    'ring-inset': [('--tw-ring-inset', 'inset')],
+    # effects & filters
+    'filter': [('filter', FILTER)], 'filter-none': [('filter', 'none')],
+    # transforms
+    'transform': [('transform', TRANSFORM)], 'transform-none': [('transform', 'none')],
+    'transform-gpu': [('transform', TRANSFORM.replace('translate(', 'translate3d(').replace(
+        'var(--tw-translate-y))', 'var(--tw-translate-y), 0)', 1))],
+    # interactivity
+    'cursor-pointer': [('cursor', 'pointer')], 'cursor-default': [('cursor', 'default')],
+    'cursor-not-allowed': [('cursor', 'not-allowed')], 'cursor-wait': [('cursor', 'wait')],
+    'pointer-events-none': [('pointer-events', 'none')], 'pointer-events-auto': [('pointer-events', 'auto')],
+    'select-none': [('user-select', 'none')], 'select-all': [('user-select', 'all')],
+    'resize-none': [('resize', 'none')], 'resize-y': [('resize', 'vertical')], 'resize': [('resize', 'both')],
+    'appearance-none': [('appearance', 'none')],
+    'scroll-smooth': [('scroll-behavior', 'smooth')],
+}
+
+
+BOX_SIDES = {
+    '': ('',), 'x': ('-left', '-right'), 'y': ('-top', '-bottom'),
+    't': ('-top',), 'r': ('-right',), 'b': ('-bottom',), 'l': ('-left',),
+}
+INSET_SIDES = {
+    'inset': ('top', 'right', 'bottom', 'left'), 'inset-x': ('left', 'right'), 'inset-y': ('top', 'bottom'),
+    'top': ('top',), 'right': ('right',), 'bottom': ('bottom',), 'left': ('left',),
+}
+RADIUS_CORNERS = {
+    '': ('',), 't': ('-top-left', '-top-right'), 'r': ('-top-right', '-bottom-right'),
+    'b': ('-bottom-right', '-bottom-left'), 'l': ('-top-left', '-bottom-left'),
+    'tl': ('-top-left',), 'tr': ('-top-right',), 'br': ('-bottom-right',), 'bl': ('-bottom-left',),
+}
+
+
+def _negate(value):
+    if value in ('0', '0px', 'auto') or value.startswith('calc('):
+        return None if value == 'auto' else value
+    return f'-{value}' if not value.startswith('-') else value[1:]
+
+
+def u_inset(name, negative):
+    for prefix in sorted(INSET_SIDES, key=len, reverse=True):
+        if name.startswith(prefix + '-'):
+            raw = name[len(prefix) + 1:]
+            value = {'auto': 'auto', 'full': '100%'}.get(raw) or spacing(raw) or fraction(raw)
+            if value and negative:
+                value = _negate(value)
+            return value and [(side, value) for side in INSET_SIDES[prefix]]
+    return None
+
+
+def u_z(name, negative):
+    match = re.fullmatch(r'z-(\d+|auto)', name)
+    return match and [('z-index', f'-{match[1]}' if negative else match[1])]
+
+
+def u_order(name, negative):
+    match = re.fullmatch(r'order-(\d+|first|last|none)', name)
+    if not match:
+        return None
+    value = {'first': '-9999', 'last': '9999', 'none': '0'}.get(match[1], match[1])
+    return [('order', f'-{value}' if negative else value)]
+
+
+def u_grid(name, negative):
+    match = re.fullmatch(r'grid-(cols|rows)-(\d+|none)', name)
+    if match:
+        prop = 'grid-template-columns' if match[1] == 'cols' else 'grid-template-rows'
+        value = 'none' if match[2] == 'none' else f'repeat({match[2]}, minmax(0, 1fr))'
+        return [(prop, value)]
+    match = re.fullmatch(r'(col|row)-span-(\d+)', name)
+    if match:
+        return [(f'grid-{"column" if match[1] == "col" else "row"}', f'span {match[2]} / span {match[2]}')]
+    match = re.fullmatch(r'(col|row)-(start|end)-(\d+)', name)
+    if match:
+        return [(f'grid-{"column" if match[1] == "col" else "row"}-{match[2]}', match[3])]
+    return None
+
+
+def u_overflow(name, negative):
+    match = re.fullmatch(r'overflow-(?:([xy])-)?(auto|hidden|clip|visible|scroll)', name)
+    return match and [(f'overflow-{match[1]}' if match[1] else 'overflow', match[2])]
+
+
+def _box(name, negative, letter, prop):
+    match = re.fullmatch(rf'{letter}([xytrbl]?)-(.+)', name)
+    if not match:
+        return None
+    value = 'auto' if match[2] == 'auto' and prop == 'margin' else spacing(match[2])
+    if value is None:
+        return None
+    if negative:
+        value = _negate(value)
+        if value is None:
+            return None
+    return [(f'{prop}{side}', value) for side in BOX_SIDES[match[1]]]
+
+
+def u_margin(name, negative):
+    return _box(name, negative, 'm', 'margin')
+
+
+def u_padding(name, negative):
+    return None if negative else _box(name, negative, 'p', 'padding')
+
+
+def u_space(name, negative):
+    match = re.fullmatch(r'space-([xy])-(.+)', name)
+    value = match and spacing(match[2])
+    if not value:
+        return None
+    if negative:
+        value = _negate(value)
+    prop = 'margin-left' if match[1] == 'x' else 'margin-top'
+    return ' > :not([hidden]) ~ :not([hidden])', [(prop, value)]
+
+
+def u_gap(name, negative):
+    match = re.fullmatch(r'gap-(?:([xy])-)?(.+)', name)
+    value = match and not negative and spacing(match[2])
+    if not value:
+        return None
+    prop = {'x': 'column-gap', 'y': 'row-gap'}.get(match[1], 'gap')
+    return [(prop, value)]
+
+
+def _size(raw, extra):
+    return extra.get(raw) or spacing(raw) or fraction(raw)
+
+
+SIZE_COMMON = {'auto': 'auto', 'full': '100%', 'min': 'min-content', 'max': 'max-content', 'fit': 'fit-content'}
+
+
+def u_width(name, negative):
+    if negative:
+        return None
+    for prefix, prop, extra in (
+        ('w-', 'width', {**SIZE_COMMON, 'screen': '100vw'}),
+        ('min-w-', 'min-width', {'0': '0px', 'full': '100%', 'min': 'min-content', 'max': 'max-content',
+                                 'fit': 'fit-content'}),
+        ('max-w-', 'max-width', MAX_WIDTHS),
+    ):
+        if name.startswith(prefix):
+            raw = name[len(prefix):]
+            value = extra.get(raw) or arbitrary(raw) if prefix != 'w-' else _size(raw, extra)
+            if prefix == 'min-w-' and value is None:
+                value = spacing(raw)
+            return value and [(prop, value)]
+    return None
+
+
+def u_height(name, negative):
+    if negative:
+        return None
+    for prefix, prop, extra in (
+        ('h-', 'height', {**SIZE_COMMON, 'screen': '100vh'}),
+        ('min-h-', 'min-height', {'0': '0px', 'full': '100%', 'screen': '100vh', 'min': 'min-content',
+                                  'max': 'max-content', 'fit': 'fit-content'}),
+        ('max-h-', 'max-height', {'none': 'none', 'full': '100%', 'screen': '100vh', 'min': 'min-content',
+                                  'max': 'max-content', 'fit': 'fit-content'}),
+    ):
+        if name.startswith(prefix):
+            value = _size(name[len(prefix):], extra)
+            return value and [(prop, value)]
+    return None
+
+
+def u_size(name, negative):
+    match = re.fullmatch(r'size-(.+)', name)
+    value = match and not negative and _size(match[1], SIZE_COMMON)
+    return value and [('width', value), ('height', value)]
+
+
+def u_transform(name, negative):
+    match = re.fullmatch(r'scale-(?:([xy])-)?(\d+|\[[^\]]+\])', name)
+    if match:
+        value = arbitrary(match[2]) or format(int(match[2]) / 100, 'g')
+        if negative:
+            value = f'-{value}'
+        axes = (match[1],) if match[1] else ('x', 'y')
+        return [(f'--tw-scale-{axis}', value) for axis in axes] + [('transform', TRANSFORM)]
+    match = re.fullmatch(r'translate-([xy])-(.+)', name)
+    if match:
+        value = {'full': '100%'}.get(match[2]) or spacing(match[2]) or fraction(match[2])
+        if value and negative:
+            value = _negate(value)
+        return value and [(f'--tw-translate-{match[1]}', value), ('transform', TRANSFORM)]
+    match = re.fullmatch(r'rotate-(\d+|\[[^\]]+\])', name)
+    if match:
+        value = arbitrary(match[1]) or f'{match[1]}deg'
+        return [('--tw-rotate', f'-{value}' if negative else value), ('transform', TRANSFORM)]
+    return None
+
+
+def u_animation(name, negative):
+    return {
+        'animate-spin': [('animation', 'spin 1s linear infinite')],
+        'animate-pulse': [('animation', 'pulse 2s cubic-bezier(0.4, 0, 0.6, 1) infinite')],
+        'animate-none': [('animation', 'none')],
+    }.get(name)
+
+
+def u_font(name, negative):
+    match = re.fullmatch(r'font-(.+)', name)
+    if not match:
+        return None
+    if match[1] in FONT_WEIGHTS:
+        return [('font-weight', FONT_WEIGHTS[match[1]])]
+    if match[1] in FONT_FAMILIES:
+        return [('font-family', FONT_FAMILIES[match[1]])]
+    return None
+
+
+def u_text(name, negative):
+    match = re.fullmatch(r'text-(.+)', name)
+    if not match:
+        return None
+    size, _, leading = match[1].partition('/')
+    if size in FONT_SIZES:
+        font_size, line_height = FONT_SIZES[size]
+        if leading:
+            line_height = LINE_HEIGHTS.get(leading) or spacing(leading)
+            if line_height is None:
+                return None
+        return [('font-size', font_size), ('line-height', line_height)]
+    value = arbitrary(match[1])
+    if value and re.fullmatch(r'[\d.]+(px|rem|em)', value):
+        return [('font-size', value)]
+    return color_rule('color', match[1], '--tw-text-opacity')
+
+
+def u_leading(name, negative):
+    match = re.fullmatch(r'leading-(.+)', name)
+    value = match and (LINE_HEIGHTS.get(match[1]) or spacing(match[1]))
+    return value and [('line-height', value)]
+
+
+def u_tracking(name, negative):
+    match = re.fullmatch(r'tracking-(.+)', name)
+    value = match and (LETTER_SPACING.get(match[1]) or arbitrary(match[1]))
+    return value and [('letter-spacing', value)]
+
+
+def u_line_clamp(name, negative):
+    match = re.fullmatch(r'line-clamp-(\d+)', name)
+    return match and [('overflow', 'hidden'), ('display', '-webkit-box'),
+                      ('-webkit-box-orient', 'vertical'), ('-webkit-line-clamp', match[1])]
+
+
+def u_background(name, negative):
+    match = re.fullmatch(r'bg-gradient-to-(t|tr|r|br|b|bl|l|tl)', name)
+    if match:
+        return [('background-image', f'linear-gradient(to {GRADIENT_DIRECTIONS[match[1]]}, var(--tw-gradient-stops))')]
+    match = re.fullmatch(r'bg-opacity-(\d+)', name)
+    if match:
+        return [('--tw-bg-opacity', format(int(match[1]) / 100, 'g'))]
+    match = re.fullmatch(r'bg-(.+)', name)
+    return match and color_rule('background-color', match[1], '--tw-bg-opacity')
+
+
+def _color_stop(value):
+    resolved = color(value)
+    if resolved is None:
+        return None
+    channels, alpha = resolved
+    if channels in SPECIAL_COLORS.values():
+        return channels, 'rgb(255 255 255 / 0)' if channels == 'transparent' else channels
+    solid = f'rgb({channels} / {alpha})' if alpha is not None else f'rgb({channels})'
+    return solid, f'rgb({channels} / 0)'
+
+
+def u_gradient(name, negative):
+    match = re.fullmatch(r'(from|via|to)-(.+)', name)
+    stop = match and _color_stop(match[2])
+    if not stop:
+        return None
+    value, clear = stop
+    if match[1] == 'from':
+        return [('--tw-gradient-from', f'{value} var(--tw-gradient-from-position)'),
+                ('--tw-gradient-to', f'{clear} var(--tw-gradient-to-position)'),
+                ('--tw-gradient-stops', 'var(--tw-gradient-from), var(--tw-gradient-to)')]
+    if match[1] == 'via':
+        return [('--tw-gradient-to', f'{clear} var(--tw-gradient-to-position)'),
+                ('--tw-gradient-stops',
+                 f'var(--tw-gradient-from), {value} var(--tw-gradient-via-position), var(--tw-gradient-to)')]
+    return [('--tw-gradient-to', f'{value} var(--tw-gradient-to-position)')]
+
+
+def u_rounded(name, negative):
+    match = re.fullmatch(r'rounded(?:-(tl|tr|br|bl|t|r|b|l))?(?:-(.+))?', name)
+    if not match:
+        return None
+    value = RADII.get(match[2] or '') or arbitrary(match[2] or '')
+    if value is None:
+        return None
+    corners = RADIUS_CORNERS[match[1] or '']
+    return [(f'border{corner}-radius', value) for corner in corners]
+
+
+def u_border(name, negative):
+    match = re.fullmatch(r'border(?:-([xytrbl]))?(?:-(\d+))?', name)
+    if match:
+        width = f'{match[2]}px' if match[2] else '1px'
+        return [(f'border{side}-width', width) for side in BOX_SIDES[match[1] or '']]
+    match = re.fullmatch(r'border-opacity-(\d+)', name)
+    if match:
+        return [('--tw-border-opacity', format(int(match[1]) / 100, 'g'))]
+    match = re.fullmatch(r'border-(?:([xytrbl])-)?(.+)', name)
+    if match:
+        rule = color_rule('border-color', match[2], '--tw-border-opacity')
+        if rule and match[1]:
+            rule = [(prop.replace('border-', f'border{side}-', 1), value)
+                    for side in BOX_SIDES[match[1]] for prop, value in rule]
+        return rule
+    return None
+
+
+def u_divide(name, negative):
+    match = re.fullmatch(r'divide-([xy])(?:-(\d+))?', name)
+    if match:
+        side = '-left' if match[1] == 'x' else '-top'
+        return ' > :not([hidden]) ~ :not([hidden])', [(f'border{side}-width', f'{match[2] or 1}px')]
+    match = re.fullmatch(r'divide-(.+)', name)
+    rule = match and color_rule('border-color', match[1], '--tw-divide-opacity')
+    return rule and (' > :not([hidden]) ~ :not([hidden])', rule)
+
+
+def u_fill(name, negative):
+    match = re.fullmatch(r'(fill|stroke)-(.+)', name)
+    if not match:
+        return None
+    if match[1] == 'stroke' and match[2].isdigit():
+        return [('stroke-width', match[2])]
+    return color_rule(match[1], match[2])
+
+
+def u_object(name, negative):
+    match = re.fullmatch(r'placeholder-(.+)', name)
+    rule = match and color_rule('color', match[1], '--tw-placeholder-opacity')
+    return rule and ('::placeholder', rule)
+
+
+def u_opacity(name, negative):
+    match = re.fullmatch(r'opacity-(\d+)', name)
+    return match and [('opacity', format(int(match[1]) / 100, 'g'))]
+
+
+def u_shadow(name, negative):
+    match = re.fullmatch(r'shadow(?:-(.+))?', name)
+    if not match:
+        return None
+    if (match[1] or '') in SHADOWS:
+        return [('--tw-shadow', SHADOWS[match[1] or '']), ('box-shadow', BOX_SHADOW)]
+    return None
+
+
+def u_outline(name, negative):
+    match = re.fullmatch(r'outline-offset-(\d+)', name)
+    if match:
+        return [('outline-offset', f'{match[1]}px')]
+    match = re.fullmatch(r'outline-(\d+)', name)
+    if match:
+        return [('outline-width', f'{match[1]}px')]
+    match = re.fullmatch(r'outline-(.+)', name)
+    return match and color_rule('outline-color', match[1])
+
+
+def u_ring(name, negative):
+    match = re.fullmatch(r'ring(?:-(\d+))?', name)
+    if match:
+        width = match[1] or '3'
+        return [
+            ('--tw-ring-offset-shadow', 'var(--tw-ring-inset) 0 0 0 var(--tw-ring-offset-width) var(--tw-ring-offset-color)'),
+            ('--tw-ring-shadow', f'var(--tw-ring-inset) 0 0 0 calc({width}px + var(--tw-ring-offset-width)) var(--tw-ring-color)'),
+            ('box-shadow', BOX_SHADOW.replace('var(--tw-ring-offset-shadow, 0 0 #0000)', 'var(--tw-ring-offset-shadow)')
+             .replace('var(--tw-ring-shadow, 0 0 #0000)', 'var(--tw-ring-shadow)')
+             .replace('var(--tw-shadow)', 'var(--tw-shadow, 0 0 #0000)')),
+        ]
+    match = re.fullmatch(r'ring-offset-(\d+)', name)
+    if match:
+        return [('--tw-ring-offset-width', f'{match[1]}px')]
+    match = re.fullmatch(r'ring-offset-(.+)', name)
+    if match:
+        rule = color_rule('--tw-ring-offset-color', match[1])
+        return rule
+    match = re.fullmatch(r'ring-opacity-(\d+)', name)
+    if match:
+        return [('--tw-ring-opacity', format(int(match[1]) / 100, 'g'))]
+    match = re.fullmatch(r'ring-(.+)', name)
+    return match and color_rule('--tw-ring-color', match[1], '--tw-ring-opacity')
+
+
+def u_filter(name, negative):
+    match = re.fullmatch(r'drop-shadow(?:-(.+))?', name)
+    if match:
+        value = DROP_SHADOWS.get(match[1] or '')
+        if value is None and match[1]:
+            raw = arbitrary(match[1])
+            value = raw and f'drop-shadow({raw})'
+        return value and [('--tw-drop-shadow', value), ('filter', FILTER)]
+    match = re.fullmatch(r'blur(?:-(.+))?', name)
+    value = match and (BLURS.get(match[1] or '') or arbitrary(match[1] or ''))
+    return value and [('--tw-blur', f'blur({value})'), ('filter', FILTER)]
+
+
+def u_backdrop(name, negative):
+    match = re.fullmatch(r'backdrop-blur(?:-(.+))?', name)
+    value = match and BLURS.get(match[1] or '')
+    return value and [('backdrop-filter', f'blur({value})')]
+
+
+def u_transition(name, negative):
+    match = re.fullmatch(r'transition(?:-(.+))?', name)
+    if match:
+        if match[1] == 'none':
+            return [('transition-property', 'none')]
+        props = TRANSITIONS.get(match[1] or '')
+        return props and [('transition-property', props),
+                          ('transition-timing-function', EASINGS['in-out']),
+                          ('transition-duration', '150ms')]
+    match = re.fullmatch(r'(duration|delay)-(\d+)', name)
+    if match:
+        return [(f'transition-{match[1]}', f'{match[2]}ms')]
+    match = re.fullmatch(r'ease-(.+)', name)
+    value = match and EASINGS.get(match[1])
+    return value and [('transition-timing-function', value)]
+
+
+def u_accent(name, negative):
+    match = re.fullmatch(r'(accent|caret)-(.+)', name)
+    rule = match and color_rule(f'{match[1]}-color', match[2])
+    return rule
+
+
+UTILITIES = (
+    # layout
+    u_inset, u_z, u_order, u_grid,
+    u_margin,
+    u_size, u_height, u_width,
+    u_transform, u_animation,
+    u_overflow,
+    u_space, u_gap, u_divide,
+    u_rounded, u_border,
+    u_background, u_gradient, u_fill,
+    u_padding,
+    u_font, u_text, u_leading, u_tracking, u_line_clamp,
+    u_object, u_accent,
+    u_opacity, u_shadow, u_outline, u_ring,
+    u_filter, u_backdrop,
+    u_transition,
+)
+
+# static classes slot in next to the handler of their family
+STATIC_AFTER = {
+    'display': u_overflow, 'position': u_inset, 'visibility': u_inset, 'isolation': u_z,
+    'float': u_margin, 'clear': u_margin, 'object-fit': u_padding, 'object-position': u_padding,
+    'aspect-ratio': u_size, 'flex': u_transform, 'flex-grow': u_transform, 'flex-shrink': u_transform,
+    'grid-column': u_grid,
+}
+
+
+def _static_rank(declarations):
+    first = declarations[0][0]
+    anchor = STATIC_AFTER.get(first)
+    if anchor is not None:
+        return UTILITIES.index(anchor) + 0.5
+    if first in ('text-align', 'vertical-align', 'text-transform', 'text-decoration-line', 'font-style',
+                 '-webkit-font-smoothing', 'white-space', 'overflow-wrap', 'word-break', 'text-overflow',
+                 'list-style-type', 'list-style-position'):
+        return UTILITIES.index(u_line_clamp) + 0.5
+    if first.startswith('background'):
+        return UTILITIES.index(u_gradient) + 0.5
+    if first.startswith('border') or first.startswith('outline'):
+        return UTILITIES.index(u_border) + 0.5
+    if first in ('filter', 'transform', '--tw-ring-inset'):
+        return UTILITIES.index(u_filter) + 0.5
+    if first in ('overflow',):
+        return UTILITIES.index(u_padding) + 0.5
+    if first in ('flex-direction', 'flex-wrap', 'align-items', 'justify-content', 'align-content',
+                 'align-self', 'place-items'):
+        return UTILITIES.index(u_space) - 0.5
+    return len(UTILITIES)
+
+
+FAMILY_DETAIL = (
+    # within a family the general class comes first: p-4, then px-2, then pt-1
+    (re.compile(r'[mp][xy]-|(inset|border|divide)-[xy](-|$)|rounded-[trbl](-|$)'), 1),
+    (re.compile(r'[mp][trbl]-|(top|right|bottom|left)-|border-[trbl](-|$)|rounded-(tl|tr|br|bl)(-|$)'), 2),
+)
+
+
+def _specificity(name):
+    for pattern, detail in FAMILY_DETAIL:
+        if pattern.match(name):
+            return detail
+    return 0
+
+
+def utility(name):
+    """(rank, selector suffix, declarations) of a class without variants, or None."""
+    negative = name.startswith('-')
+    base = name[1:] if negative else name
+    if not negative and base in STATIC:
+        declarations = STATIC[base]
+        return _static_rank(declarations), '', declarations
+    for rank, handler in enumerate(UTILITIES):
+        result = handler(base, negative)
+        if result:
+            suffix, declarations = result if isinstance(result, tuple) else ('', result)
+            return rank + _specificity(base) / 10, suffix, declarations
+    return None
+
+
+# ----------------------------------------
+# VARIANTS
+# ----------------------------------------
+# name -> how it changes the selector ("&" is the class); the position is the
+# rule order (Tailwind's): a later variant wins over an earlier one, so
+# `dark:text-gray-400` beats `hover:text-accent` like on the CDN.
+PSEUDO_VARIANTS = {
+    'first': '&:first-child', 'last': '&:last-child', 'odd': '&:nth-child(odd)', 'even': '&:nth-child(even)',
+    'disabled': '&:disabled', 'checked': '&:checked', 'placeholder': '&::placeholder',
+    'focus-within': '&:focus-within', 'hover': '&:hover', 'focus': '&:focus',
+    'focus-visible': '&:focus-visible', 'active': '&:active',
+    'group-hover': '.group:hover &', 'group-focus': '.group:focus &',
+    'peer-checked': '.peer:checked ~ &',
+    'dark': '.dark &',
+}
+VARIANT_ORDER = {name: index for index, name in enumerate([*PSEUDO_VARIANTS, *SCREENS])}
+
+
+def escape(class_name):
+    """CSS-escape a class name: `md:w-[450px]` -> `md\\:w-\\[450px\\]`."""
+    escaped = re.sub(r'([^a-zA-Z0-9_-])', r'\\\1', class_name)
+    return re.sub(r'^(-?)(\d)', lambda m: f'{m[1]}\\3{m[2]} ', escaped)
+
+
+def rule(class_name):
+    """
+    (sort key, media query or None, CSS rule) for `class_name`, or None if it
+    is not a utility class.
+    """
+    *variants, name = class_name.split(':')
+    if not name or len(set(variants)) != len(variants) or any(v not in VARIANT_ORDER for v in variants):
+        return None
+    resolved = utility(name)
+    if resolved is None:
+        return None
+    rank, suffix, declarations = resolved
+
+    screens = [v for v in variants if v in SCREENS]
+    if len(screens) > 1:
+        return None
+    selector = '.' + escape(class_name)
+    # the variant next to the class applies first: dark:hover:x -> .dark .x:hover
+    for variant in reversed([v for v in variants if v in PSEUDO_VARIANTS]):
+        selector = PSEUDO_VARIANTS[variant].replace('&', selector)
+    body = ''.join(f'{prop}:{value};' for prop, value in declarations)
+    media = f'(min-width: {SCREENS[screens[0]]}px)' if screens else None
+
+    order = tuple(sorted((VARIANT_ORDER[v] for v in variants), reverse=True))
+    return (order, rank, class_name), media, f'{selector}{suffix}{{{body.rstrip(";")}}}'
+
+
+# ----------------------------------------
+# BUILD
+# ----------------------------------------
+TEMPLATE_SYNTAX = re.compile(r'\{[%{#]|[%}#]\}')
+CANDIDATE = re.compile(r'[\w:/.!-]*\[[^\s\[\]\'"]+\][\w/.-]*|[\w:/.!-]+')
+
+
+def candidates(text):
+    """Every string in `text` that could be a class name."""
+    return set(CANDIDATE.findall(TEMPLATE_SYNTAX.sub(' ', text)))
+
+
+def content_files():
+    root = Path(settings.BASE_DIR)
+    files = set()
+    for pattern in CONTENT:
+        files.update(path for path in root.glob(pattern) if path.is_file())
+    return sorted(files)
+
+
+PREFLIGHT = """\
+*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb}
+::before,::after{--tw-content:''}
+html,:host{line-height:1.5;-webkit-text-size-adjust:100%%;-moz-tab-size:4;tab-size:4;font-family:%(sans)s;font-feature-settings:normal;font-variation-settings:normal;-webkit-tap-highlight-color:transparent}
+body{margin:0;line-height:inherit}
+hr{height:0;color:inherit;border-top-width:1px}
+abbr:where([title]){text-decoration:underline dotted}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+b,strong{font-weight:bolder}
+code,kbd,samp,pre{font-family:%(mono)s;font-size:1em}
+small{font-size:80%%}
+sub,sup{font-size:75%%;line-height:0;position:relative;vertical-align:baseline}
+sub{bottom:-0.25em}
+sup{top:-0.5em}
+table{text-indent:0;border-color:inherit;border-collapse:collapse}
+button,input,optgroup,select,textarea{font-family:inherit;font-feature-settings:inherit;font-variation-settings:inherit;font-size:100%%;font-weight:inherit;line-height:inherit;letter-spacing:inherit;color:inherit;margin:0;padding:0}
+button,select{text-transform:none}
+button,input:where([type='button']),input:where([type='reset']),input:where([type='submit']){-webkit-appearance:button;background-color:transparent;background-image:none}
+:-moz-focusring{outline:auto}
+:-moz-ui-invalid{box-shadow:none}
+progress{vertical-align:baseline}
+::-webkit-inner-spin-button,::-webkit-outer-spin-button{height:auto}
+[type='search']{-webkit-appearance:textfield;outline-offset:-2px}
+::-webkit-search-decoration{-webkit-appearance:none}
+::-webkit-file-upload-button{-webkit-appearance:button;font:inherit}
+summary{display:list-item}
+blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}
+fieldset{margin:0;padding:0}
+legend{padding:0}
+ol,ul,menu{list-style:none;margin:0;padding:0}
+dialog{padding:0}
+textarea{resize:vertical}
+input::placeholder,textarea::placeholder{opacity:1;color:#9ca3af}
+button,[role="button"]{cursor:pointer}
+:disabled{cursor:default}
+img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}
+img,video{max-width:100%%;height:auto}
+[hidden]{display:none}
+*,::before,::after,::backdrop{--tw-translate-x:0;--tw-translate-y:0;--tw-rotate:0;--tw-skew-x:0;--tw-skew-y:0;--tw-scale-x:1;--tw-scale-y:1;--tw-ring-inset: ;--tw-ring-offset-width:0px;--tw-ring-offset-color:#fff;--tw-ring-color:rgb(59 130 246 / 0.5);--tw-ring-offset-shadow:0 0 #0000;--tw-ring-shadow:0 0 #0000;--tw-shadow:0 0 #0000;--tw-blur: ;--tw-drop-shadow: ;--tw-gradient-from-position: ;--tw-gradient-via-position: ;--tw-gradient-to-position: }
+""" % {'sans': FONT_SANS, 'mono': FONT_MONO}
+
+KEYFRAMES = {
+    'animate-spin': '@keyframes spin{to{transform:rotate(360deg)}}',
+    'animate-pulse': '@keyframes pulse{50%{opacity:.5}}',
+}
+
+
+def _container():
+    lines = ['.container{width:100%}']
+    lines += [f'@media (min-width: {px}px){{.container{{max-width:{px}px}}}}' for px in SCREENS.values()]
+    return lines
+
+
+def compile_css(class_names):
+    """The stylesheet for the classes in `class_names` (unknown names are skipped)."""
+    rules = sorted(filter(None, (rule(name) for name in set(class_names))), key=lambda r: r[0])
+    lines = [PREFLIGHT.rstrip('\n')]
+    if 'container' in class_names:
+        lines += _container()
+    media = None
+    for _, query, css in rules:
+        if query != media:
+            if media:
+                lines.append('}')
+            if query:
+                lines.append(f'@media {query}{{')
+            media = query
+        lines.append(css)
+    if media:
+        lines.append('}')
+    lines += [frames for name, frames in KEYFRAMES.items()
+              if any(c.split(':')[-1] == name for c in class_names)]
+    return '\n'.join(lines) + '\n'
+
+
+def build():
+    """Scan CONTENT and return (static path, CSS) of the site stylesheet."""
+    found = set()
+    for path in content_files():
+        found |= candidates(path.read_text(encoding='utf-8', errors='ignore'))
+    css = compile_css(found)
+    digest = hashlib.sha256(css.encode()).hexdigest()[:12]
+    return f'{OUTPUT_DIR}/{OUTPUT_PREFIX}{digest}.css', css
+
+
+_built = {}
+
+
+def _sources_stamp():
+    stamp = []
+    for path in content_files():
+        try:
+            stamp.append((str(path), path.stat().st_mtime_ns))
+        except OSError:
+            pass
+    return tuple(stamp)
+
+
+def stylesheet_path():
+    """
+    Static path of the current stylesheet. Built once per process; under DEBUG
+    again whenever a scanned file changes, so new classes show up on reload
+    like they did with the CDN.
+    """
+    stamp = _sources_stamp() if settings.DEBUG or not _built else None
+    if stamp is not None and _built.get('stamp') != stamp:
+        name, css = build()
+        _built.update(stamp=stamp, name=name, css=css)
+    return _built['name']
+
+
+def write_stylesheet():
+    """Write the current stylesheet to build_dir() (once) and return its path."""
+    name = stylesheet_path()
+    target = build_dir() / name
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        for old in target.parent.glob(f'{OUTPUT_PREFIX}*.css'):
+            old.unlink()
+        tmp = target.with_suffix('.tmp')
+        tmp.write_text(_built['css'], encoding='utf-8')
+        os.replace(tmp, target)
+    return target
+
+
+class CompiledCssFinder(BaseFinder):
+    """
+    Staticfiles finder for the compiled stylesheet: `collectstatic` copies it
+    to STATIC_ROOT with everything else, runserver serves it in development.
+    """
+
+    def find(self, path, find_all=False, **kwargs):
+        if path.startswith(f'{OUTPUT_DIR}/{OUTPUT_PREFIX}') and path == stylesheet_path():
+            match = str(write_stylesheet())
+            return [match] if find_all or kwargs.get('all') else match
+        return []
+
+    def list(self, ignore_patterns):
+        write_stylesheet()
+        yield stylesheet_path(), FileSystemStorage(location=build_dir())
@@ -0,0 +1,17 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from app.core.stylesheet import stylesheet_path
+
+register = template.Library()
+
+
+# ----------------------------------------
+# {% stylesheet %}
+# ----------------------------------------
+# <link> to the compiled site stylesheet (app/core/stylesheet.py), which
+# replaces the Tailwind CDN script.
+@register.simple_tag
+def stylesheet():
+    return format_html('<link rel="stylesheet" href="{}">', static(stylesheet_path()))
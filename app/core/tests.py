@@ -0,0 +1,403 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from app.core.models import ChunkedUpload
+from app.core.static_images import StaticImageFinder, static_image
+from app.core.storage import BLOB_DIR
+from app.core.stylesheet import build, compile_css, stylesheet_path
+from app.core.uploads import part_path
+from app.jobs.models import Job
+from app.jobs.queue import work_off
+from app.posts.models import Post
+from app.shelters.forms import ShelterRegistrationForm
+from app.shelters.models import ShelterProfile
+from app.stores.models import Store
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = default_storage
+
+    def blobs(self):
+        return [name for _, _, files in os.walk(os.path.join(self.media, BLOB_DIR)) for name in files]
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('post_images/cat.jpg', ContentFile(b'same photo'))
+        second = self.storage.save('shelter_verification_docs/cat.jpg', ContentFile(b'same photo'))
+        third = self.storage.save('post_images/cat.jpg', ContentFile(b'same photo'))
+        other = self.storage.save('post_images/dog.jpg', ContentFile(b'another photo'))
+
+        # upload_to names and URLs work as before
+        self.assertEqual(second, 'shelter_verification_docs/cat.jpg')
+        self.assertNotEqual(third, first)
+        self.assertEqual(self.storage.url(first), '/media/post_images/cat.jpg')
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'same photo')
+
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual(self.storage.references(first), 3)
+        self.assertEqual(self.storage.references(other), 1)
+        self.assertEqual(len(self.blobs()), 2)
+
+    def test_blob_goes_with_its_last_name(self):
+        first = self.storage.save('post_images/cat.jpg', ContentFile(b'same photo'))
+        second = self.storage.save('product_images/cat.jpg', ContentFile(b'same photo'))
+
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertEqual(self.storage.open(second).read(), b'same photo')
+        self.assertEqual(len(self.blobs()), 1)
+
+        self.storage.delete(second)
+        self.assertEqual(self.blobs(), [])
+
+    def test_dedupe_command_shares_existing_duplicates(self):
+        for name in ('post_images/hero.webp', 'shelter_verification_docs/hero.webp'):
+            os.makedirs(os.path.dirname(os.path.join(self.media, name)), exist_ok=True)
+            with open(os.path.join(self.media, name), 'wb') as f:
+                f.write(b'hero image')
+        orphan = self.storage.save('post_images/old.jpg', ContentFile(b'old'))
+        os.remove(self.storage.path(orphan))  # deleted behind the storage's back
+
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn("Shared 1 duplicate file(s)", out.getvalue())
+        self.assertIn("removed 1 unused blob(s)", out.getvalue())
+        self.assertTrue(os.path.samefile(
+            self.storage.path('post_images/hero.webp'), self.storage.path('shelter_verification_docs/hero.webp')
+        ))
+        self.assertEqual(len(self.blobs()), 1)
+
+    def test_reuploaded_post_photo_shares_storage(self):
+        user = User.objects.create_user(username="john", password="12345")
+        photo = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x00\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+        posts = [
+            Post.objects.create(title="Cat", content="...", author=user,
+                                image=SimpleUploadedFile('cat.gif', photo, content_type='image/gif'))
+            for _ in range(2)
+        ]
+        self.assertNotEqual(posts[0].image.name, posts[1].image.name)
+        self.assertTrue(os.path.samefile(posts[0].image.path, posts[1].image.path))
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media, MEDIA_ACCEL='')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.photo = default_storage.save('post_images/cat.jpg', ContentFile(b'0123456789'))
+        self.doc = default_storage.save('store_verification_docs/licence.pdf', ContentFile(b'%PDF secret'))
+        self.owner = User.objects.create_user(username="owner", password="12345")
+        Store.objects.create(owner=self.owner, name="Shop", description="...", store_type='PET',
+                             verification_document=self.doc)
+
+    def get(self, name, **headers):
+        response = self.client.get('/media/' + name, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_public_file_with_validators(self):
+        response, body = self.get(self.photo)
+        self.assertEqual((response.status_code, body), (200, b'0123456789'))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        again, body = self.get(self.photo, If_None_Match=response['ETag'])
+        self.assertEqual((again.status_code, body), (304, b''))
+        again, _ = self.get(self.photo, If_Modified_Since=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_range_requests(self):
+        response, body = self.get(self.photo, Range='bytes=2-5')
+        self.assertEqual((response.status_code, body), (206, b'2345'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        self.assertEqual(self.get(self.photo, Range='bytes=-3')[1], b'789')
+        self.assertEqual(self.get(self.photo, Range='bytes=7-')[1], b'789')
+        response, _ = self.get(self.photo, Range='bytes=20-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+
+        # changed since the client's copy: whole file
+        response, body = self.get(self.photo, Range='bytes=2-5', If_Range='"stale"')
+        self.assertEqual((response.status_code, body), (200, b'0123456789'))
+        etag = response['ETag']
+        self.assertEqual(self.get(self.photo, Range='bytes=2-5', If_Range=etag)[0].status_code, 206)
+
+    def test_verification_documents_are_private(self):
+        self.assertEqual(self.get(self.doc)[0].status_code, 404)
+        User.objects.create_user(username="other", password="12345")
+        self.client.login(username="other", password="12345")
+        self.assertEqual(self.get(self.doc)[0].status_code, 404)
+
+        self.client.login(username="owner", password="12345")
+        response, body = self.get(self.doc)
+        self.assertEqual((response.status_code, body), (200, b'%PDF secret'))
+        self.assertIn('private', response['Cache-Control'])
+
+        User.objects.create_superuser(username="admin", password="12345")
+        self.client.login(username="admin", password="12345")
+        self.assertEqual(self.get(self.doc)[0].status_code, 200)
+
+    def test_blobs_and_traversal_are_not_served(self):
+        blob = default_storage.blob_name(hashlib.sha256(b'%PDF secret').hexdigest())
+        self.assertTrue(default_storage.exists(blob))
+        self.assertEqual(self.get(blob)[0].status_code, 404)
+        self.assertEqual(self.get('post_images/../store_verification_docs/licence.pdf')[0].status_code, 404)
+        self.assertEqual(self.get('post_images/missing.jpg')[0].status_code, 404)
+        self.assertEqual(self.client.post('/media/' + self.photo).status_code, 405)
+
+    def test_proxy_sends_the_bytes_in_production(self):
+        with self.settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response, body = self.get(self.photo)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/post_images/cat.jpg')
+        self.assertEqual(body, b'')
+
+        with self.settings(MEDIA_ACCEL='sendfile'):
+            response, _ = self.get(self.photo)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.photo))
+
+        with self.settings(MEDIA_ACCEL='nginx'):
+            self.assertEqual(self.get(self.doc)[0].status_code, 404)
+
+
+class SiteStylesheetTest(TestCase):
+    def test_only_known_utilities_are_compiled(self):
+        css = compile_css({'p-4', 'md:px-10', 'dark:hover:bg-gray-700', 'hover:bg-accent/90',
+                           'max-h-[500px]', 'Adopt', 'post-feed', '{%'})
+        self.assertIn('.p-4{padding:1rem}', css)
+        self.assertIn('@media (min-width: 768px){\n.md\\:px-10{padding-left:2.5rem;padding-right:2.5rem}\n}', css)
+        self.assertIn('.dark .dark\\:hover\\:bg-gray-700:hover{', css)
+        self.assertIn('.hover\\:bg-accent\\/90:hover{background-color:rgb(59 130 246 / 0.9)}', css)
+        self.assertIn('.max-h-\\[500px\\]{max-height:500px}', css)
+        self.assertNotIn('post-feed', css)
+        # responsive rules come last, so they win over the plain ones
+        self.assertGreater(css.index('@media'), css.index('.p-4{'))
+
+    def test_scans_templates_and_form_widget_classes(self):
+        name, css = build()
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        # the long class strings of stores/forms.py and posts/forms.py
+        self.assertIn('.focus\\:ring-accent:focus{', css)
+        self.assertIn('.dark .dark\\:bg-darkbg{--tw-bg-opacity:1;background-color:rgb(13 17 23 / var(--tw-bg-opacity))}', css)
+        self.assertIn('.cursor-pointer{cursor:pointer}', css)
+        # the same sources give the same file
+        self.assertEqual(build(), (name, css))
+
+    def test_collectstatic_ships_the_stylesheet_pages_link(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with self.settings(STATIC_ROOT=os.path.join(root, 'static'), STATIC_BUILD_DIR=os.path.join(root, 'build'),
+                           STATICFILES_DIRS=[]):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            name = stylesheet_path()
+            with open(os.path.join(root, 'static', name)) as f:
+                self.assertEqual(f.read(), build()[1])
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'<link rel="stylesheet" href="/static/{name}">')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+
+class StaticPictureTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.root = root
+        os.makedirs(os.path.join(root, 'src', 'img'))
+        self.draw('navy')
+        settings = override_settings(
+            STATICFILES_DIRS=[os.path.join(root, 'src')],
+            STATIC_ROOT=os.path.join(root, 'static'),
+            STATIC_BUILD_DIR=os.path.join(root, 'build'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def draw(self, color):
+        Image.new('RGBA', (1000, 200), color).save(os.path.join(self.root, 'src', 'img', 'art.png'))
+
+    def render(self):
+        return Template(
+            "{% load images %}{% static_picture 'img/art.png' sizes='50vw' alt='' class='w-full' %}"
+        ).render(Context())
+
+    def test_picture_has_variants_and_intrinsic_size(self):
+        html = self.render()
+        image = static_image('img/art.png')
+        self.assertEqual((image.width, image.height, image.widths), (1000, 200, [640, 1000]))
+        self.assertIn('<source type="image/avif" srcset="/static/%s 640w, /static/%s 1000w" sizes="50vw">'
+                      % (image.variant(640, 'avif'), image.variant(1000, 'avif')), html)
+        self.assertIn('<img src="/static/img/art.png" alt="" class="w-full" decoding="async" '
+                      'height="200" width="1000">', html)
+
+        # a new version of the file gets new variant URLs
+        self.draw('teal')
+        os.utime(os.path.join(self.root, 'src', 'img', 'art.png'), ns=(0, 10**18))
+        self.assertNotEqual(static_image('img/art.png').variant(640, 'avif'), image.variant(640, 'avif'))
+
+    def test_collectstatic_builds_every_variant(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        image = static_image('img/art.png')
+        for name, width, fmt in image.variants():
+            with Image.open(os.path.join(self.root, 'static', name)) as variant:
+                self.assertEqual((variant.format, variant.size), (fmt.upper(), (width, width // 5)))
+
+    def test_development_server_builds_a_variant_on_request(self):
+        name = static_image('img/art.png').variant(640, 'webp')
+        path = StaticImageFinder().find(name)
+        self.assertTrue(path.startswith(os.path.join(self.root, 'build')))
+        self.assertEqual(Image.open(path).size, (640, 128))
+        self.assertEqual(StaticImageFinder().find(name.replace('640', '320')), [])
+        self.assertIn('<img src="/static/img/missing.png" alt="">', Template(
+            "{% load images %}{% static_picture 'img/missing.png' alt='' %}").render(Context()))
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4, CHUNKED_UPLOAD_MAX_SIZE=64)
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.client.login(username="john", password="12345")
+        self.content = b'%PDF scanned permit'
+
+    def start(self, content=None, **extra):
+        content = self.content if content is None else content
+        data = {'filename': 'permit.pdf', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest(), **extra}
+        return self.client.post(reverse('start_chunked_upload'), data)
+
+    def put(self, url, start, piece, size=None):
+        size = len(self.content) if size is None else size
+        return self.client.put(url, piece, content_type='application/octet-stream',
+                               headers={'Content-Range': f'bytes {start}-{start + len(piece) - 1}/{size}'})
+
+    def send(self, upload, content=None):
+        content = self.content if content is None else content
+        for start in range(0, len(content), 4):
+            response = self.put(upload['url'], start, content[start:start + 4], len(content))
+        return response
+
+    def test_chunks_resume_and_complete(self):
+        upload = self.start().json()
+        self.assertEqual((upload['offset'], upload['chunk_size']), (0, 4))
+        self.assertEqual(self.put(upload['url'], 0, self.content[:4]).json()['offset'], 4)
+
+        # a lost reply: the client resends from 0 and is told where to go on
+        response = self.put(upload['url'], 0, self.content[:4])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 4)
+        self.assertEqual(self.client.get(upload['url']).json()['offset'], 4)
+
+        for start in range(4, len(self.content), 4):
+            response = self.put(upload['url'], start, self.content[start:start + 4])
+        self.assertTrue(response.json()['complete'])
+        self.assertTrue(ChunkedUpload.objects.get(pk=upload['id']).complete)
+
+    def test_limits_and_checksum(self):
+        self.assertEqual(self.start(b'x' * 65).status_code, 413)
+        self.assertEqual(self.start(sha256='nope').status_code, 400)
+        upload = self.start().json()
+        self.assertEqual(self.put(upload['url'], 0, b'12345').status_code, 413)  # over the chunk size
+
+        response = self.send(upload, b'%PDF tampered permit'[:len(self.content)])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['offset'], 0)  # starts over
+        self.assertTrue(self.send(upload).json()['complete'])
+
+    def test_uploads_are_private(self):
+        upload = self.start().json()
+        User.objects.create_user(username="eve", password="12345")
+        self.client.login(username="eve", password="12345")
+        self.assertEqual(self.client.get(upload['url']).status_code, 404)
+        self.assertEqual(self.put(upload['url'], 0, self.content[:4]).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.start().status_code, 403)
+
+    @override_settings(CHUNKED_UPLOAD_MAX_ACTIVE=2)
+    def test_active_uploads_per_user_are_capped(self):
+        first = self.start().json()
+        self.assertEqual(self.start().status_code, 201)
+        response = self.start()
+        self.assertEqual(response.status_code, 429)
+
+        self.client.delete(first['url'])
+        self.assertEqual(self.start().status_code, 201)
+
+    def test_expiry_job_discards_the_upload(self):
+        upload = ChunkedUpload.objects.get(pk=self.start().json()['id'])
+        path = part_path(upload)
+        self.assertEqual(work_off(), {'done': 0, 'failed': 0})  # not due yet
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(work_off(), {'done': 1, 'failed': 0})
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_rejected_form_closes_the_upload_file(self):
+        upload = self.start().json()
+        self.send(upload)
+        form = ShelterRegistrationForm({'description': '...', 'verification_document_upload': upload['id']},
+                                       user=self.user)
+        opened = []
+
+        def tracked_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch('app.core.uploads.open', tracked_open, create=True):
+            self.assertFalse(form.is_valid())
+        self.assertNotIn('verification_document', form.errors)
+        self.assertEqual(len(opened), 1)
+        self.assertTrue(opened[0].closed)
+
+    def test_registration_form_takes_the_finished_upload(self):
+        upload = self.start().json()
+        form = {'name': 'Happy Paws', 'description': '...', 'address': 'Bangkok', 'phone': '0812345678',
+                'verification_document_upload': upload['id']}
+
+        response = self.client.post(reverse('shelter_register'), form)
+        self.assertEqual(response.status_code, 200)  # not finished yet
+        self.assertIn('verification_document', response.context['form'].errors)
+
+        self.send(upload)
+        response = self.client.post(reverse('shelter_register'), form)
+        self.assertRedirects(response, reverse('shelter_profile'))
+        shelter = ShelterProfile.objects.get(user=self.user)
+        self.assertTrue(shelter.verification_document.name.startswith('shelter_verification_docs/permit'))
+        with shelter.verification_document.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(ChunkedUpload.objects.exists())  # used up, part file gone
+        self.assertFalse(os.listdir(os.path.join(self.media, BLOB_DIR, 'tmp')))
+
+    def test_registration_still_requires_a_document(self):
+        response = self.client.post(reverse('shelter_register'), {
+            'name': 'Happy Paws', 'description': '...', 'address': 'Bangkok', 'phone': '0812345678'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('verification_document', response.context['form'].errors)
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django import forms
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.http import Http404, JsonResponse
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import require_http_methods, require_POST
+
+from app.jobs.queue import enqueue
+
+from .models import ChunkedUpload
+from .storage import BLOB_DIR, CHUNK_SIZE
+
+
+# ----------------------------------------
+# CHUNKED, RESUMABLE UPLOADS (/uploads/)
+# ----------------------------------------
+# A multipart form upload is all or nothing: one dropped connection on a
+# phone and the whole verification document goes again. Instead the browser
+# (static/js/chunked_upload.js) sends the file in pieces:
+#
+#   POST   /uploads/        filename, size, sha256  -> 201 {id, offset: 0, chunk_size, url}
+#   PUT    /uploads/<id>/   one piece, with "Content-Range: bytes <start>-<end>/<size>"
+#                           -> {offset, complete}; 409 {offset} if <start> is not
+#                           where the upload stands (resume from there)
+#   GET    /uploads/<id>/   -> {offset, complete}: where to resume after a reload
+#   DELETE /uploads/<id>/   give up
+#
+# Each piece is copied from the request stream to the part file in
+# CHUNK_SIZE reads, so memory stays flat whatever the file size; uploads
+# over CHUNKED_UPLOAD_MAX_SIZE are refused up front, and so is a new upload
+# from a user who already has CHUNKED_UPLOAD_MAX_ACTIVE. Once the last byte is
+# in, the file is hashed (streamed again) and compared with the announced
+# SHA-256; a mismatch starts the upload over. The form then gets the upload
+# id in a hidden field instead of the file (ChunkedUploadFormMixin).
+#
+# Part files live in MEDIA_ROOT/.blobs/tmp (never served, same filesystem
+# as the media). Each upload queues an expire_upload job that discards it
+# CHUNKED_UPLOAD_EXPIRY after it started, used or not; `dedupe_media` also
+# sweeps part files left without a row.
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def part_path(upload):
+    return default_storage.path(f'{BLOB_DIR}/tmp/upload-{upload.pk.hex}.part')
+
+
+def discard(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def _expiry():
+    return timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+
+
+def expire_upload(upload_id):
+    """Job: discard an upload once CHUNKED_UPLOAD_EXPIRY has passed (if not used up already)."""
+    upload = ChunkedUpload.objects.filter(pk=upload_id).first()
+    if upload is not None:
+        discard(upload)
+
+
+def active_uploads(user):
+    return ChunkedUpload.objects.filter(user=user, created_at__gte=timezone.now() - _expiry())
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def state(upload):
+    return {
+        'id': str(upload.pk),
+        'offset': upload.offset,
+        'size': upload.size,
+        'complete': upload.complete,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'url': reverse('chunked_upload', args=[upload.pk]),
+    }
+
+
+def error(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+@require_POST
+def start_chunked_upload(request):
+    if not request.user.is_authenticated:
+        return error("Sign in to upload files.", 403)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return error("Missing file size.", 400)
+    sha256 = request.POST.get('sha256', '').lower()
+    filename = get_valid_filename(os.path.basename(request.POST.get('filename', '')))[-60:]
+    if size <= 0 or not SHA256.match(sha256) or not filename:
+        return error("A filename, size and SHA-256 are required.", 400)
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        return error(f"Files may be at most {settings.CHUNKED_UPLOAD_MAX_SIZE // (1024 * 1024)} MB.", 413,
+                     max_size=settings.CHUNKED_UPLOAD_MAX_SIZE)
+
+    if active_uploads(request.user).count() >= settings.CHUNKED_UPLOAD_MAX_ACTIVE:
+        return error("Too many uploads in progress, finish or cancel one first.", 429)
+
+    upload = ChunkedUpload.objects.create(user=request.user, filename=filename, size=size, sha256=sha256)
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    enqueue(expire_upload, str(upload.pk), delay=_expiry())
+    return JsonResponse(state(upload), status=201)
+
+
+def _append(request, upload):
+    match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return error("Content-Range: bytes <start>-<end>/<size> is required.", 400)
+    start, end, total = map(int, match.groups())
+    length = end - start + 1
+    if total != upload.size or end >= upload.size or length <= 0:
+        return error("The range does not fit the file.", 416, offset=upload.offset)
+    if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        return error("Chunk too large.", 413, chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+    if upload.complete or start != upload.offset:
+        return error("Resume from offset.", 409, **state(upload))
+
+    received = 0
+    with open(part_path(upload), 'r+b') as out:
+        out.seek(start)
+        out.truncate()  # drop what a broken earlier attempt left past the offset
+        while received < length:
+            chunk = request.read(min(CHUNK_SIZE, length - received))
+            if not chunk:
+                break  # connection dropped: keep what arrived, the client resumes
+            out.write(chunk)
+            received += len(chunk)
+
+    # a retried piece racing its first attempt: only one of them moves the offset
+    if not ChunkedUpload.objects.filter(pk=upload.pk, offset=start).update(offset=start + received):
+        upload.refresh_from_db()
+        return error("Resume from offset.", 409, **state(upload))
+    upload.offset = start + received
+
+    if upload.offset == upload.size:
+        if file_sha256(part_path(upload)) != upload.sha256:
+            open(part_path(upload), 'wb').close()
+            ChunkedUpload.objects.filter(pk=upload.pk).update(offset=0)
+            upload.offset = 0
+            return error("Checksum mismatch, upload the file again.", 422, **state(upload))
+        upload.complete = True
+        ChunkedUpload.objects.filter(pk=upload.pk).update(complete=True)
+    return JsonResponse(state(upload))
+
+
+@require_http_methods(['GET', 'HEAD', 'PUT', 'DELETE'])
+def chunked_upload(request, upload_id):
+    if not request.user.is_authenticated:
+        return error("Sign in to upload files.", 403)
+    try:
+        upload = ChunkedUpload.objects.get(pk=upload_id, user=request.user)
+    except ChunkedUpload.DoesNotExist:
+        raise Http404("No such upload.")
+    if request.method == 'PUT':
+        return _append(request, upload)
+    if request.method == 'DELETE':
+        discard(upload)
+        return JsonResponse({'id': str(upload_id), 'deleted': True})
+    return JsonResponse(state(upload))
+
+
+# ----------------------------------------
+# FORMS
+# ----------------------------------------
+class ChunkedUploadFormMixin:
+    """
+    For ModelForms: each file field in `chunked_upload_fields` gets a hidden
+    "<name>_upload" field. The browser fills it with the id of a complete
+    ChunkedUpload of the signed-in user (pass `user=` to the form) instead
+    of sending the file; clean() then hands that file to the field, as if it
+    had come with the form. A plain file upload keeps working without JS.
+    """
+    chunked_upload_fields = ()
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.chunked_uploads = []
+        self.chunked_required = set()
+        for name in self.chunked_upload_fields:
+            hidden = f'{name}_upload'
+            if self.fields[name].required:
+                # either the file or the upload id; checked in clean()
+                self.fields[name].required = False
+                self.chunked_required.add(name)
+            self.fields[hidden] = forms.UUIDField(required=False, widget=forms.HiddenInput)
+            self.fields[name].widget.attrs.update({
+                'data-chunked-upload': reverse_lazy('start_chunked_upload'),
+                'data-upload-target': self[hidden].auto_id,
+                'data-max-size': settings.CHUNKED_UPLOAD_MAX_SIZE,
+            })
+
+    def clean(self):
+        for name in self.chunked_upload_fields:
+            upload_id = self.cleaned_data.get(f'{name}_upload')
+            if not upload_id or self.files.get(self.add_prefix(name)):
+                if name in self.chunked_required and not self.cleaned_data.get(name) and name not in self.errors:
+                    self.add_error(name, self.fields[name].error_messages['required'])
+                continue
+            upload = None
+            if self.user is not None and self.user.is_authenticated:
+                upload = ChunkedUpload.objects.filter(pk=upload_id, user=self.user, complete=True).first()
+            if upload is None:
+                self.add_error(name, "The upload was not found or is not finished, please choose the file again.")
+                continue
+            file = UploadedFile(open(part_path(upload), 'rb'), name=upload.filename, size=upload.size)
+            try:
+                self.cleaned_data[name] = self.fields[name].clean(file, self.initial.get(name))
+            except forms.ValidationError as e:
+                file.close()
+                self.add_error(name, e)
+                continue
+            self.chunked_uploads.append((upload, file))
+        return super().clean()
+
+    def full_clean(self):
+        super().full_clean()
+        if self._errors:
+            # the form goes back to the user, nothing is saved from these files
+            for upload, file in self.chunked_uploads:
+                file.close()
+            self.chunked_uploads = []
+
+    def save(self, commit=True):
+        instance = super().save(commit)
+        if commit:
+            # stored under its upload_to name by now
+            for upload, file in self.chunked_uploads:
+                file.close()
+                discard(upload)
+            self.chunked_uploads = []
+        return instance
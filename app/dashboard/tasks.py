@@ -0,0 +1,11 @@
+from django.contrib.auth.models import User
+
+
+# ----------------------------------------
+# BACKGROUND JOBS (run by `manage.py run_jobs`, see app/jobs)
+# ----------------------------------------
+def delete_user(user_id):
+    """Delete a user and everything that cascades from them (posts, stores, shelter, ...)."""
+    user = User.objects.filter(pk=user_id, is_superuser=False).first()
+    if user is not None:
+        user.delete()
@@ -1,3 +1,34 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from app.jobs.models import Job
+from app.jobs.queue import work_off
+from app.posts.models import Post
+
+
+class DeleteUserTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="12345")
+        self.user = User.objects.create_user(username="john", password="12345")
+        Post.objects.create(title="Cat", content="...", author=self.user)
+        self.client.login(username="admin", password="12345")
+
+    def test_delete_runs_in_the_background(self):
+        response = self.client.get(reverse('delete_user', args=[self.user.id]))
+        self.assertRedirects(response, reverse('dashboard_users'))
+
+        # locked out at once, deleted (with their posts) by the job
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(Job.objects.get().task, 'app.dashboard.tasks.delete_user')
+
+        self.assertEqual(work_off(), {'done': 1, 'failed': 0})
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Post.objects.exists())
+
+    def test_admins_are_not_deleted(self):
+        other = User.objects.create_superuser(username="root", password="12345")
+        self.client.get(reverse('delete_user', args=[other.id]))
+        self.assertTrue(User.objects.get(pk=other.pk).is_active)
+        self.assertFalse(Job.objects.exists())
@@ -4,6 +4,8 @@ from app.shelters.models import ShelterProfile
 from django.contrib.auth.models import User
 from django.contrib import messages
 from app.stores.models import Store
+from app.jobs.queue import enqueue
+from . import tasks
 
 
 
@@ -70,8 +72,12 @@ def delete_user(request, user_id):
         messages.error(request, "You cannot delete another admin.")
         return redirect("dashboard_users")
 
-    user.delete()
-    messages.success(request, "User deleted successfully.")
+    # the cascade (posts, comments, stores, products, ...) can be large, so it
+    # runs as a background job; the account is locked out right away
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    enqueue(tasks.delete_user, user.id, priority=10)
+    messages.success(request, "User deactivated and scheduled for deletion.")
     return redirect("dashboard_users")
 
 @superuser_required
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.jobs.models import Job
+from app.jobs.queue import work_off
+from app.jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (keep one running, e.g. under systemd)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help="Only run jobs of this queue (repeat for several). Default: all.",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help="Size of the worker pool (default 4).",
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help="Use a process pool instead of threads (for CPU-bound queues such as images).",
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help="Seconds between checks for new jobs when idle (default 1).",
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once no job is ready instead of waiting for more.",
+        )
+        parser.add_argument(
+            '--inline', action='store_true',
+            help="Run ready jobs one by one in this process, then exit (debugging).",
+        )
+        parser.add_argument(
+            '--purge', type=int, metavar='DAYS',
+            help="Delete jobs that finished (done or failed) more than DAYS days ago, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options['purge'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['purge'])
+            deleted, _ = Job.objects.filter(
+                status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished job(s)."))
+            return
+
+        if options['inline']:
+            counts = work_off(options['queues'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Ran {counts['done'] + counts['failed']} job(s), {counts['failed']} failed."
+            ))
+            return
+
+        worker = Worker(
+            queues=options['queues'],
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            poll_interval=options['poll'],
+        )
+        pool = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f"Worker {worker.name}: {options['concurrency']} {pool}, queues: "
+                          f"{', '.join(options['queues'] or ['all'])}")
+        finished = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f"Stopped after {finished} job(s)."))
@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """One call of a function, run later by `manage.py run_jobs` (see queue.py)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    ]
+
+    task = models.CharField(max_length=255)         # dotted path of the function
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+
+    queue = models.CharField(max_length=50, default='default')
+    priority = models.IntegerField(default=0)         # higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)  # not before; moved on retry
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    # lease of the worker running it; an expired lease means the worker died
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # claiming: WHERE status='queued' AND queue IN (...) AND run_at <= now
+            #           ORDER BY priority DESC, run_at, id
+            models.Index(fields=['status', 'queue', '-priority', 'run_at', 'id'], name='job_ready_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_lease_idx'),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f'{self.task} #{self.pk} ({self.status})'
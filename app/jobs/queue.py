@@ -0,0 +1,200 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+# ----------------------------------------
+# DATABASE-BACKED JOB QUEUE
+# ----------------------------------------
+# enqueue(func, *args) stores a Job row; `manage.py run_jobs` (worker.py)
+# claims ready rows and calls the functions in a thread or process pool.
+# There is no broker: the database is the queue, so a job enqueued inside a
+# transaction only exists if that transaction commits, and queued work
+# survives restarts.
+#
+#   * priorities   higher `priority` is claimed first, then oldest run_at
+#   * retries      a failed call is re-queued after RETRY_BASE_DELAY * 2**n
+#                  (with jitter, capped at RETRY_MAX_DELAY) until
+#                  max_attempts, then left as `failed` with its traceback
+#   * leases       a claimed job belongs to its worker until locked_until;
+#                  the worker renews the lease of its running jobs every
+#                  HEARTBEAT, so only the jobs of a worker that died are
+#                  retried, LEASE after its last heartbeat
+#   * concurrency  settings.JOB_QUEUE_CONCURRENCY caps how many jobs of a
+#                  queue run at once across all workers. The count of
+#                  running jobs is part of the claiming UPDATE, so on SQLite
+#                  (one writer at a time) the cap is exact; on PostgreSQL two
+#                  workers claiming in the same instant can each see the
+#                  other's job as not yet running, so the cap is best-effort
+#                  and can be passed by one job per racing worker
+#
+# Each call runs in its own transaction, so a failed attempt leaves no
+# partial writes behind. Jobs should still be safe to run twice: a job that
+# outlives its lease can be picked up again.
+LEASE = timedelta(minutes=10)
+HEARTBEAT = timedelta(minutes=1)
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+
+def task_path(func):
+    return func if isinstance(func, str) else f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, queue='default', priority=0, delay=None, max_attempts=5, **kwargs):
+    """
+    Run `func(*args, **kwargs)` later on a worker. `func` must be importable
+    by its dotted path and the arguments JSON-serializable (pass ids, not
+    model instances).
+    """
+    return Job.objects.create(
+        task=task_path(func),
+        args=list(args),
+        kwargs=kwargs,
+        queue=queue,
+        priority=priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts,
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts` (1 = after the first failure)."""
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+# ----------------------------------------
+# CLAIMING
+# ----------------------------------------
+def _limits():
+    return getattr(settings, 'JOB_QUEUE_CONCURRENCY', {})
+
+
+def _running(now):
+    return Job.objects.filter(status=Job.RUNNING, locked_until__gt=now)
+
+
+def _free_slots(now):
+    """{queue: jobs it may still start} for the queues with a limit."""
+    limits = _limits()
+    running = dict(
+        _running(now).filter(queue__in=limits)
+        .values_list('queue').annotate(count=Count('id')).order_by()
+    )
+    return {queue: limit - running.get(queue, 0) for queue, limit in limits.items()}
+
+
+def _claimable(job, now):
+    """The queued row of `job`, if its queue is still under its limit."""
+    row = Job.objects.filter(pk=job.pk, status=Job.QUEUED)
+    limit = _limits().get(job.queue)
+    if limit is None:
+        return row
+    running = (
+        _running(now).filter(queue=job.queue)
+        .values('queue').annotate(count=Count('id')).values('count')
+    )
+    return row.alias(
+        running=Coalesce(Subquery(running, output_field=IntegerField()), Value(0))
+    ).filter(running__lt=limit)
+
+
+def claim(worker, queues=None, limit=1, now=None):
+    """Mark up to `limit` ready jobs as running for `worker` and return them."""
+    now = now or timezone.now()
+    slots = _free_slots(now)
+
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    if queues:
+        ready = ready.filter(queue__in=queues)
+    full = [queue for queue, free in slots.items() if free <= 0]
+    if full:
+        ready = ready.exclude(queue__in=full)
+
+    claimed = []
+    # a few extra candidates, since other workers may take some first
+    for job in ready.order_by('-priority', 'run_at', 'id')[:limit * 4]:
+        if len(claimed) == limit:
+            break
+        if slots.get(job.queue, 1) <= 0:
+            continue
+        # compare-and-set: only one worker turns a queued row into a running
+        # one, and only while its queue has a free slot (see module comment)
+        won = _claimable(job, now).update(
+            status=Job.RUNNING, locked_by=worker, locked_until=now + LEASE, attempts=F('attempts') + 1,
+        )
+        if not won:
+            continue
+        if job.queue in slots:
+            slots[job.queue] -= 1
+        job.status, job.locked_by, job.locked_until = Job.RUNNING, worker, now + LEASE
+        job.attempts += 1
+        claimed.append(job)
+    return claimed
+
+
+def renew_leases(worker, now=None):
+    """Extend the lease of every job `worker` is running (its heartbeat). Returns how many."""
+    now = now or timezone.now()
+    return Job.objects.filter(status=Job.RUNNING, locked_by=worker).update(locked_until=now + LEASE)
+
+
+# ----------------------------------------
+# RUNNING
+# ----------------------------------------
+def _finish(job, **fields):
+    # only while we still hold the lease
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        locked_by='', locked_until=None, **fields
+    )
+
+
+def _fail(job, error, now=None):
+    now = now or timezone.now()
+    if job.attempts >= job.max_attempts:
+        return _finish(job, status=Job.FAILED, last_error=error, finished_at=now)
+    return _finish(job, status=Job.QUEUED, last_error=error, run_at=now + backoff(job.attempts))
+
+
+def run_job(job):
+    """Call a claimed job's function and record the outcome. Returns True on success."""
+    try:
+        func = import_string(job.task)
+        with transaction.atomic():
+            func(*job.args, **job.kwargs)
+    except Exception:
+        _fail(job, traceback.format_exc())
+        return False
+    _finish(job, status=Job.DONE, last_error='', finished_at=timezone.now())
+    return True
+
+
+def requeue_stale(now=None):
+    """Retry (or fail) running jobs whose worker let the lease expire. Returns how many."""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    return sum(_fail(job, f'lease expired (worker {job.locked_by} stopped?)', now) for job in stale)
+
+
+def work_off(queues=None, limit=None, worker='inline'):
+    """
+    Run ready jobs one by one in this thread until none are left (or `limit`
+    ran). Returns {'done': n, 'failed': n}. Used by tests and `run_jobs --inline`.
+    """
+    counts = {'done': 0, 'failed': 0}
+    while limit is None or sum(counts.values()) < limit:
+        jobs = claim(worker, queues)
+        if not jobs:
+            break
+        counts['done' if run_job(jobs[0]) else 'failed'] += 1
+    return counts
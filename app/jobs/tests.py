@@ -0,0 +1,145 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from app.jobs.models import Job
+from app.jobs.queue import LEASE, claim, enqueue, renew_leases, requeue_stale, run_job, work_off
+
+CALLS = []
+
+
+# job functions used by the tests (looked up by dotted path)
+def remember(value, suffix=''):
+    CALLS.append(f'{value}{suffix}')
+
+
+def create_user_then_fail(username):
+    User.objects.create_user(username=username)
+    raise RuntimeError("boom")
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueued_call_runs_with_its_arguments(self):
+        job = enqueue(remember, 'a', suffix='!')
+        self.assertEqual(job.task, 'app.jobs.tests.remember')
+        self.assertEqual(work_off(), {'done': 1, 'failed': 0})
+        self.assertEqual(CALLS, ['a!'])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.DONE, 1, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_higher_priority_first_then_oldest(self):
+        enqueue(remember, 'low', priority=-1)
+        enqueue(remember, 'first')
+        enqueue(remember, 'urgent', priority=10)
+        enqueue(remember, 'second')
+        enqueue(remember, 'later', delay=timedelta(hours=1))
+        work_off()
+        self.assertEqual(CALLS, ['urgent', 'first', 'second', 'low'])
+
+    def test_failure_is_rolled_back_and_retried_with_backoff(self):
+        job = enqueue(create_user_then_fail, 'ghost', max_attempts=3)
+        self.assertEqual(work_off(), {'done': 0, 'failed': 1})
+        self.assertFalse(User.objects.filter(username='ghost').exists())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        first_delay = job.run_at - timezone.now()
+        self.assertGreater(first_delay, timedelta(seconds=4))
+
+        # not ready again until the backoff has passed
+        self.assertEqual(work_off(), {'done': 0, 'failed': 0})
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        work_off()
+        job.refresh_from_db()
+        self.assertGreater(job.run_at - timezone.now(), first_delay / 2)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        work_off()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+
+    def test_unknown_task_fails_instead_of_crashing_the_worker(self):
+        job = enqueue('app.jobs.tests.no_such_function', max_attempts=1)
+        self.assertEqual(work_off(), {'done': 0, 'failed': 1})
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @override_settings(JOB_QUEUE_CONCURRENCY={'images': 1})
+    def test_queue_concurrency_limit_spans_workers(self):
+        enqueue(remember, 'a', queue='images')
+        enqueue(remember, 'b', queue='images')
+        enqueue(remember, 'c')
+
+        first = claim('worker-1', limit=10)
+        self.assertEqual(sorted(job.queue for job in first), ['default', 'images'])
+        # the other images job waits until the running one finishes
+        self.assertEqual(claim('worker-2', limit=10), [])
+        for job in first:
+            run_job(job)
+        self.assertEqual([job.args for job in claim('worker-2')], [['b']])
+
+    @override_settings(JOB_QUEUE_CONCURRENCY={'images': 1})
+    def test_claim_rechecks_the_limit_when_it_takes_the_row(self):
+        enqueue(remember, 'a', queue='images')
+        enqueue(remember, 'b', queue='images')
+        claim('worker-1')
+        # worker-2 counted the free slots before worker-1 took the first job
+        with mock.patch('app.jobs.queue._free_slots', return_value={'images': 1}):
+            self.assertEqual(claim('worker-2'), [])
+
+    def test_only_one_worker_claims_a_job(self):
+        enqueue(remember, 'a')
+        self.assertEqual(len(claim('worker-1')), 1)
+        self.assertEqual(claim('worker-2'), [])
+
+    def test_expired_lease_is_retried(self):
+        job = enqueue(remember, 'a')
+        claim('dead-worker')
+        self.assertEqual(requeue_stale(), 0)
+
+        self.assertEqual(requeue_stale(now=timezone.now() + LEASE + timedelta(seconds=1)), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("lease expired", job.last_error)
+
+    def test_heartbeat_keeps_a_long_job_leased(self):
+        job = enqueue(remember, 'a')
+        claim('busy-worker')
+        later = timezone.now() + LEASE - timedelta(seconds=1)
+        self.assertEqual(renew_leases('busy-worker', now=later), 1)
+        self.assertEqual(renew_leases('other-worker', now=later), 0)
+
+        self.assertEqual(requeue_stale(now=timezone.now() + LEASE + timedelta(seconds=1)), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, 'busy-worker'))
+
+    def test_purge_deletes_old_finished_jobs(self):
+        enqueue(remember, 'a')
+        work_off()
+        Job.objects.update(finished_at=timezone.now() - timedelta(days=30))
+        enqueue(remember, 'b')
+        call_command('run_jobs', purge=7, stdout=StringIO())
+        self.assertEqual(list(Job.objects.values_list('status', flat=True)), [Job.QUEUED])
+
+
+class WorkerPoolTest(TransactionTestCase):
+    def test_thread_pool_runs_everything_then_exits(self):
+        CALLS.clear()
+        for value in range(6):
+            enqueue(remember, value)
+        out = StringIO()
+        call_command('run_jobs', burst=True, concurrency=3, poll=0.05, stdout=out)
+        self.assertEqual(sorted(CALLS), [str(value) for value in range(6)])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 6)
+        self.assertIn("Stopped after 6 job(s).", out.getvalue())
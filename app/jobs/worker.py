@@ -0,0 +1,98 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.db import connections
+
+from .models import Job
+from .queue import HEARTBEAT, claim, renew_leases, requeue_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------
+# WORKER (manage.py run_jobs)
+# ----------------------------------------
+# One loop claims jobs while the pool has free slots and hands them to a
+# thread pool (I/O bound work, the default) or a process pool (CPU bound
+# work such as image encoding, `--processes`). Processes are started with
+# "spawn" so none inherits the parent's database connections. SIGINT/SIGTERM
+# stop claiming and let the running jobs finish.
+#
+# While jobs run, the loop wakes at least every HEARTBEAT to renew their
+# leases, so a job may run longer than LEASE as long as its worker is alive.
+def _setup_process():
+    django.setup()
+
+
+def _run_in_pool(job_id, worker):
+    try:
+        job = Job.objects.get(pk=job_id, status=Job.RUNNING, locked_by=worker)
+        return run_job(job)
+    except Job.DoesNotExist:
+        return False  # lease expired and someone else has it
+    finally:
+        # pool threads/processes each hold their own connections
+        connections.close_all()
+
+
+class Worker:
+    def __init__(self, queues=None, concurrency=4, processes=False, poll_interval=1.0):
+        self.queues = queues or None
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def _executor(self):
+        if self.processes:
+            return ProcessPoolExecutor(
+                self.concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=_setup_process,
+            )
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def run(self, burst=False):
+        """Work until stopped, or with burst=True until nothing is ready. Returns jobs finished."""
+        previous = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        finished = 0
+        running = set()
+        beat = time.monotonic()
+        try:
+            with self._executor() as executor:
+                while not self.stopping:
+                    if running and time.monotonic() - beat >= HEARTBEAT.total_seconds():
+                        renew_leases(self.name)
+                        beat = time.monotonic()
+                    requeue_stale()
+                    free = self.concurrency - len(running)
+                    for job in claim(self.name, self.queues, free) if free else []:
+                        logger.info("job %s: %s (attempt %s)", job.pk, job.task, job.attempts)
+                        running.add(executor.submit(_run_in_pool, job.pk, self.name))
+
+                    if not running:
+                        if burst:
+                            break
+                        time.sleep(self.poll_interval)
+                        continue
+                    # wait for a free slot; with slots free, look for new jobs every poll
+                    timeout = HEARTBEAT.total_seconds() if len(running) == self.concurrency else self.poll_interval
+                    done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    finished += len(done)
+                while running:
+                    # stopping: keep renewing the leases of the jobs still running
+                    done, running = wait(running, timeout=HEARTBEAT.total_seconds())
+                    finished += len(done)
+                    renew_leases(self.name)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        return finished
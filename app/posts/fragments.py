@@ -0,0 +1,108 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+
+
+# ----------------------------------------
+# VERSIONED FRAGMENT CACHE
+# ----------------------------------------
+# Cards (post cards, product tiles) are cached under a key built from the
+# `cache_version` column of every row they render: the object itself plus
+# the related rows listed in its `fragment_depends_on` (e.g. the author's
+# profile for a post card). Signals give a row a new version whenever
+# something shown on the card changes, so an old fragment is simply never
+# looked up again -- nothing has to be deleted.
+#
+# Versions are fresh time_ns() tokens rather than +1 increments, so a stale
+# in-memory instance saved later can never reuse a version that an older
+# fragment was stored under.
+STATS_KEY = 'fragments:stats:%s'
+
+_pending = Counter()
+
+
+def new_version():
+    return time.time_ns()
+
+
+def stamp(instance):
+    """Give `instance` a new version before it is saved (pre_save)."""
+    instance.cache_version = new_version()
+
+
+def bump(model, **filters):
+    """Give the matching rows a new version without loading them."""
+    model.objects.filter(**filters).update(cache_version=new_version())
+
+
+def _resolve(obj, path):
+    for name in path.split('.'):
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def fragment_key(name, obj, vary_on=()):
+    """Cache key for fragment `name` of `obj` (see module comment)."""
+    parts = [obj._meta.label_lower, obj.pk, obj.cache_version]
+    for path in getattr(obj, 'fragment_depends_on', ()):
+        related = _resolve(obj, path)
+        parts.append(related.cache_version if related is not None else None)
+    parts.extend(vary_on)
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'fragments:{name}:{digest}'
+
+
+def get_or_render(name, obj, render, vary_on=()):
+    key = fragment_key(name, obj, vary_on)
+    html = cache.get(key)
+    if html is not None:
+        _pending['hits'] += 1
+        return html
+
+    _pending['misses'] += 1
+    html = render()
+    cache.set(key, html, settings.FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+# ----------------------------------------
+# HIT / MISS STATISTICS
+# ----------------------------------------
+# Counted in-process while rendering and added to shared counters in the
+# cache once per request, so every worker reports into the same numbers.
+def flush_stats(**kwargs):
+    for kind in ('hits', 'misses'):
+        count = _pending.pop(kind, 0)
+        if not count:
+            continue
+        try:
+            cache.incr(STATS_KEY % kind, count)
+        except ValueError:
+            cache.add(STATS_KEY % kind, 0, None)
+            cache.incr(STATS_KEY % kind, count)
+
+
+def fragment_stats():
+    flush_stats()
+    hits = cache.get(STATS_KEY % 'hits', 0)
+    misses = cache.get(STATS_KEY % 'misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    _pending.clear()
+    cache.delete_many([STATS_KEY % 'hits', STATS_KEY % 'misses'])
+
+
+request_finished.connect(flush_stats, dispatch_uid='fragment_cache_flush_stats')
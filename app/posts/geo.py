@@ -0,0 +1,279 @@
+import csv
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+
+# ----------------------------------------
+# OFFLINE GEOCODING (Post.location -> lat/lng)
+# ----------------------------------------
+# data/th_gazetteer.csv lists Thai provinces, districts (khet/amphoe) and
+# subdistricts (khwaeng/tambon) with a centre point. `key` is the place's
+# path, e.g. "bangkok/chatuchak/lat-yao", so the level and parents come for
+# free. More rows can be appended in the same format.
+#
+# geocode() looks for every gazetteer name (Thai, English, aliases) in the
+# free-text location and keeps the most specific match, preferring places
+# whose province/district is mentioned too ("ลาดยาว จตุจักร" -> Lat Yao).
+#
+# Most places are only known down to the province, whose centre can be
+# 50 km from the post. Post.geocode_level records how precise the point is:
+# radius searches list province-level points after the precise ones, and
+# only when the province centre is within the radius + PROVINCE_TOLERANCE_KM.
+GAZETTEER = Path(__file__).resolve().parent / 'data' / 'th_gazetteer.csv'
+
+# Short Thai names are also everyday words ("เลย", "ตาก" in "ตากสิน"), so
+# they only count when written with an administrative prefix or alone.
+SHORT_THAI_NAME = 3
+THAI_PREFIX = r'(?:จังหวัด|จ\.|อำเภอ|อ\.|เขต|แขวง|ตำบล|ต\.)\s*'
+THAI = re.compile(r'[\u0E00-\u0E7F]')
+
+PROVINCE, DISTRICT, SUBDISTRICT = 0, 1, 2
+PROVINCE_TOLERANCE_KM = 40     # about the radius of a typical province
+
+
+@dataclass(frozen=True)
+class Place:
+    key: str
+    name_th: str
+    name_en: str
+    lat: float
+    lng: float
+
+    @property
+    def level(self):
+        return self.key.count('/')  # PROVINCE, DISTRICT or SUBDISTRICT
+
+    def is_within(self, other):
+        return self.key.startswith(other.key + '/')
+
+
+def _name_pattern(name):
+    name = name.strip().lower()
+    if THAI.search(name):
+        if len(name) <= SHORT_THAI_NAME:
+            return re.compile(rf'(?:^\s*|{THAI_PREFIX}){re.escape(name)}(?:\s*$|(?=\s))')
+        return re.compile(re.escape(name))
+    # latin: whole words, spaces optional ("chon buri" / "chonburi")
+    words = [re.escape(word) for word in name.split()]
+    return re.compile(r'\b' + r'\s*'.join(words) + r'\b')
+
+
+@lru_cache(maxsize=1)
+def gazetteer():
+    """[(compiled pattern, Place)] for every name of every place."""
+    entries = []
+    with open(GAZETTEER, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            place = Place(row['key'], row['name_th'], row['name_en'], float(row['lat']), float(row['lng']))
+            names = [row['name_th'], row['name_en'], *filter(None, row['aliases'].split('|'))]
+            entries.extend((_name_pattern(name), place) for name in names)
+    return entries
+
+
+@lru_cache(maxsize=1)
+def provinces():
+    """Every province-level Place of the gazetteer."""
+    return tuple({place for _, place in gazetteer() if place.level == PROVINCE})
+
+
+def geocode(text):
+    """Return the best matching Place for free-text `text`, or None."""
+    text = (text or '').lower()
+    if not text.strip():
+        return None
+
+    found = {}  # place -> longest matched span
+    for pattern, place in gazetteer():
+        for match in pattern.finditer(text):
+            span = match.span()
+            if place not in found or span[1] - span[0] > found[place][1] - found[place][0]:
+                found[place] = span
+
+    # a name inside a longer matched name doesn't count ("บางนา" in "บางนาเหนือ")
+    def inside_other(place):
+        start, end = found[place]
+        return any(
+            other is not place and o_start <= start and end <= o_end and (o_end - o_start) > (end - start)
+            for other, (o_start, o_end) in found.items()
+        )
+
+    candidates = [place for place in found if not inside_other(place)]
+    if not candidates:
+        return None
+
+    def rank(place):
+        mentioned_parents = sum(1 for other in candidates if place.is_within(other))
+        return (mentioned_parents, place.level)
+
+    best = max(rank(place) for place in candidates)
+    winners = [place for place in candidates if rank(place) == best]
+    if len(winners) > 1:
+        # ambiguous (same name in two provinces): fall back to what they share
+        common = [place for place in candidates if all(w.is_within(place) for w in winners)]
+        return max(common, key=lambda place: place.level) if common else None
+    return winners[0]
+
+
+def geocode_fields(text):
+    """Post's latitude, longitude, geohash and geocode_level for location `text`."""
+    place = geocode(text)
+    if place is None:
+        return {'latitude': None, 'longitude': None, 'geohash': '', 'geocode_level': None}
+    return {
+        'latitude': place.lat,
+        'longitude': place.lng,
+        'geohash': encode_geohash(place.lat, place.lng),
+        'geocode_level': place.level,
+    }
+
+
+# ----------------------------------------
+# GEOHASH (spatial index on Post.geohash)
+# ----------------------------------------
+# Nearby points share a geohash prefix, so "posts in this cell" is a range
+# scan on an ordinary B-tree index. A radius query covers the circle's
+# bounding box with the smallest cells that take at most MAX_COVER_CELLS
+# (5 km: 9-16 cells of ~5 km), reads those index ranges, drops rows outside
+# the bounding box, and computes the exact distance of the rest in SQL,
+# where the newest `limit` are picked.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 7          # ~150 m cells
+MAX_COVER_CELLS = 36
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size_deg(precision):
+    """(height, width) of a geohash cell in degrees."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(lat, lng, radius_km):
+    """(south, north, west, east) of the circle, in degrees."""
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lng = min(180.0, radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6)))
+    return max(-90.0, lat - d_lat), min(90.0, lat + d_lat), lng - d_lng, lng + d_lng
+
+
+def covering_prefixes(lat, lng, radius_km):
+    """Geohash prefixes whose cells together cover the circle."""
+    south, north, west, east = bounding_box(lat, lng, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size_deg(precision)
+        first_row, first_col = math.floor((south + 90.0) / height), math.floor((west + 180.0) / width)
+        rows = math.floor((north + 90.0) / height) - first_row + 1
+        cols = math.floor((east + 180.0) / width) - first_col + 1
+        if rows * cols <= MAX_COVER_CELLS:
+            break
+
+    prefixes = set()
+    for row in range(rows):
+        cell_lat = min(90.0, (first_row + row + 0.5) * height - 90.0)
+        for col in range(cols):
+            cell_lng = ((first_col + col + 0.5) * width) % 360.0 - 180.0
+            prefixes.add(encode_geohash(cell_lat, cell_lng, precision))
+    return sorted(prefixes)
+
+
+def prefix_filter(prefixes, field='geohash'):
+    """Q matching rows whose geohash starts with any of `prefixes`, as index ranges."""
+    condition = Q()
+    for prefix in prefixes:
+        upper = prefix + 'z' * (GEOHASH_PRECISION - len(prefix))
+        condition |= Q(**{f'{field}__gte': prefix, f'{field}__lte': upper})
+    return condition
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_expression(lat, lng, lat_field='latitude', lng_field='longitude'):
+    """distance_km() from (lat, lng) to each row's point, as a database expression."""
+    def const(value):
+        return Value(value, output_field=FloatField())
+
+    phi = Radians(F(lat_field))
+    a = (
+        Power(Sin((phi - const(math.radians(lat))) / const(2.0)), 2)
+        + const(math.cos(math.radians(lat))) * Cos(phi)
+        * Power(Sin((Radians(F(lng_field)) - const(math.radians(lng))) / const(2.0)), 2)
+    )
+    return const(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+
+
+def within_radius(queryset, lat, lng, radius_km, limit, approximate=True):
+    """
+    Posts from `queryset` within `radius_km` of (lat, lng), newest first, at
+    most `limit`. Each result gets `distance_km` and `approximate` attributes.
+
+    Only the rows in the covering geohash cells and the bounding box are
+    read and measured; the sort and LIMIT run in the database over those.
+    Points only known down to the province are left to a second query
+    (unless `approximate` is False) that fills the remaining places with
+    posts of the provinces whose centre is within radius_km +
+    PROVINCE_TOLERANCE_KM; such a point is the centre itself, so that is a
+    lookup of a few geohashes.
+    """
+    south, north, west, east = bounding_box(lat, lng, radius_km)
+    box = Q(latitude__gte=south, latitude__lte=north)
+    if -180.0 <= west and east <= 180.0:
+        box &= Q(longitude__gte=west, longitude__lte=east)
+    posts = list(
+        queryset.filter(prefix_filter(covering_prefixes(lat, lng, radius_km)), box)
+        .exclude(geocode_level=PROVINCE)
+        .annotate(distance_km=distance_expression(lat, lng))
+        .filter(distance_km__lte=radius_km)
+        .order_by('-created_at', '-id')[:limit]
+    )
+    for post in posts:
+        post.approximate = False
+
+    centres = [
+        encode_geohash(place.lat, place.lng) for place in provinces()
+        if distance_km(lat, lng, place.lat, place.lng) <= radius_km + PROVINCE_TOLERANCE_KM
+    ]
+    if approximate and centres and len(posts) < limit:
+        coarse = list(
+            queryset.filter(geocode_level=PROVINCE, geohash__in=centres)
+            .annotate(distance_km=distance_expression(lat, lng))
+            .order_by('-created_at', '-id')[:limit - len(posts)]
+        )
+        for post in coarse:
+            post.approximate = True
+        posts += coarse
+    return posts
@@ -0,0 +1,241 @@
+import os
+from base64 import b64encode
+from io import BytesIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from app.jobs.queue import enqueue
+
+from .fragments import bump
+
+
+# ----------------------------------------
+# UPLOADED IMAGE PIPELINE
+# ----------------------------------------
+# Models list their image fields in `image_fields`. Signals (posts/signals.py,
+# stores/signals.py) run every new upload through two steps:
+#
+#   pre_save   pending_images(): apply the EXIF orientation, drop the EXIF data
+#              (camera details, GPS position) and shrink phone-sized originals
+#              to MAX_ORIGINAL_SIZE, before the file reaches storage; record
+#              the size and a tiny placeholder in the model's `image_meta`
+#   post_save  queue_renditions(): a background job (app/jobs, queue
+#              "images") runs build_renditions(), which writes a copy at each
+#              RENDITION_WIDTHS in every RENDITION_FORMATS under
+#              renditions/<original name>/, then renews the cached cards
+#
+# The {% responsive_image %} tag (templatetags/images.py) then lets the
+# browser pick the smallest AVIF/WebP file for the slot, falling back to the
+# original <img> for images without renditions. From `image_meta` it adds the
+# width/height (the box is reserved before the file arrives) and paints the
+# placeholder, a PLACEHOLDER_SIZE px WebP inlined as a data: URI of a few
+# hundred bytes, as the background of the lazily loaded <img>.
+# `manage.py build_image_renditions` covers files uploaded before this.
+MAX_ORIGINAL_SIZE = 2560
+RENDITION_WIDTHS = (160, 320, 640, 1280)
+RENDITION_DIR = 'renditions'
+
+# in order of preference: <source> elements are listed in this order
+RENDITION_FORMATS = {
+    'avif': {'quality': 50},
+    'webp': {'quality': 75, 'method': 6},
+}
+
+# re-encoding options for the cleaned original, by format
+ORIGINAL_FORMATS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+READY_KEY = 'images:renditions:%s'
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_OPTIONS = {'quality': 40}
+
+
+def rendition_name(name, width, fmt):
+    stem, _ = os.path.splitext(name)
+    return f'{RENDITION_DIR}/{stem}/{width}.{fmt}'
+
+
+# ----------------------------------------
+# PRE_SAVE: CLEAN THE UPLOAD
+# ----------------------------------------
+def open_image(file):
+    """The decoded image in `file` (left at position 0), or None if it is not one."""
+    file.seek(0)
+    try:
+        image = Image.open(file)
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        return None
+    finally:
+        file.seek(0)
+    return image
+
+
+def clean_image(file, image=None):
+    """
+    Return `file` re-encoded upright and without metadata as a ContentFile,
+    or None if it is not a still image in a format we re-encode.
+    """
+    image = image or open_image(file)
+    if image is None:
+        return None
+    fmt = image.format
+    if fmt not in ORIGINAL_FORMATS or getattr(image, 'is_animated', False):
+        return None
+
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_ORIGINAL_SIZE, MAX_ORIGINAL_SIZE), Image.LANCZOS)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    out = BytesIO()
+    options = dict(ORIGINAL_FORMATS[fmt])
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(out, format=fmt, **options)
+    return ContentFile(out.getvalue(), name=os.path.basename(file.name))
+
+
+def describe_image(image, size=None):
+    """
+    `image_meta` entry of a decoded image: its upright size (or `size`, the
+    size it was stored at) and the data: URI of a tiny blurry copy ('' for
+    images with transparency, which would show the placeholder through).
+    """
+    image = ImageOps.exif_transpose(image)
+    width, height = size or image.size
+    placeholder = ''
+    if 'A' not in image.getbands() and 'transparency' not in image.info:
+        tiny = image.convert('RGB')
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+        out = BytesIO()
+        tiny.save(out, format='WEBP', **PLACEHOLDER_OPTIONS)
+        placeholder = 'data:image/webp;base64,' + b64encode(out.getvalue()).decode()
+    return {'width': width, 'height': height, 'placeholder': placeholder}
+
+
+def pending_images(instance):
+    """
+    Clean every newly assigned upload on `instance` (pre_save), describe it in
+    `instance.image_meta` and return the names of the fields that got one.
+    """
+    fresh = []
+    meta = instance.image_meta
+    for field in getattr(instance, 'image_fields', ()):
+        file = getattr(instance, field)
+        if not file:
+            meta.pop(field, None)
+            continue
+        if file._committed:
+            continue
+        image = open_image(file)
+        cleaned = clean_image(file, image)
+        size = None
+        if cleaned is not None:
+            setattr(instance, field, cleaned)
+            with Image.open(cleaned) as stored:  # reads the header only
+                size = stored.size
+            cleaned.seek(0)
+        if image is not None:
+            meta[field] = describe_image(image, size)
+        else:
+            meta.pop(field, None)
+        fresh.append(field)
+    return fresh
+
+
+def describe_file(file):
+    """describe_image() of a stored image (a FieldFile), or None if unreadable."""
+    try:
+        with file.storage.open(file.name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return describe_image(image)
+
+
+def image_meta(file):
+    """The `image_meta` entry of a FieldFile (a dict, empty if unknown)."""
+    meta = getattr(getattr(file, 'instance', None), 'image_meta', None) or {}
+    return meta.get(getattr(getattr(file, 'field', None), 'name', None)) or {}
+
+
+# ----------------------------------------
+# POST_SAVE: RENDITIONS (background job)
+# ----------------------------------------
+def queue_renditions(instance):
+    """Queue a rendition job for each field pending_images() cleaned (post_save)."""
+    for field in instance.__dict__.pop('_pending_images', ()):
+        enqueue(build_model_renditions, instance._meta.label, instance.pk, field, queue='images')
+
+
+def build_model_renditions(label, pk, field):
+    """Job: build the renditions of one row's image, then renew its cached cards."""
+    model = apps.get_model(label)
+    obj = model.objects.filter(pk=pk).only(field).first()
+    if obj is None:
+        return  # deleted in the meantime
+    file = getattr(obj, field)
+    if file and build_renditions(file):
+        bump(model, pk=pk)
+
+
+def build_renditions(file):
+    """Write every rendition of the stored image `file` (a FieldFile)."""
+    storage = file.storage
+    try:
+        with storage.open(file.name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        return False
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    for width in RENDITION_WIDTHS:
+        # never upscale: small originals are copied as they are
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt, options in RENDITION_FORMATS.items():
+            out = BytesIO()
+            resized.save(out, format=fmt.upper(), **options)
+            name = rendition_name(file.name, width, fmt)
+            # storage.save() would pick another name if the file exists
+            storage.delete(name)
+            storage.save(name, ContentFile(out.getvalue()))
+
+    cache.set(READY_KEY % file.name, True, None)
+    return True
+
+
+def renditions_ready(file):
+    """True once every rendition of `file` has been written."""
+    key = READY_KEY % file.name
+    if cache.get(key):
+        return True
+    # the last file build_renditions() writes; only "ready" is remembered, as
+    # the job may finish in another process at any moment
+    last = rendition_name(file.name, RENDITION_WIDTHS[-1], list(RENDITION_FORMATS)[-1])
+    if file.storage.exists(last):
+        cache.set(key, True, None)
+        return True
+    return False
+
+
+def srcset(file, fmt):
+    storage = file.storage
+    return ', '.join(
+        f'{storage.url(rendition_name(file.name, width, fmt))} {width}w' for width in RENDITION_WIDTHS
+    )
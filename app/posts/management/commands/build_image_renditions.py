@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from app.posts.fragments import bump
+from app.posts.images import build_renditions, describe_file, renditions_ready
+
+
+class Command(BaseCommand):
+    help = ("Write the AVIF/WebP renditions, size and placeholder of uploaded images "
+            "that do not have them yet.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rebuild the renditions and image_meta of every image, even existing ones.",
+        )
+
+    def handle(self, *args, **options):
+        built = failed = described = 0
+        seen = set()
+        for model in apps.get_models():
+            for field in getattr(model, 'image_fields', ()):
+                rows = (model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                        .only(field, 'image_meta'))
+                for obj in rows.iterator():
+                    file = getattr(obj, field)
+                    if options['force'] or field not in obj.image_meta:
+                        meta = describe_file(file)
+                        if meta is not None:
+                            obj.image_meta[field] = meta
+                            model.objects.filter(pk=obj.pk).update(image_meta=obj.image_meta)
+                            bump(model, pk=obj.pk)
+                            described += 1
+
+                    if file.name in seen or (not options['force'] and renditions_ready(file)):
+                        continue
+                    seen.add(file.name)
+                    if build_renditions(file):
+                        built += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f"Could not read {file.name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Built renditions for {built} image(s), {failed} unreadable; described {described} image(s)."
+        ))
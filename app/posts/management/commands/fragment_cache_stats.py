@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app.posts.fragments import fragment_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counts of the post card / product tile fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        self.stdout.write(
+            f"Fragment cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+            f"hit rate {stats['hit_rate']:.1%}."
+        )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app.posts.geo import geocode_fields
+from app.posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Geocode every post's location again (coordinates, geohash and precision level)."
+
+    def handle(self, *args, **options):
+        located = 0
+        for pk, location in Post.objects.values_list('id', 'location').iterator():
+            fields = geocode_fields(location)
+            Post.objects.filter(pk=pk).update(**fields)
+            located += fields['geocode_level'] is not None
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {located} post(s)."))
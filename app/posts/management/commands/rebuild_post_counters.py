@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from app.posts.fragments import new_version
+from app.posts.models import Comment, Post
+
+
+def _count(model):
+    rows = (
+        model.objects.filter(post=OuterRef('pk'))
+        .values('post')
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.like_count / comment_count / bookmark_count from the source tables."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = (
+                Post.objects.annotate(
+                    real_likes=_count(Post.likes.through),
+                    real_comments=_count(Comment),
+                    real_bookmarks=_count(Post.bookmarks.through),
+                )
+                .filter(
+                    ~Q(like_count=F('real_likes'))
+                    | ~Q(comment_count=F('real_comments'))
+                    | ~Q(bookmark_count=F('real_bookmarks'))
+                )
+                .values_list('pk', flat=True)
+            )
+
+            fixed = Post.objects.filter(pk__in=list(drifted)).update(
+                like_count=_count(Post.likes.through),
+                comment_count=_count(Comment),
+                bookmark_count=_count(Post.bookmarks.through),
+                cache_version=new_version(),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters, {fixed} post(s) had drifted."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app.posts.matching import MATCH_TAGS, update_matches
+from app.posts.models import Post, PostMatch
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored lost & found matches of every missing/found post."
+
+    def handle(self, *args, **options):
+        PostMatch.objects.all().delete()
+        posts = Post.objects.filter(tag__in=MATCH_TAGS).order_by('created_at', 'id')
+        stored = 0
+        for post in posts.iterator():
+            stored += update_matches(post)
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} match(es)."))
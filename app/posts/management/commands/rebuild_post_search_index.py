@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.posts.models import Post
+from app.posts.search import index_post
+
+
+class Command(BaseCommand):
+    help = "Re-tokenize every post into the full-text search index."
+
+    def handle(self, *args, **options):
+        count = 0
+        with transaction.atomic():
+            for post in Post.objects.only('id', 'title', 'content', 'location').iterator():
+                index_post(post)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} post(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.posts.trending import rebuild, redecay
+
+
+class Command(BaseCommand):
+    help = "Re-decay trending scores (run periodically, e.g. hourly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Recompute every score from the post counters instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {count} post(s)."))
+        else:
+            dropped = redecay()
+            self.stdout.write(self.style.SUCCESS(f"Re-decayed trending scores, dropped {dropped} post(s)."))
@@ -0,0 +1,151 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from app.jobs.queue import enqueue
+
+from .geo import PROVINCE, distance_km, within_radius
+from .models import Post, PostMatch
+from .search import search_post_ids, tokenize
+
+
+# ----------------------------------------
+# LOST & FOUND MATCHING
+# ----------------------------------------
+# When a `missing` or `found` post is saved we look for likely counterparts
+# among posts with the opposite tag. We never compare against the whole
+# table; candidates come from two indexes only:
+#   * the full-text index (search.py), any of the post's words
+#   * the geohash index (geo.py), posts within MATCH_RADIUS_KM
+# Each candidate posted within MATCH_WINDOW of the post gets a score:
+#   text      Dice overlap of the two posts' search tokens
+#   distance  1 at the same spot, 0 at MATCH_RADIUS_KM (0 if either post is
+#             not geocoded or only to a province centre)
+#   recency   1 when posted at the same time, 0 at MATCH_WINDOW apart
+# and the best MATCHES_PER_POST above MIN_MATCH_SCORE are stored in
+# PostMatch. Only the saved post's own pairs are recomputed; pairs another
+# post picked earlier are rescored and kept while they still pass.
+#
+# Saving a post only queues the work (queue_matches, a background job), so
+# the two index lookups and the scoring never hold up the request.
+MATCH_TAGS = {'missing': 'found', 'found': 'missing'}
+MATCH_RADIUS_KM = 20
+MATCH_WINDOW = timedelta(days=60)
+MAX_CANDIDATES = 200
+MATCHES_PER_POST = 5
+MIN_MATCH_SCORE = 0.3  # recency alone (at most 0.2) is never enough
+
+WEIGHTS = {'text': 0.5, 'distance': 0.3, 'recency': 0.2}
+
+
+def _tokens(post):
+    return set(tokenize(f'{post.title} {post.content} {post.location or ""}'))
+
+
+def _candidates(post, other_tag, previous_ids):
+    window = Q(
+        created_at__gte=post.created_at - MATCH_WINDOW,
+        created_at__lte=post.created_at + MATCH_WINDOW,
+    )
+    posts = Post.objects.filter(window, tag=other_tag).only(
+        'id', 'title', 'content', 'location', 'created_at', 'latitude', 'longitude', 'geocode_level', 'tag'
+    )
+
+    text_ids = search_post_ids(
+        f'{post.title} {post.content}', tag=other_tag, limit=MAX_CANDIDATES, any_token=True
+    )
+    found = posts.in_bulk([*text_ids, *previous_ids])
+
+    if post.latitude is not None:
+        # a province centre says nothing about distance (see match_score)
+        nearby = within_radius(
+            posts, post.latitude, post.longitude, MATCH_RADIUS_KM, MAX_CANDIDATES, approximate=False
+        )
+        for other in nearby:
+            found.setdefault(other.pk, other)
+
+    found.pop(post.pk, None)
+    return found.values()
+
+
+def _precise(post):
+    return post.latitude is not None and post.geocode_level != PROVINCE
+
+
+def match_score(post, other, post_tokens=None):
+    """Similarity of two posts in [0, 1] (see module comment)."""
+    post_tokens = _tokens(post) if post_tokens is None else post_tokens
+    other_tokens = _tokens(other)
+    total = len(post_tokens) + len(other_tokens)
+    text = 2 * len(post_tokens & other_tokens) / total if total else 0.0
+
+    distance = 0.0
+    if _precise(post) and _precise(other):
+        km = distance_km(post.latitude, post.longitude, other.latitude, other.longitude)
+        distance = max(0.0, 1 - km / MATCH_RADIUS_KM)
+
+    gap = abs(post.created_at - other.created_at)
+    recency = max(0.0, 1 - gap / MATCH_WINDOW)
+
+    return WEIGHTS['text'] * text + WEIGHTS['distance'] * distance + WEIGHTS['recency'] * recency
+
+
+def update_matches(post):
+    """Recompute the stored matches of `post`. Returns how many were stored."""
+    other_tag = MATCH_TAGS.get(post.tag)
+
+    with transaction.atomic():
+        pairs = PostMatch.objects.filter(Q(missing=post) | Q(found=post))
+        previous_ids = {
+            found_id if missing_id == post.pk else missing_id
+            for missing_id, found_id in pairs.values_list('missing_id', 'found_id')
+        }
+        pairs.delete()
+        if other_tag is None:
+            return 0
+
+        post_tokens = _tokens(post)
+        scored = sorted(
+            (
+                (match_score(post, other, post_tokens), other)
+                for other in _candidates(post, other_tag, previous_ids)
+            ),
+            key=lambda pair: (pair[0], pair[1].pk),
+            reverse=True,
+        )
+        rows = [
+            PostMatch(
+                missing=post if post.tag == 'missing' else other,
+                found=other if post.tag == 'missing' else post,
+                score=score,
+            )
+            for rank, (score, other) in enumerate(scored)
+            if score >= MIN_MATCH_SCORE and (rank < MATCHES_PER_POST or other.pk in previous_ids)
+        ]
+        PostMatch.objects.bulk_create(rows)
+    return len(rows)
+
+
+def queue_matches(post):
+    """Have a worker run update_matches() for `post` (post_save)."""
+    enqueue(rematch_post, post.pk)
+
+
+def rematch_post(post_id):
+    """Job: update_matches() for one post, if it still exists."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        update_matches(post)
+
+
+def matches_for(post, limit=MATCHES_PER_POST):
+    """[(counterpart post, score)] for post_detail, best first."""
+    if post.tag not in MATCH_TAGS:
+        return []
+    rows = (
+        PostMatch.objects.filter(Q(missing=post) | Q(found=post))
+        .select_related('missing', 'found')
+        .order_by('-score')[:limit]
+    )
+    return [(row.found if row.missing_id == post.pk else row.missing, row.score) for row in rows]
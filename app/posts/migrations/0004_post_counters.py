@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, **filters):
+    rows = model.objects.filter(**filters).values('post').annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Post.objects.update(
+        like_count=_count(Post.likes.through, post=OuterRef('pk')),
+        comment_count=_count(Comment, post=OuterRef('pk')),
+        bookmark_count=_count(Post.bookmarks.through, post=OuterRef('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_tag_post_location_post_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
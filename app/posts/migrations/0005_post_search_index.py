@@ -0,0 +1,85 @@
+import re
+
+from django.db import migrations
+
+
+# A frozen copy of the tokenizer and index SQL of app/posts/search.py as of
+# this migration, so later changes to that module cannot change what it does.
+THAI = re.compile(r'[\u0E00-\u0E7F]+')
+TOKEN = re.compile(r'[\u0E00-\u0E7F]+|[^\W\u0E00-\u0E7F]+')
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN.finditer((text or '').lower()):
+        word = match.group()
+        if THAI.fullmatch(word) and len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def tsvector_literal(title, body):
+    parts = []
+    for position, token in enumerate(title + body, start=1):
+        weight = 'A' if position <= len(title) else 'B'
+        token = token.replace('\\', '\\\\').replace("'", "''")
+        parts.append(f"'{token}':{min(position, 16383)}{weight}")
+    return ' '.join(parts)
+
+
+def build_search_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+            "title, body, tokenize=\"unicode61 remove_diacritics 0 categories 'L* N* Co M*'\")"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS posts_post_search ("
+            "post_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS posts_post_search_document_gin "
+            "ON posts_post_search USING GIN (document)"
+        )
+    else:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for post in Post.objects.only('id', 'title', 'content', 'location').iterator():
+            title = tokenize(post.title)
+            body = tokenize(post.content) + tokenize(post.location)
+            if vendor == 'sqlite':
+                cursor.execute(
+                    "INSERT INTO posts_post_fts (rowid, title, body) VALUES (%s, %s, %s)",
+                    [post.pk, ' '.join(title), ' '.join(body)],
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO posts_post_search (post_id, document) VALUES (%s, %s::tsvector) "
+                    "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                    [post.pk, tsvector_literal(title, body)],
+                )
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS posts_post_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS posts_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:31
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# app/posts/trending.py's constants as of this migration
+HALF_LIFE = timedelta(hours=24)
+MIN_SCORE = 0.01
+WEIGHTS = {'post': 1.0, 'like': 1.0, 'bookmark': 1.5, 'comment': 2.0}
+
+
+def backfill_scores(apps, schema_editor):
+    # same as app.posts.trending.rebuild(), on the historical models
+    Post = apps.get_model('posts', 'Post')
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    TrendingLandmark = apps.get_model('posts', 'TrendingLandmark')
+
+    now = timezone.now()
+    TrendingLandmark.objects.create(pk=1, at=now)
+    rows = []
+    posts = Post.objects.values_list(
+        'id', 'tag', 'created_at', 'like_count', 'comment_count', 'bookmark_count'
+    )
+    for post_id, tag, created_at, likes, comments, bookmarks in posts.iterator():
+        weight = (
+            WEIGHTS['post'] + likes * WEIGHTS['like']
+            + comments * WEIGHTS['comment'] + bookmarks * WEIGHTS['bookmark']
+        )
+        score = weight * 2 ** ((created_at - now) / HALF_LIFE)
+        if score >= MIN_SCORE:
+            rows.append(TrendingScore(post_id=post_id, score=score, tag=tag))
+    TrendingScore.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingLandmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.post')),
+                ('score', models.FloatField(default=0)),
+                ('tag', models.CharField(choices=[('none', 'ไม่มีแท็ก'), ('missing', 'สัตว์หาย'), ('adoption_update', 'อัปเดตการรับเลี้ยง'), ('qa', 'Q&A'), ('other', 'อื่นๆ'), ('care', 'เคล็ดลับการดูแลสัตว์'), ('health', 'สุขภาพ/หมอ'), ('success', 'เรื่องราวความสำเร็จ'), ('event', 'กิจกรรมรับเลี้ยง'), ('found', 'พบสัตว์หลง')], default='none', max_length=50)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', '-post'], name='trending_score_idx'), models.Index(fields=['tag', '-score', '-post'], name='trending_tag_score_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_geocoding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('found', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='missing_matches', to='posts.post')),
+                ('missing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='found_matches', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['missing', '-score'], name='match_missing_score_idx'), models.Index(fields=['found', '-score'], name='match_found_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('missing', 'found'), name='unique_post_match')],
+            },
+        ),
+    ]
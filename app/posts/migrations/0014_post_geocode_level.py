@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_like_bookmark_times'),
+    ]
+
+    # NULL (unknown) until `manage.py geocode_posts` runs; radius searches keep those
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='geocode_level',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_geocode_level'),
+        ('core', '0001_initial'),
+    ]
+
+    # ChunkedUpload now belongs to the core app, which keeps using this table
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.DeleteModel(name='ChunkedUpload'),
+            ],
+        ),
+    ]
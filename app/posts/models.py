@@ -1,7 +1,12 @@
-from django.db import models
+
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
 from app.shelters.models import ShelterProfile
 
+from .fragments import new_version
+
 
 # ================================
 # TAG MODEL
@@ -32,6 +37,17 @@ TAG_CHOICES = [
     ('found', 'พบสัตว์หลง'),
 ]
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Everything a post card reads (author + profile image, shelter) loaded
+        in bulk, so a page of posts costs the same number of queries no matter
+        how many cards it shows. Like/bookmark state for the current user
+        comes from app.posts.viewer.viewer_state().
+        """
+        return self.select_related('author__profile', 'shelter')
+
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     shelter = models.ForeignKey(ShelterProfile, on_delete=models.CASCADE,
@@ -40,6 +56,10 @@ class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.ImageField(upload_to='post_images/', blank=True, null=True)
+    # cleaned and resized on upload, size and placeholder in image_meta
+    # (see app/posts/images.py)
+    image_fields = ('image',)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     #  TAG FIELD (fixed choices)
@@ -47,13 +67,101 @@ class Post(models.Model):
 
     # Location
     location = models.CharField(max_length=255, blank=True, null=True)
+    # Geocoded from `location` on save (app/posts/geo.py); geohash is the
+    # spatial index used by the "near" filter
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    # how precise the point is: geo.PROVINCE, DISTRICT or SUBDISTRICT centre
+    geocode_level = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    likes = models.ManyToManyField(User, related_name='liked_posts', blank=True, through='PostLike')
+    bookmarks = models.ManyToManyField(User, related_name='bookmarked_posts', blank=True, through='PostBookmark')
+
+    # Denormalized counters (kept in step by toggle_like / toggle_bookmark and
+    # comment creation; `manage.py rebuild_post_counters` repairs any drift)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    bookmark_count = models.PositiveIntegerField(default=0)
+
+    # Renewed by signals whenever anything shown on the post card changes;
+    # the card is cached per version (see app/posts/fragments.py)
+    cache_version = models.BigIntegerField(default=0, editable=False)
+    fragment_depends_on = ('author.profile', 'shelter')
+
+    objects = PostQuerySet.as_manager()
 
-    likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
-    bookmarks = models.ManyToManyField(User, related_name='bookmarked_posts', blank=True)
+    class Meta:
+        indexes = [
+            # feed: ORDER BY created_at DESC, id DESC (keyset pagination)
+            models.Index(fields=['-created_at', '-id'], name='post_feed_idx'),
+            models.Index(fields=['tag', '-created_at', '-id'], name='post_tag_feed_idx'),
+            # profile / shelter pages
+            models.Index(fields=['author', '-created_at'], name='post_author_created_idx'),
+            models.Index(fields=['shelter', '-created_at'], name='post_shelter_created_idx'),
+            # "near" filter: geohash prefix ranges, optionally within one tag
+            models.Index(fields=['geohash'], name='post_geohash_idx'),
+            models.Index(fields=['tag', 'geohash'], name='post_tag_geohash_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def toggle_like(self, user):
+        """Like or unlike the post for `user`. Returns True if it is now liked."""
+        return self._toggle(PostLike, 'like_count', 'like', user, renew_card=True)
+
+    def toggle_bookmark(self, user):
+        """Bookmark or un-bookmark the post for `user`. Returns True if it is now bookmarked."""
+        return self._toggle(PostBookmark, 'bookmark_count', 'bookmark', user)
+
+    def _toggle(self, through, counter, kind, user, renew_card=False):
+        # The counter and the trending score only move when a through row was
+        # really inserted or deleted, so double clicks and concurrent requests
+        # cannot skew them. toggle_*() bypass m2m_changed, so a counter shown
+        # on the card renews cache_version right here.
+        from .trending import record
+
+        extra = {'cache_version': new_version()} if renew_card else {}
+        with transaction.atomic():
+            row = through.objects.filter(post=self, user=user).first()
+            if row is not None and through.objects.filter(pk=row.pk).delete()[0]:
+                Post.objects.filter(pk=self.pk).update(**{counter: F(counter) - 1}, **extra)
+                # take back what the like/bookmark added, scaled by when it happened
+                record(self.pk, kind, undo=True, at=row.created_at)
+                return False
+
+            _, created = through.objects.get_or_create(post=self, user=user)
+            if created:
+                Post.objects.filter(pk=self.pk).update(**{counter: F(counter) + 1}, **extra)
+                record(self.pk, kind)
+            return True
+
+
+# ================================
+# LIKES / BOOKMARKS (Post.likes / Post.bookmarks through tables)
+# ================================
+# The tables Django created for the plain M2Ms, plus the time of each like
+# or bookmark: undoing one takes back exactly the trending score it added.
+class PostReaction(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+        unique_together = [('post', 'user')]
+
+
+class PostLike(PostReaction):
+    class Meta(PostReaction.Meta):
+        db_table = 'posts_post_likes'
+
+
+class PostBookmark(PostReaction):
+    class Meta(PostReaction.Meta):
+        db_table = 'posts_post_bookmarks'
+
 
 # ================================
 # COMMENT MODEL
@@ -66,6 +174,58 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
-        return f'Comment by {self.author.username} on {self.post.title}'
\ No newline at end of file
+        return f'Comment by {self.author.username} on {self.post.title}'
+
+# ================================
+# TRENDING (materialized ranking, see app/posts/trending.py)
+# ================================
+class TrendingScore(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    # forward-decayed: sum of weight * 2 ** ((event time - landmark) / half-life)
+    score = models.FloatField(default=0)
+    # copy of Post.tag so the per-tag trending feed is an index scan too
+    tag = models.CharField(max_length=50, choices=TAG_CHOICES, default='none')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='trending_score_idx'),
+            models.Index(fields=['tag', '-score', '-post'], name='trending_tag_score_idx'),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f'{self.post_id}: {self.score:.3f}'
+
+
+class TrendingLandmark(models.Model):
+    """Single row: the time all TrendingScore values are scaled against."""
+    at = models.DateTimeField()
+
+    def __str__(self):  # pragma: no cover
+        return self.at.isoformat()
+
+
+# ================================
+# LOST & FOUND MATCHES (see app/posts/matching.py)
+# ================================
+class PostMatch(models.Model):
+    missing = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='found_matches')
+    found = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='missing_matches')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['missing', 'found'], name='unique_post_match'),
+        ]
+        indexes = [
+            models.Index(fields=['missing', '-score'], name='match_missing_score_idx'),
+            models.Index(fields=['found', '-score'], name='match_found_score_idx'),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f'{self.missing_id} <-> {self.found_id} ({self.score:.2f})'
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.exceptions import ValidationError
+from django.db.models import DateTimeField, Q
+
+
+# ----------------------------------------
+# KEYSET (CURSOR) PAGINATION
+# ----------------------------------------
+# The feed is ordered by (created_at, id) descending. Instead of OFFSET we
+# remember the last row that was shown and ask for rows strictly "older"
+# than it, so every page costs the same no matter how deep we scroll.
+# Other orderings (the marketplace by price or rating) work the same way
+# on (field, id).
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(obj, field='created_at'):
+    """Turn the last object of a page into an opaque '<value>_<id>' string."""
+    value = getattr(obj, field)
+    if isinstance(value, datetime):
+        value = (value - EPOCH) // timedelta(microseconds=1)
+    return f"{value}_{obj.pk}"
+
+
+def decode_cursor(value, model_field=None):
+    """
+    Return (value, id) from a cursor string, or None if it is invalid. The
+    value is a datetime, or converted by `model_field` (e.g. a Decimal price).
+    """
+    if not value:
+        return None
+    try:
+        raw, pk = value.rsplit('_', 1)
+        if model_field is None or isinstance(model_field, DateTimeField):
+            return EPOCH + timedelta(microseconds=int(raw)), int(pk)
+        return model_field.to_python(raw), int(pk)
+    except (ValueError, OverflowError, ValidationError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=10, field='created_at', descending=True):
+    """
+    Return (items, next_cursor) for one page of `queryset`, ordered by
+    (`field`, id), newest/largest first unless descending=False. The
+    ordering wants a matching (field, id) index to stay O(page_size).
+
+    Fetches page_size + 1 rows so we know whether another page exists
+    without running a COUNT query. next_cursor is None on the last page.
+    """
+    sign = '-' if descending else ''
+    queryset = queryset.order_by(f'{sign}{field}', f'{sign}id')
+
+    position = decode_cursor(cursor, queryset.model._meta.get_field(field))
+    if position is not None:
+        value, pk = position
+        after = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'id__{after}': pk})
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1], field)
+
+    return items, next_cursor
@@ -0,0 +1,152 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+
+
+# ----------------------------------------
+# FULL-TEXT SEARCH OVER POSTS
+# ----------------------------------------
+# Thai is written without spaces between words, so neither SQLite's
+# unicode61 tokenizer nor Postgres' text parser can split it. We tokenize in
+# Python instead and hand the database ready-made tokens:
+#   * Latin words / numbers  -> one lowercase token each
+#   * runs of Thai script    -> overlapping 2-character grams
+# Bigrams need no dictionary and make any Thai query of 2+ characters match
+# wherever it appears inside a longer run ("แมวหาย" finds "ตามหาแมวหายที่...").
+#
+# Backends:
+#   * SQLite   -> FTS5 virtual table posts_post_fts(title, body), bm25 ranking
+#   * Postgres -> posts_post_search(post_id, document tsvector) + GIN index,
+#                 ts_rank ranking; title lexemes get weight A, body weight B
+#   * others   -> icontains fallback (unranked)
+SEARCH_LIMIT = 50
+MAX_QUERY_TOKENS = 64
+
+THAI = re.compile(r'[\u0E00-\u0E7F]+')
+TOKEN = re.compile(r'[\u0E00-\u0E7F]+|[^\W\u0E00-\u0E7F]+')
+
+
+def tokenize(text):
+    """Split `text` into search tokens (see module comment)."""
+    tokens = []
+    for match in TOKEN.finditer((text or '').lower()):
+        word = match.group()
+        if THAI.fullmatch(word) and len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def _document(post):
+    title = tokenize(post.title)
+    body = tokenize(post.content) + tokenize(post.location)
+    return title, body
+
+
+def _vendor():
+    return connection.vendor
+
+
+# ----------------------------------------
+# INDEX MAINTENANCE (called from signals)
+# ----------------------------------------
+def _tsvector_literal(title, body):
+    # Build the tsvector text form ourselves ('tok':1A 'tok':2B ...) so that
+    # Postgres stores our tokens verbatim instead of re-parsing them.
+    parts = []
+    for position, token in enumerate(title + body, start=1):
+        weight = 'A' if position <= len(title) else 'B'
+        token = token.replace('\\', '\\\\').replace("'", "''")
+        parts.append(f"'{token}':{min(position, 16383)}{weight}")
+    return ' '.join(parts)
+
+
+def index_post(post):
+    title, body = _document(post)
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute("DELETE FROM posts_post_fts WHERE rowid = %s", [post.pk])
+            cursor.execute(
+                "INSERT INTO posts_post_fts (rowid, title, body) VALUES (%s, %s, %s)",
+                [post.pk, ' '.join(title), ' '.join(body)],
+            )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                "INSERT INTO posts_post_search (post_id, document) VALUES (%s, %s::tsvector) "
+                "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                [post.pk, _tsvector_literal(title, body)],
+            )
+
+
+def unindex_post(post_id):
+    # No foreign key on the Postgres table: flush truncates only the tables
+    # Django knows about, and a reference to posts_post would make it fail.
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute("DELETE FROM posts_post_fts WHERE rowid = %s", [post_id])
+        elif vendor == 'postgresql':
+            cursor.execute("DELETE FROM posts_post_search WHERE post_id = %s", [post_id])
+
+
+# ----------------------------------------
+# QUERYING
+# ----------------------------------------
+def search_post_ids(query, tag=None, limit=SEARCH_LIMIT, any_token=False):
+    """
+    Return ids of posts matching `query`, best match first. By default every
+    token must match; with any_token=True one is enough (used for matching
+    lost and found posts, see matching.py).
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+
+    vendor = _vendor()
+    tag_sql, tag_params = ("AND p.tag = %s", [tag]) if tag else ("", [])
+
+    if vendor == 'sqlite':
+        match = (' OR ' if any_token else ' ').join('"%s"' % token.replace('"', '""') for token in tokens)
+        sql = (
+            "SELECT p.id FROM posts_post_fts f JOIN posts_post p ON p.id = f.rowid "
+            f"WHERE posts_post_fts MATCH %s {tag_sql} "
+            "ORDER BY bm25(posts_post_fts, 5.0, 1.0), p.created_at DESC LIMIT %s"
+        )
+        params = [match, *tag_params, limit]
+    elif vendor == 'postgresql':
+        tsquery = (' | ' if any_token else ' & ').join(
+            "'%s'" % token.replace('\\', '\\\\').replace("'", "''") for token in tokens
+        )
+        sql = (
+            "SELECT p.id FROM posts_post_search s JOIN posts_post p ON p.id = s.post_id "
+            f"WHERE s.document @@ %s::tsquery {tag_sql} "
+            "ORDER BY ts_rank(s.document, %s::tsquery) DESC, p.created_at DESC LIMIT %s"
+        )
+        params = [tsquery, *tag_params, tsquery, limit]
+    else:
+        return [] if any_token else _fallback_search_ids(query, tag, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_search_ids(query, tag, limit):
+    posts = Post.objects.filter(
+        Q(title__icontains=query) | Q(content__icontains=query) | Q(location__icontains=query)
+    )
+    if tag:
+        posts = posts.filter(tag=tag)
+    return list(posts.order_by('-created_at').values_list('id', flat=True)[:limit])
+
+
+def search_posts(queryset, query, tag=None, limit=SEARCH_LIMIT):
+    """Run search_post_ids() and load the posts from `queryset` in rank order."""
+    ids = search_post_ids(query, tag=tag, limit=limit)
+    posts = queryset.in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
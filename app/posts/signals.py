@@ -0,0 +1,135 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from app.accounts.models import Profile
+from app.shelters.models import ShelterProfile
+
+from .fragments import bump, stamp
+from .geo import geocode_fields
+from .images import pending_images, queue_renditions
+from .matching import MATCH_TAGS, queue_matches
+from .models import Comment, Post, TrendingScore
+from .search import index_post, unindex_post
+from .trending import record
+
+
+# ----------------------------------------
+# GEOCODING (see geo.py)
+# ----------------------------------------
+@receiver(pre_save, sender=Post)
+def geocode_location(sender, instance, **kwargs):
+    for field, value in geocode_fields(instance.location).items():
+        setattr(instance, field, value)
+
+
+# ----------------------------------------
+# UPLOADED IMAGES (see images.py)
+# ----------------------------------------
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Profile)
+@receiver(pre_save, sender=ShelterProfile)
+def clean_image_uploads(sender, instance, **kwargs):
+    instance._pending_images = pending_images(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=ShelterProfile)
+def queue_image_renditions(sender, instance, **kwargs):
+    queue_renditions(instance)
+
+
+# ----------------------------------------
+# SEARCH INDEX
+# ----------------------------------------
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, **kwargs):
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+# ----------------------------------------
+# POST CARD CACHE VERSIONS (see fragments.py)
+# ----------------------------------------
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Profile)
+@receiver(pre_save, sender=ShelterProfile)
+def stamp_cache_version(sender, instance, **kwargs):
+    # edits and image changes on the post or on what its card shows
+    stamp(instance)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def bump_post_on_like(sender, instance, action, reverse, pk_set, **kwargs):
+    # post.likes.add()/remove() and user.liked_posts.add()/remove();
+    # Post.toggle_like() renews the version itself
+    if action in ('post_add', 'post_remove'):
+        bump(Post, pk__in=pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        # still know which posts are affected before the rows go
+        bump(Post, likes=instance) if reverse else bump(Post, pk=instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_post_on_comment(sender, instance, **kwargs):
+    bump(Post, pk=instance.post_id)
+
+
+@receiver(post_save, sender=User)
+def bump_profile_on_rename(sender, instance, update_fields=None, **kwargs):
+    # logins save last_login only; the card shows the username
+    if update_fields is None or 'username' in update_fields:
+        bump(Profile, user_id=instance.pk)
+
+
+# ----------------------------------------
+# POST COUNTERS (likes and bookmarks are counted in Post._toggle)
+# ----------------------------------------
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_removed_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+
+
+# ----------------------------------------
+# TRENDING SCORES (see trending.py; likes and bookmarks are recorded in Post._toggle)
+# ----------------------------------------
+@receiver(post_save, sender=Post)
+def trending_new_post(sender, instance, created, **kwargs):
+    if created:
+        record(instance.pk, 'post')
+    else:
+        TrendingScore.objects.filter(post=instance).exclude(tag=instance.tag).update(tag=instance.tag)
+
+
+@receiver(post_save, sender=Comment)
+def trending_new_comment(sender, instance, created, **kwargs):
+    if created:
+        record(instance.post_id, 'comment')
+
+
+@receiver(post_delete, sender=Comment)
+def trending_removed_comment(sender, instance, **kwargs):
+    record(instance.post_id, 'comment', undo=True, at=instance.created_at)
+
+
+# ----------------------------------------
+# LOST & FOUND MATCHES (see matching.py)
+# ----------------------------------------
+@receiver(post_save, sender=Post)
+def update_post_matches(sender, instance, created, **kwargs):
+    # also run on edits away from missing/found, which drops the old matches
+    if instance.tag in MATCH_TAGS or not created:
+        queue_matches(instance)
@@ -0,0 +1,48 @@
+from django import template
+
+from app.posts.fragments import get_or_render
+
+register = template.Library()
+
+
+# ----------------------------------------
+# {% fragment_cache "name" obj [vary_on ...] %} ... {% endfragment_cache %}
+# ----------------------------------------
+# Renders the block once per version of `obj` (and its fragment_depends_on
+# rows) and per combination of the extra vary_on values, e.g. whether the
+# current user liked the post. See app/posts/fragments.py.
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, obj, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_render(name, obj, lambda: self.nodelist.render(context), vary_on)
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            "'%s' takes at least two arguments: a fragment name and an object." % bits[0]
+        )
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
+
+
+@register.filter
+def contains(collection, item):
+    """{{ liked_post_ids|contains:post.id }} -- for use as a vary_on value."""
+    return item in (collection or ())
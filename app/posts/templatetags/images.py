@@ -0,0 +1,74 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from app.posts.images import RENDITION_FORMATS, image_meta, renditions_ready, srcset
+from app.core.static_images import static_image, static_srcset
+
+register = template.Library()
+
+
+def placeholder_style(uri):
+    return f'background-image: url({uri}); background-size: cover; background-position: center'
+
+
+@register.simple_tag
+def background_image(file):
+    """`style` for an uploaded image shown as a CSS background, over its placeholder."""
+    layers = [f"url('{file.url}')"]
+    if image_meta(file).get('placeholder'):
+        layers.append(f"url('{image_meta(file)['placeholder']}')")
+    return 'background-image: ' + ', '.join(layers)
+
+
+# ----------------------------------------
+# {% responsive_image file sizes="..." alt="..." class="..." %}
+# ----------------------------------------
+# A <picture> offering the AVIF and WebP renditions of an uploaded image
+# (see app/posts/images.py) with `sizes` describing the slot it is shown in,
+# so the browser downloads the smallest file that fills it. Extra keyword
+# arguments become attributes of the <img>, which keeps the original as
+# `src` for old browsers and for images without renditions yet.
+# The <img> is lazy (pass loading="eager" above the fold) and, from the
+# model's image_meta, gets its width/height and the blurry placeholder as
+# background until it arrives.
+@register.simple_tag
+def responsive_image(file, sizes='100vw', **attrs):
+    if not getattr(file, 'name', None):
+        # no image, or a missing related row rendered as ''
+        return ''
+    meta = image_meta(file)
+    defaults = {'loading': 'lazy', 'decoding': 'async'}
+    if meta:
+        defaults.update(width=meta['width'], height=meta['height'])
+    if meta.get('placeholder'):
+        defaults['style'] = placeholder_style(meta['placeholder'])
+    img = format_html('<img src="{}"{}>', file.url, flatatt({**defaults, **attrs}))
+    if not renditions_ready(file):
+        return img
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, srcset(file, fmt), sizes) for fmt in RENDITION_FORMATS),
+    )
+    return format_html('<picture style="display: contents">{}{}</picture>', sources, img)
+
+
+# ----------------------------------------
+# {% static_picture "img/Shop.png" sizes="..." alt="..." class="..." %}
+# ----------------------------------------
+# The same for the art under static/img (see app/core/static_images.py),
+# plus the original's width and height on the <img> so its box is reserved
+# before the image loads (no layout shift).
+@register.simple_tag
+def static_picture(path, sizes='100vw', **attrs):
+    image = static_image(path)
+    if image is None:
+        return format_html('<img src="{}"{}>', static(path), flatatt(attrs))
+    attrs = {'width': image.width, 'height': image.height, 'decoding': 'async', **attrs}
+    img = format_html('<img src="{}"{}>', static(path), flatatt(attrs))
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, static_srcset(image, fmt), sizes) for fmt in RENDITION_FORMATS),
+    )
+    return format_html('<picture style="display: contents">{}{}</picture>', sources, img)
@@ -1,8 +1,37 @@
-from django.test import TestCase, Client
+import math
+import random
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
-from django.contrib.auth.models import User
-from app.posts.models import Post
+from django.utils import timezone
+from django.contrib.auth.models import AnonymousUser, User
+from app.accounts.models import Profile
+from app.posts.models import Comment, Post, PostMatch, TrendingLandmark, TrendingScore
 from app.posts.forms import PostForm
+from app.posts.fragments import fragment_stats, reset_stats
+from app.jobs.models import Job
+from app.jobs.queue import work_off
+from app.posts.images import RENDITION_FORMATS, RENDITION_WIDTHS, rendition_name, renditions_ready
+from app.posts.geo import (
+    DISTRICT, MAX_COVER_CELLS, PROVINCE, SUBDISTRICT, covering_prefixes, distance_km, encode_geohash, geocode,
+)
+from app.posts.matching import matches_for
+from app.posts.search import search_post_ids, tokenize
+from app.posts.trending import HALF_LIFE, MIN_SCORE, record, redecay, trending_post_ids
+from app.posts.viewer import viewer_state
+from app.shelters.models import ShelterProfile
+from PIL import Image
+from app.stores.models import Store
 
 class PostViewsTest(TestCase):
     def setUp(self):
@@ -111,3 +140,920 @@ class PostViewsTest(TestCase):
     def test_about_page(self):
         response = self.client.get(reverse('about'))
         self.assertEqual(response.status_code, 200)
+
+
+class PostFeedPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        for i in range(25):
+            Post.objects.create(
+                title=f"Post {i}",
+                content="...",
+                author=self.user,
+                tag='missing' if i % 2 else 'found'
+            )
+
+    def test_first_page_is_limited(self):
+        response = self.client.get(reverse('posts'))
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_cursor_walks_whole_feed_without_duplicates(self):
+        ids = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse('posts'), {'cursor': cursor} if cursor else {})
+            ids.extend(p.id for p in response.context['posts'])
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_load_more_returns_cards_and_next_cursor(self):
+        first = self.client.get(reverse('posts'))
+        data = self.client.get(reverse('post_feed_more'), {
+            'cursor': first.context['next_cursor'],
+        }).json()
+        self.assertEqual(data['html'].count('href="/posts/%d/"' % first.context['posts'][-1].id), 0)
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_load_more_keeps_tag_filter(self):
+        first = self.client.get(reverse('posts'), {'tag': 'missing'})
+        self.assertTrue(all(p.tag == 'missing' for p in first.context['posts']))
+
+        data = self.client.get(reverse('post_feed_more'), {
+            'tag': 'missing',
+            'cursor': first.context['next_cursor'],
+        }).json()
+        self.assertIsNone(data['next_cursor'])  # 12 missing posts -> 2 pages
+        self.assertNotIn('พบสัตว์หลง', data['html'])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('posts'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['posts']), 10)
+
+
+class PostCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.post = Post.objects.create(title="Counted", content="...", author=self.user)
+        self.client.login(username="john", password="12345")
+
+    def test_like_toggle_updates_counter(self):
+        self.client.get(reverse('like_post', args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.get(reverse('like_post', args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_bookmark_toggle_updates_counter(self):
+        self.client.get(reverse('bookmark_post', args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.bookmark_count, 1)
+        self.assertTrue(self.post.bookmarks.filter(id=self.user.id).exists())
+
+    def test_comment_updates_counter(self):
+        self.client.post(reverse('post_detail', args=[self.post.id]), {'content': 'Nice!'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_deleting_comment_updates_counter(self):
+        self.client.post(reverse('post_detail', args=[self.post.id]), {'content': 'Nice!'})
+        Comment.objects.get(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comments_added_outside_the_view_are_counted(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content="hi")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.save()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        self.post.likes.add(self.user)
+        Comment.objects.create(post=self.post, author=self.user, content="hi")
+        Post.objects.filter(pk=self.post.pk).update(comment_count=0, bookmark_count=7)
+
+        out = StringIO()
+        call_command('rebuild_post_counters', stdout=out)
+        self.post.refresh_from_db()
+
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.bookmark_count, 0)
+        self.assertIn("1 post(s)", out.getvalue())
+
+
+class PostListingQueryBudgetTest(TestCase):
+    """
+    Every page that lists posts must run a fixed number of queries, however
+    many posts it shows. If one of these fails, a template started touching
+    a relation that Post.objects.for_listing() does not load.
+    """
+    # url name -> queries per request (session, user, base.html lookups included)
+    BUDGETS = {
+        'posts': 6,
+        'profile': 8,
+        'user_profile': 9,
+        'my_bookmarks': 6,
+        'shelter_profile': 5,
+        'public_shelter_profile': 5,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        Profile.objects.create(user=self.user, phone="0811111111", country="TH", city="Bangkok")
+        self.shelter = ShelterProfile.objects.create(
+            user=self.user, name="Happy Paws", address="Bangkok", phone="021111111", status='APPROVED'
+        )
+        self.client.login(username="john", password="12345")
+
+    def _add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                title=f"Post {i}",
+                content="...",
+                author=self.user,
+                shelter=self.shelter if i % 2 else None,
+            )
+            post.toggle_like(self.user)
+            post.toggle_bookmark(self.user)
+
+    def _url(self, name):
+        if name == 'user_profile':
+            return reverse(name, args=[self.user.username])
+        if name == 'public_shelter_profile':
+            return reverse(name, args=[self.shelter.pk])
+        return reverse(name)
+
+    def test_query_budget_does_not_grow_with_post_count(self):
+        for count in (2, 8):
+            self._add_posts(count)
+            for name, budget in self.BUDGETS.items():
+                with self.subTest(page=name, posts=count):
+                    with self.assertNumQueries(budget):
+                        response = self.client.get(self._url(name))
+                    self.assertEqual(response.status_code, 200)
+
+
+class ViewerStateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.liked = Post.objects.create(title="Liked", content="...", author=self.user)
+        self.saved = Post.objects.create(title="Saved", content="...", author=self.user)
+        self.liked.toggle_like(self.user)
+        self.saved.toggle_bookmark(self.user)
+
+    def test_viewer_state_returns_id_sets(self):
+        with self.assertNumQueries(2):
+            state = viewer_state(self.user, [self.liked, self.saved])
+        self.assertEqual(state['liked_post_ids'], {self.liked.id})
+        self.assertEqual(state['bookmarked_post_ids'], {self.saved.id})
+
+    def test_anonymous_viewer_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            state = viewer_state(AnonymousUser(), [self.liked, self.saved])
+        self.assertEqual(state['liked_post_ids'], set())
+
+    def test_post_detail_exposes_viewer_state(self):
+        self.client.login(username="john", password="12345")
+        response = self.client.get(reverse('post_detail', args=[self.liked.id]))
+        self.assertIn(self.liked.id, response.context['liked_post_ids'])
+        self.assertNotIn(self.liked.id, response.context['bookmarked_post_ids'])
+
+
+class PostSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.lost_cat = Post.objects.create(
+            title="ตามหาแมวหายที่ลาดพร้าว", content="แมวสีส้ม ชื่อส้มโอ",
+            location="Bangkok", tag='missing', author=self.user
+        )
+        self.found_cat = Post.objects.create(
+            title="เจอน้องหมาหลง", content="พบแมวหายแถวบางนา",
+            location="Bangkok", tag='found', author=self.user
+        )
+        self.tips = Post.objects.create(
+            title="Grooming tips", content="How to brush a long-haired dog",
+            tag='care', author=self.user
+        )
+
+    def test_tokenize_splits_thai_into_bigrams(self):
+        self.assertEqual(tokenize("แมวหาย"), ["แม", "มว", "วห", "หา", "าย"])
+        self.assertEqual(tokenize("Grooming TIPS"), ["grooming", "tips"])
+
+    def test_thai_query_matches_inside_longer_words(self):
+        ids = search_post_ids("แมวหาย")
+        self.assertCountEqual(ids, [self.lost_cat.id, self.found_cat.id])
+
+    def test_title_matches_rank_first(self):
+        ids = search_post_ids("แมวหาย")
+        self.assertEqual(ids[0], self.lost_cat.id)
+
+    def test_tag_filter(self):
+        self.assertEqual(search_post_ids("แมวหาย", tag='found'), [self.found_cat.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.tips.title = "Brushing guide"
+        self.tips.save()
+        self.assertEqual(search_post_ids("grooming"), [])
+        self.assertEqual(search_post_ids("brushing"), [self.tips.id])
+
+        self.tips.delete()
+        self.assertEqual(search_post_ids("brushing"), [])
+
+    def test_feed_search(self):
+        response = self.client.get(reverse('posts'), {'q': 'grooming'})
+        self.assertEqual([p.id for p in response.context['posts']], [self.tips.id])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_rebuild_search_index_command(self):
+        out = StringIO()
+        call_command('rebuild_post_search_index', stdout=out)
+        self.assertIn("Indexed 3 post(s)", out.getvalue())
+        self.assertEqual(search_post_ids("dog"), [self.tips.id])
+
+
+class QueryPlanTest(TestCase):
+    """
+    Runs the main pages, EXPLAINs every SELECT they issued and fails if a
+    plan falls back to a full table scan or sorts rows in a temp structure
+    instead of reading them in index order.
+    """
+    BAD_PLAN = {
+        # "SCAN posts_post" with no "USING ... INDEX" is a full table scan
+        'sqlite': re.compile(r'SCAN \S+$|USE TEMP B-TREE', re.M),
+        'postgresql': re.compile(r'Seq Scan|^\s*(->\s*)?Sort\b', re.M),
+    }
+    # the nearby feed sorts its candidates (the rows of at most
+    # geo.MAX_COVER_CELLS small geohash cells) to take the newest
+    SORT_LINE = {
+        'sqlite': re.compile(r'^.*USE TEMP B-TREE.*$', re.M),
+        'postgresql': re.compile(r'^\s*(->\s*)?Sort\b.*$', re.M),
+    }
+
+    def setUp(self):
+        if connection.vendor not in self.BAD_PLAN:
+            self.skipTest("no plan rules for %s" % connection.vendor)
+        if connection.vendor == 'postgresql':
+            # tiny test tables are always cheaper to seq-scan; make the
+            # planner show which index it *would* use
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+        self.user = User.objects.create_user(
+            username="john", email="john@example.com", password="12345", is_superuser=True
+        )
+        Profile.objects.create(user=self.user, phone="0811111111", country="TH", city="Bangkok")
+        self.shelter = ShelterProfile.objects.create(
+            user=self.user, name="Happy Paws", address="Bangkok", phone="021111111", status='APPROVED'
+        )
+        self.store = Store.objects.create(owner=self.user, name="Pet Shop", store_type='PET', status='APPROVED')
+        self.post = Post.objects.create(title="Hello", content="...", author=self.user, shelter=self.shelter)
+        Comment.objects.create(post=self.post, author=self.user, content="hi")
+        self.client.login(username="john", password="12345")
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+
+    def _explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertPlansUseIndexes(self, url, method='get', data=None, sorts=False):
+        with CaptureQueriesContext(connection) as ctx:
+            getattr(self.client, method)(url, data)
+
+        for query in ctx.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            plan = self._explain(query['sql'])
+            if sorts:
+                plan = self.SORT_LINE[connection.vendor].sub('', plan)
+            self.assertIsNone(
+                self.BAD_PLAN[connection.vendor].search(plan),
+                f"{url}: unindexed plan\n{query['sql']}\n{plan}",
+            )
+
+    def test_main_pages_use_indexes(self):
+        urls = [
+            reverse('posts'),
+            reverse('posts') + '?tag=missing',
+            reverse('posts') + '?tag=missing&cursor=1700000000000000_1',
+            reverse('posts') + '?sort=trending',
+            reverse('posts') + '?sort=trending&tag=missing',
+            reverse('post_detail', args=[self.post.id]),
+            reverse('profile'),
+            reverse('user_profile', args=[self.user.username]),
+            reverse('shelter_profile'),
+            reverse('public_shelter_profile', args=[self.shelter.pk]),
+            reverse('store_profile', args=[self.store.pk]),
+            reverse('store_manage', args=[self.store.pk]),
+            reverse('marketplace'),
+            reverse('marketplace') + '?sort=price&min_price=10&max_price=50&in_stock=1',
+            reverse('marketplace') + '?sort=-price&cursor=20.00_5',
+            reverse('marketplace') + '?sort=rating&type=PET&cursor=4.5_3',
+            reverse('shelter_approval'),
+            reverse('store_approval'),
+            # my_bookmarks is left out on purpose: it orders through the M2M
+            # join, which always sorts (bounded by one user's bookmarks).
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertPlansUseIndexes(url)
+
+    def test_nearby_feed_reads_only_covering_cells(self):
+        for url in (reverse('posts') + '?near=ลาดยาว', reverse('posts') + '?near=ลาดยาว&tag=missing'):
+            with self.subTest(url=url):
+                self.assertPlansUseIndexes(url, sorts=True)
+
+    def test_login_by_email_uses_index(self):
+        self.client.logout()
+        self.assertPlansUseIndexes(reverse('login'), 'post', {
+            'username_or_email': 'john@example.com',
+            'password': '12345',
+        })
+
+
+class PostToggleJsonTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.post = Post.objects.create(title="Toggle me", content="...", author=self.user)
+        self.client.login(username="john", password="12345")
+
+    def test_like_json_returns_state_and_count(self):
+        url = reverse('like_post', args=[self.post.id])
+        data = self.client.post(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data, {'post_id': self.post.id, 'liked': True, 'like_count': 1})
+
+        data = self.client.post(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data, {'post_id': self.post.id, 'liked': False, 'like_count': 0})
+
+    def test_bookmark_json_returns_state_and_count(self):
+        url = reverse('bookmark_post', args=[self.post.id])
+        data = self.client.post(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data, {'post_id': self.post.id, 'bookmarked': True, 'bookmark_count': 1})
+
+    def test_plain_link_still_redirects(self):
+        response = self.client.get(reverse('like_post', args=[self.post.id]), HTTP_REFERER='/posts/')
+        self.assertRedirects(response, '/posts/', fetch_redirect_response=False)
+
+    def test_anonymous_json_request_is_sent_to_login(self):
+        self.client.logout()
+        response = self.client.post(reverse('like_post', args=[self.post.id]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+
+class PostCommentPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.post = Post.objects.create(title="Chatty", content="...", author=self.user)
+        self.comments = [
+            Comment.objects.create(post=self.post, author=self.user, content=f"comment {i}")
+            for i in range(25)
+        ]
+        self.detail_url = reverse('post_detail', args=[self.post.id])
+        self.comments_url = reverse('post_comments', args=[self.post.id])
+
+    def test_detail_shows_latest_page_oldest_first(self):
+        response = self.client.get(self.detail_url)
+        shown = list(response.context['comments'])
+        self.assertEqual(shown, self.comments[-20:])
+        self.assertIsNotNone(response.context['earlier_cursor'])
+        self.assertEqual(response.context['last_comment_id'], self.comments[-1].id)
+
+    def test_before_cursor_returns_earlier_page(self):
+        cursor = self.client.get(self.detail_url).context['earlier_cursor']
+        response = self.client.get(self.detail_url, {'before': cursor})
+        self.assertEqual(list(response.context['comments']), self.comments[:5])
+        self.assertIsNone(response.context['earlier_cursor'])
+
+        data = self.client.get(self.comments_url, {'before': cursor}).json()
+        self.assertIn('comment 0', data['html'])
+        self.assertNotIn('comment 5<', data['html'])
+        self.assertIsNone(data['earlier_cursor'])
+
+    def test_after_returns_only_newer_comments(self):
+        data = self.client.get(self.comments_url, {'after': self.comments[22].id}).json()
+        self.assertIn('comment 23', data['html'])
+        self.assertIn('comment 24', data['html'])
+        self.assertNotIn('comment 22<', data['html'])
+        self.assertEqual(data['last_comment_id'], self.comments[24].id)
+
+        data = self.client.get(self.comments_url, {'after': self.comments[24].id}).json()
+        self.assertEqual(data['html'].strip(), '')
+        self.assertEqual(data['last_comment_id'], self.comments[24].id)
+
+    def test_after_must_be_an_id(self):
+        response = self.client.get(self.comments_url, {'after': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_comment_queries_do_not_grow_with_page(self):
+        # post (+ author, profile, shelter), then one page of comments with authors + profiles
+        with self.assertNumQueries(2):
+            self.client.get(self.detail_url)
+        with self.assertNumQueries(2):
+            self.client.get(self.comments_url, {'after': 0})
+
+    def test_json_comment_post_returns_fragment(self):
+        self.client.login(username="john", password="12345")
+        response = self.client.post(self.detail_url, {'content': 'hello there'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        comment = Comment.objects.get(content='hello there')
+        self.assertEqual(data['comment_id'], comment.id)
+        self.assertEqual(data['comment_count'], 26)   # the 25 of setUp count too
+        self.assertIn('hello there', data['html'])
+        self.assertIn(f'data-comment-id="{comment.id}"', data['html'])
+
+    def test_json_comment_post_invalid_returns_errors(self):
+        self.client.login(username="john", password="12345")
+        response = self.client.post(self.detail_url, {'content': ''}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content', response.json()['errors'])
+
+    def test_plain_comment_post_still_redirects(self):
+        self.client.login(username="john", password="12345")
+        response = self.client.post(self.detail_url, {'content': 'no js'})
+        self.assertRedirects(response, self.detail_url, fetch_redirect_response=False)
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.other = User.objects.create_user(username="kate", password="12345")
+        Profile.objects.create(user=self.user)
+        self.post = Post.objects.create(title="Cached card", content="...", author=self.user)
+        self.url = reverse('posts')
+
+    def feed(self):
+        return self.client.get(self.url).content.decode()
+
+    def test_second_render_is_a_hit(self):
+        self.feed()
+        self.feed()
+        stats = fragment_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_edit_renews_the_card(self):
+        self.assertIn("Cached card", self.feed())
+        self.post.title = "Edited card"
+        self.post.save()
+        html = self.feed()
+        self.assertIn("Edited card", html)
+        self.assertNotIn("Cached card", html)
+
+    def test_like_and_comment_renew_the_card(self):
+        self.feed()
+        self.post.toggle_like(self.other)
+        self.assertIn('<span data-count>1</span>', self.feed())
+
+        self.client.login(username="kate", password="12345")
+        self.client.post(reverse('post_detail', args=[self.post.id]), {'content': 'hi'})
+        self.client.logout()
+        self.assertIn('<span>1</span>', self.feed())
+
+    def test_author_rename_and_profile_image_renew_the_card(self):
+        self.feed()
+        self.user.username = "johnny"
+        self.user.save()
+        self.assertIn("johnny", self.feed())
+
+        profile = self.user.profile
+        profile.image = 'profile_pics/new.jpg'
+        profile.save()
+        self.assertIn("profile_pics/new.jpg", self.feed())
+
+    def test_login_does_not_renew_the_card(self):
+        version = Profile.objects.get(user=self.user).cache_version
+        self.client.login(username="john", password="12345")
+        self.assertEqual(Profile.objects.get(user=self.user).cache_version, version)
+
+    def test_viewer_state_is_not_shared_between_users(self):
+        self.post.toggle_like(self.user)
+        self.client.login(username="john", password="12345")
+        self.assertIn('text-red-500 fill-current" data-active-class', self.feed())
+        self.client.login(username="kate", password="12345")
+        self.assertNotIn('text-red-500 fill-current" data-active-class', self.feed())
+
+    def test_owner_buttons_are_not_cached(self):
+        self.client.login(username="john", password="12345")
+        self.assertIn(reverse('edit_post', args=[self.post.id]), self.feed())
+        self.client.login(username="kate", password="12345")
+        self.assertNotIn(reverse('edit_post', args=[self.post.id]), self.feed())
+
+    def test_likes_add_and_clear_renew_the_card(self):
+        version = Post.objects.get(pk=self.post.pk).cache_version
+        self.post.likes.add(self.other)
+        added = Post.objects.get(pk=self.post.pk).cache_version
+        self.assertNotEqual(added, version)
+
+        self.other.liked_posts.clear()
+        self.assertNotEqual(Post.objects.get(pk=self.post.pk).cache_version, added)
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        # scores are scaled against the landmark; start from "now" so the
+        # weights below come out (almost) exactly
+        TrendingLandmark.objects.update_or_create(pk=1, defaults={'at': timezone.now()})
+        self.user = User.objects.create_user(username="john", password="12345")
+        self.other = User.objects.create_user(username="kate", password="12345")
+        self.quiet = Post.objects.create(title="Quiet", content="...", author=self.user)
+        self.busy = Post.objects.create(title="Busy", content="...", author=self.user, tag='missing')
+        self.client.login(username="kate", password="12345")
+
+    def score(self, post):
+        return TrendingScore.objects.get(post=post).score
+
+    def test_new_post_gets_a_starting_score(self):
+        self.assertAlmostEqual(self.score(self.quiet), 1.0, places=2)
+
+    def test_like_bookmark_and_comment_raise_the_score(self):
+        start = self.score(self.busy)
+        self.client.post(reverse('like_post', args=[self.busy.id]))
+        self.client.post(reverse('bookmark_post', args=[self.busy.id]))
+        self.client.post(reverse('post_detail', args=[self.busy.id]), {'content': 'seen near the park'})
+        self.assertAlmostEqual(self.score(self.busy) - start, 1.0 + 1.5 + 2.0, places=2)
+        self.assertEqual(trending_post_ids(), [self.busy.id, self.quiet.id])
+
+    def test_unlike_and_comment_delete_take_the_score_back(self):
+        start = self.score(self.busy)
+        url = reverse('like_post', args=[self.busy.id])
+        self.client.post(url)
+        self.client.post(url)
+        comment = Comment.objects.create(post=self.busy, author=self.other, content="hi")
+        comment.delete()
+        self.assertAlmostEqual(self.score(self.busy), start, places=2)
+
+    def test_undo_takes_back_what_the_event_added(self):
+        now = timezone.now()
+        TrendingLandmark.objects.filter(pk=1).update(at=now - 2 * HALF_LIFE)
+        start = self.score(self.busy)
+        record(self.busy.id, 'like', at=now - HALF_LIFE)   # a day after the landmark: worth 2
+        self.assertAlmostEqual(self.score(self.busy) - start, 2.0, places=2)
+        record(self.busy.id, 'like', undo=True, at=now - HALF_LIFE)
+        self.assertAlmostEqual(self.score(self.busy), start, places=2)
+
+    def test_stale_landmark_is_rebased_instead_of_overflowing(self):
+        TrendingLandmark.objects.filter(pk=1).update(at=timezone.now() - HALF_LIFE * 2000)
+        self.busy.toggle_like(self.other)
+        self.assertLess(timezone.now() - TrendingLandmark.objects.get(pk=1).at, HALF_LIFE)
+        self.assertAlmostEqual(self.score(self.busy), 1.0, places=2)   # the old scores decayed away
+
+    def test_redecay_halves_scores_after_one_half_life(self):
+        landmark = TrendingLandmark.objects.get(pk=1).at
+        before = self.score(self.busy)
+        redecay(now=landmark + HALF_LIFE)
+        self.assertAlmostEqual(self.score(self.busy), before / 2, places=6)
+
+        # a new event after re-decay is on the same scale as the old ones
+        self.busy.toggle_like(self.other)
+        self.assertEqual(TrendingLandmark.objects.get(pk=1).at, landmark + HALF_LIFE)
+
+    def test_redecay_drops_posts_that_faded_away(self):
+        landmark = TrendingLandmark.objects.get(pk=1).at
+        half_lives = 1 + int(-math.log2(MIN_SCORE))
+        dropped = redecay(now=landmark + HALF_LIFE * half_lives)
+        self.assertEqual(dropped, 2)
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_trending_feed_ranks_by_score_and_filters_by_tag(self):
+        self.client.post(reverse('like_post', args=[self.busy.id]))
+        response = self.client.get(reverse('posts'), {'sort': 'trending'})
+        self.assertEqual(list(response.context['posts']), [self.busy, self.quiet])
+        self.assertIsNone(response.context['next_cursor'])
+
+        response = self.client.get(reverse('posts'), {'sort': 'trending', 'tag': 'missing'})
+        self.assertEqual(list(response.context['posts']), [self.busy])
+
+        self.busy.tag = 'found'
+        self.busy.save()
+        self.assertEqual(trending_post_ids(tag='missing'), [])
+        self.assertEqual(trending_post_ids(tag='found'), [self.busy.id])
+
+    def test_trending_feed_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('posts'), {'sort': 'trending'})
+        for i in range(8):
+            Post.objects.create(title=f"More {i}", content="...", author=self.user)
+        with self.assertNumQueries(len(few.captured_queries)):
+            self.client.get(reverse('posts'), {'sort': 'trending'})
+
+    def test_update_trending_command(self):
+        Post.objects.filter(pk=self.busy.pk).update(like_count=3)
+        out = StringIO()
+        call_command('update_trending', '--rebuild', stdout=out)
+        self.assertIn("Rebuilt trending scores for 2 post(s).", out.getvalue())
+        self.assertEqual(trending_post_ids(), [self.busy.id, self.quiet.id])
+
+        out = StringIO()
+        call_command('update_trending', stdout=out)
+        self.assertIn("Re-decayed trending scores, dropped 0 post(s).", out.getvalue())
+
+
+class PostGeoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+
+    def make(self, title, location, tag='missing'):
+        return Post.objects.create(title=title, content="...", author=self.user, location=location, tag=tag)
+
+    def test_geocode_picks_most_specific_place(self):
+        self.assertEqual(geocode("Bangkok").key, "bangkok")
+        self.assertEqual(geocode("ลาดยาว จตุจักร กรุงเทพ").key, "bangkok/chatuchak/lat-yao")
+        self.assertEqual(geocode("หายแถวจตุจักร").key, "bangkok/chatuchak")
+        self.assertEqual(geocode("บางนาเหนือ").key, "bangkok/bang-na/bang-na-nuea")
+        self.assertEqual(geocode("Chonburi").key, "chon-buri")
+        self.assertEqual(geocode("หาดใหญ่ สงขลา").key, "songkhla/hat-yai")
+
+    def test_short_thai_names_need_context(self):
+        self.assertIsNone(geocode("แมวหายไปเลย"))
+        self.assertIsNone(geocode("ซอยตากสิน 12"))
+        self.assertEqual(geocode("จ.เลย").key, "loei")
+        self.assertIsNone(geocode("somewhere else"))
+
+    def test_location_is_geocoded_on_save(self):
+        post = self.make("Lost", "ลาดยาว")
+        self.assertAlmostEqual(post.latitude, 13.835)
+        self.assertEqual(post.geohash, encode_geohash(post.latitude, post.longitude))
+
+        post.location = "unknown"
+        post.save()
+        self.assertIsNone(post.latitude)
+        self.assertEqual(post.geohash, '')
+
+    def test_covering_prefixes_contain_every_point_in_radius(self):
+        rng = random.Random(331)
+        for radius in (1, 5, 25):
+            prefixes = covering_prefixes(13.7563, 100.5018, radius)
+            for _ in range(500):
+                lat = 13.7563 + rng.uniform(-0.3, 0.3)
+                lng = 100.5018 + rng.uniform(-0.3, 0.3)
+                if distance_km(13.7563, 100.5018, lat, lng) <= radius:
+                    self.assertTrue(encode_geohash(lat, lng).startswith(tuple(prefixes)))
+
+    def test_near_filter_returns_posts_within_radius(self):
+        lat_yao = self.make("Lat Yao cat", "ลาดยาว")
+        chatuchak = self.make("Chatuchak dog", "จตุจักร", tag='found')
+        self.make("Bang Na dog", "บางนา")
+        self.make("Chiang Mai cat", "เชียงใหม่")
+
+        response = self.client.get(reverse('posts'), {'near': 'ลาดยาว', 'km': 5})
+        self.assertEqual(list(response.context['posts']), [chatuchak, lat_yao])
+
+        response = self.client.get(reverse('posts'), {'near': 'ลาดยาว', 'km': 5, 'tag': 'missing'})
+        self.assertEqual(list(response.context['posts']), [lat_yao])
+
+        response = self.client.get(reverse('posts'), {'lat': '13.668', 'lng': '100.604', 'km': 1})
+        self.assertEqual([post.title for post in response.context['posts']], ["Bang Na dog"])
+
+    def test_small_radius_uses_small_cells(self):
+        prefixes = covering_prefixes(13.7563, 100.5018, 5)
+        self.assertLessEqual(len(prefixes), MAX_COVER_CELLS)
+        self.assertEqual({len(prefix) for prefix in prefixes}, {5})   # ~5 km cells, not 20x40 km
+
+    def test_province_centres_come_after_precise_points(self):
+        bangkok = self.make("Somewhere in Bangkok", "กรุงเทพ")
+        district = self.make("Chatuchak dog", "จตุจักร")
+        self.make("Somewhere in Chiang Mai", "เชียงใหม่")
+        self.assertEqual(bangkok.geocode_level, PROVINCE)
+        self.assertEqual(district.geocode_level, DISTRICT)
+
+        response = self.client.get(reverse('posts'), {'near': 'ลาดยาว', 'km': 5})
+        posts = response.context['posts']
+        self.assertEqual(posts, [district, bangkok])
+        self.assertEqual([post.approximate for post in posts], [False, True])
+        self.assertAlmostEqual(
+            posts[0].distance_km,
+            distance_km(13.835, 100.563, district.latitude, district.longitude),
+            places=6,
+        )
+
+        # far from any province centre: nothing
+        response = self.client.get(reverse('posts'), {'lat': '16.0', 'lng': '96.0', 'km': 5})
+        self.assertEqual(list(response.context['posts']), [])
+
+    def test_geocode_posts_command_fills_levels(self):
+        post = self.make("Lat Yao cat", "ลาดยาว")
+        Post.objects.filter(pk=post.pk).update(geocode_level=None, geohash='')
+        out = StringIO()
+        call_command('geocode_posts', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.geocode_level, SUBDISTRICT)
+        self.assertEqual(post.geohash, encode_geohash(post.latitude, post.longitude))
+        self.assertIn("Geocoded 1 post(s).", out.getvalue())
+
+    def test_tag_and_sort_links_keep_the_radius(self):
+        response = self.client.get(reverse('posts'), {'near': 'ลาดยาว', 'km': 5})
+        near = 'near=%E0%B8%A5%E0%B8%B2%E0%B8%94%E0%B8%A2%E0%B8%B2%E0%B8%A7&amp;km=5'
+        self.assertContains(response, f'href="?tag=missing&{near}"')
+        self.assertContains(response, f'href="?sort=trending&{near}"')
+        self.assertContains(response, f'href="?{near}"')
+
+        response = self.client.get(reverse('posts'), {'lat': '13.668', 'lng': '100.604', 'km': 1})
+        self.assertContains(response, 'href="?tag=found&lat=13.668&amp;lng=100.604&amp;km=1"')
+
+    def test_unknown_place_shows_nothing(self):
+        self.make("Lat Yao cat", "ลาดยาว")
+        response = self.client.get(reverse('posts'), {'near': 'Atlantis'})
+        self.assertEqual(list(response.context['posts']), [])
+        self.assertContains(response, "ไม่รู้จักสถานที่")
+
+
+class PostMatchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="john", password="12345")
+
+    def make(self, title, content, location, tag):
+        post = Post.objects.create(title=title, content=content, author=self.user, location=location, tag=tag)
+        work_off()
+        return post
+
+    def save(self, post):
+        post.save()
+        work_off()
+
+    def test_new_post_is_matched_with_opposite_tag(self):
+        found = self.make("พบแมวส้ม", "แมวส้ม ปลอกคอสีแดง", "ลาดยาว", 'found')
+        self.make("พบแมวส้ม", "แมวส้ม ปลอกคอสีแดง", "ลาดยาว", 'adoption')
+        far = self.make("Found a dog", "brown dog", "เชียงใหม่", 'found')
+        missing = self.make("แมวส้มหาย", "แมวส้ม ปลอกคอสีแดง หายจากบ้าน", "จตุจักร", 'missing')
+
+        matches = matches_for(missing)
+        self.assertEqual([post for post, score in matches], [found])
+        self.assertNotIn(far, [post for post, score in matches_for(missing)])
+        # stored once, visible from both sides
+        self.assertEqual([post for post, score in matches_for(found)], [missing])
+        self.assertEqual(PostMatch.objects.count(), 1)
+
+    def test_retag_and_delete_drop_matches(self):
+        found = self.make("Found cat", "orange cat", "ลาดยาว", 'found')
+        missing = self.make("Lost cat", "orange cat", "ลาดยาว", 'missing')
+        self.assertEqual(PostMatch.objects.count(), 1)
+
+        missing.tag = 'adoption'
+        self.save(missing)
+        self.assertEqual(PostMatch.objects.count(), 0)
+
+        missing.tag = 'missing'
+        self.save(missing)
+        self.assertEqual([post for post, score in matches_for(found)], [missing])
+        found.delete()
+        self.assertEqual(PostMatch.objects.count(), 0)
+
+    def test_edit_keeps_matches_picked_by_others(self):
+        missing = self.make("Lost cat", "orange cat", "ลาดยาว", 'missing')
+        found = self.make("Found cat", "orange cat", "ลาดยาว", 'found')
+        missing.content = "orange cat with a red collar"
+        self.save(missing)
+        self.assertEqual([post for post, score in matches_for(found)], [missing])
+
+    def test_detail_shows_matches(self):
+        self.make("Found orange cat", "orange cat", "ลาดยาว", 'found')
+        missing = self.make("Lost cat", "orange cat", "ลาดยาว", 'missing')
+        response = self.client.get(reverse('post_detail', args=[missing.id]))
+        self.assertContains(response, 'id="post-matches"')
+        self.assertContains(response, "Found orange cat")
+
+    def test_matching_runs_in_a_job(self):
+        self.make("Found cat", "orange cat", "ลาดยาว", 'found')
+        missing = Post.objects.create(
+            title="Lost cat", content="orange cat", author=self.user, location="ลาดยาว", tag='missing'
+        )
+        self.assertEqual(PostMatch.objects.count(), 0)
+        missing.delete()
+        # the post is gone by the time the job runs
+        self.assertEqual(work_off(), {'done': 1, 'failed': 0})
+        self.assertEqual(PostMatch.objects.count(), 0)
+
+    def test_rebuild_command(self):
+        self.make("Found cat", "orange cat", "ลาดยาว", 'found')
+        self.make("Lost cat", "orange cat", "ลาดยาว", 'missing')
+        PostMatch.objects.all().delete()
+        call_command('rebuild_post_matches', stdout=StringIO())
+        self.assertEqual(PostMatch.objects.count(), 1)
+
+
+class ImagePipelineTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.user = User.objects.create_user(username="john", password="12345")
+
+    def phone_photo(self, size=(1600, 900)):
+        # landscape sensor data, EXIF says "rotate 90 degrees", plus a GPS tag
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {2: (13.0, 50.0, 6.0)}
+        out = BytesIO()
+        Image.new('RGB', size, 'orange').save(out, format='JPEG', exif=exif)
+        return SimpleUploadedFile('cat.jpg', out.getvalue(), content_type='image/jpeg')
+
+    def test_upload_is_oriented_stripped_and_rendered(self):
+        post = Post.objects.create(title="Cat", content="...", author=self.user, image=self.phone_photo())
+
+        with Image.open(post.image.path) as original:
+            self.assertEqual(original.size, (900, 1600))
+            self.assertEqual(len(original.getexif()), 0)
+
+        # renditions come from a background job, which renews the card
+        self.assertFalse(renditions_ready(post.image))
+        version = Post.objects.get(pk=post.pk).cache_version
+        self.assertEqual(work_off(), {'done': 1, 'failed': 0})
+        self.assertNotEqual(Post.objects.get(pk=post.pk).cache_version, version)
+
+        for width in RENDITION_WIDTHS:
+            for fmt in RENDITION_FORMATS:
+                with post.image.storage.open(rendition_name(post.image.name, width, fmt)) as f, Image.open(f) as image:
+                    self.assertEqual(image.format, fmt.upper())
+                    self.assertEqual(image.width, min(width, 900))
+        self.assertTrue(renditions_ready(post.image))
+
+    def test_unchanged_image_is_not_reprocessed(self):
+        post = Post.objects.create(title="Cat", content="...", author=self.user, image=self.phone_photo())
+        name = post.image.name
+        post.title = "Orange cat"
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(Job.objects.filter(queue='images').count(), 1)
+
+    def test_tag_emits_srcset_once_renditions_exist(self):
+        template = Template('{% load images %}{% responsive_image file sizes="48px" alt="a" class="w-12" %}')
+        post = Post.objects.create(title="Cat", content="...", author=self.user, image=self.phone_photo())
+        work_off()
+        html = template.render(Context({'file': post.image}))
+        self.assertIn('<source type="image/avif"', html)
+        self.assertIn(post.image.storage.url(rendition_name(post.image.name, 320, 'webp')) + ' 320w', html)
+        self.assertIn('sizes="48px"', html)
+        self.assertIn(f'<img src="{post.image.url}" alt="a" class="w-12"', html)
+        for attr in ('loading="lazy"', 'decoding="async"', 'width="900"', 'height="1600"'):
+            self.assertIn(attr, html)
+
+        # files stored before the pipeline: plain <img> until the command runs
+        Post.objects.filter(pk=post.pk).update(image='post_images/old.jpg')
+        Image.new('RGB', (400, 300)).save(f'{self.media}/post_images/old.jpg')
+        old = Post.objects.get(pk=post.pk)
+        self.assertNotIn('<picture', template.render(Context({'file': old.image})))
+
+        call_command('build_image_renditions', stdout=StringIO(), stderr=StringIO())
+        cache.clear()
+        self.assertIn('<picture', template.render(Context({'file': old.image})))
+
+    def test_upload_records_size_and_placeholder(self):
+        post = Post.objects.create(title="Cat", content="...", author=self.user,
+                                   image=self.phone_photo(size=(4000, 3000)))
+        meta = Post.objects.get(pk=post.pk).image_meta['image']
+        # the stored (upright, shrunk) size, not the upload's
+        self.assertEqual((meta['width'], meta['height']), (1920, 2560))
+        self.assertTrue(meta['placeholder'].startswith('data:image/webp;base64,'))
+        self.assertLess(len(meta['placeholder']), 400)
+
+        html = Template('{% load images %}{% responsive_image file %}').render(Context({'file': post.image}))
+        self.assertIn('width="1920"', html)
+        self.assertIn('height="2560"', html)
+        self.assertIn(f"background-image: url({meta['placeholder']})", html)
+        eager = Template('{% load images %}{% responsive_image file loading="eager" %}')
+        self.assertIn('loading="eager"', eager.render(Context({'file': post.image})))
+
+        post.image = None
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).image_meta, {})
+
+    def test_transparent_image_gets_no_placeholder(self):
+        out = BytesIO()
+        Image.new('RGBA', (64, 64), (0, 0, 0, 0)).save(out, format='PNG')
+        post = Post.objects.create(title="Logo", content="...", author=self.user,
+                                   image=SimpleUploadedFile('logo.png', out.getvalue(), content_type='image/png'))
+        self.assertEqual(post.image_meta['image'], {'width': 64, 'height': 64, 'placeholder': ''})
+        html = Template('{% load images %}{% responsive_image file %}').render(Context({'file': post.image}))
+        self.assertNotIn('background-image', html)
+
+    def test_command_describes_older_images(self):
+        post = Post.objects.create(title="Cat", content="...", author=self.user, image=self.phone_photo())
+        Image.new('RGB', (400, 300)).save(f'{self.media}/post_images/old.jpg')
+        Post.objects.filter(pk=post.pk).update(image='post_images/old.jpg', image_meta={})
+        call_command('build_image_renditions', stdout=StringIO(), stderr=StringIO())
+        meta = Post.objects.get(pk=post.pk).image_meta['image']
+        self.assertEqual((meta['width'], meta['height']), (400, 300))
+        self.assertTrue(meta['placeholder'])
@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Post, TrendingLandmark, TrendingScore
+
+
+# ----------------------------------------
+# TRENDING POSTS
+# ----------------------------------------
+# TrendingScore keeps one materialized score per post, so the trending feed
+# is a plain index scan (ORDER BY score DESC LIMIT n) instead of an aggregate
+# over likes/comments/bookmarks on every request.
+#
+# Scores use forward decay: an event of weight w at time t adds
+#     w * 2 ** ((t - landmark) / HALF_LIFE)
+# Newer events are worth exponentially more, and because every row shares the
+# same landmark, ordering by the stored score is the same as ordering by the
+# time-decayed score -- an event is a single `score = score + x` UPDATE and
+# nothing needs recomputing as time passes.
+#
+# `manage.py update_trending` (run periodically, e.g. hourly) re-decays:
+# it moves the landmark to now, divides every score by the same factor so the
+# numbers stay small, and drops posts that have decayed away. Should it stop
+# running, record() re-decays itself once the landmark is REBASE_AFTER
+# half-lives old, long before 2 ** x could overflow a float.
+#
+# Undoing an event (unlike, removed bookmark or comment) subtracts the weight
+# it was added with: w * 2 ** ((event time - landmark) / HALF_LIFE).
+HALF_LIFE = timedelta(hours=24)
+REBASE_AFTER = 64      # half-lives
+MAX_EXPONENT = 1000    # 2 ** 1024 overflows
+TRENDING_LIMIT = 50
+MIN_SCORE = 0.01
+
+WEIGHTS = {
+    'post': 1.0,      # a new post starts with a little score of its own
+    'like': 1.0,
+    'bookmark': 1.5,
+    'comment': 2.0,
+}
+
+
+def _landmark():
+    landmark, _ = TrendingLandmark.objects.get_or_create(pk=1, defaults={'at': timezone.now()})
+    return landmark.at
+
+
+def _growth(now, landmark):
+    return 2.0 ** min((now - landmark) / HALF_LIFE, MAX_EXPONENT)
+
+
+# ----------------------------------------
+# INCREMENTAL UPDATES (views + signals)
+# ----------------------------------------
+def record(post_id, kind, undo=False, at=None):
+    """
+    Add (or with undo=True, take back) one `kind` event for a post; `at` is
+    when the event happened (default: now), so an undo removes what was added.
+    """
+    now = timezone.now()
+    landmark = _landmark()
+    if now - landmark > HALF_LIFE * REBASE_AFTER:
+        redecay(now)
+        landmark = now
+    amount = WEIGHTS[kind] * _growth(at or now, landmark)
+    rows = TrendingScore.objects.filter(post_id=post_id)
+
+    if undo:
+        rows.update(score=Greatest(F('score') - amount, Value(0.0, output_field=FloatField())))
+        return
+
+    if rows.update(score=F('score') + amount):
+        return
+    try:
+        with transaction.atomic():
+            tag = Post.objects.values_list('tag', flat=True).get(pk=post_id)
+            TrendingScore.objects.create(post_id=post_id, score=amount, tag=tag)
+    except IntegrityError:
+        # another request created the row first
+        rows.update(score=F('score') + amount)
+
+
+# ----------------------------------------
+# PERIODIC MAINTENANCE (manage.py update_trending)
+# ----------------------------------------
+def redecay(now=None):
+    """Move the landmark to `now` and scale all scores to match. Returns rows dropped."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        _landmark()
+        landmark = TrendingLandmark.objects.select_for_update().get(pk=1)
+        factor = _growth(now, landmark.at)
+        TrendingScore.objects.update(score=F('score') / factor)
+        dropped, _ = TrendingScore.objects.filter(score__lt=MIN_SCORE).delete()
+        landmark.at = now
+        landmark.save()
+    return dropped
+
+
+def rebuild(now=None):
+    """
+    Recompute every score from the stored counters, as if each post's likes,
+    comments and bookmarks had happened when it was posted (the individual
+    like/bookmark times are not stored). Returns the number of rows written.
+    """
+    now = now or timezone.now()
+    rows = []
+    posts = Post.objects.values_list(
+        'id', 'tag', 'created_at', 'like_count', 'comment_count', 'bookmark_count'
+    )
+    for post_id, tag, created_at, likes, comments, bookmarks in posts.iterator():
+        weight = (
+            WEIGHTS['post'] + likes * WEIGHTS['like']
+            + comments * WEIGHTS['comment'] + bookmarks * WEIGHTS['bookmark']
+        )
+        score = weight * _growth(created_at, now)
+        if score >= MIN_SCORE:
+            rows.append(TrendingScore(post_id=post_id, score=score, tag=tag))
+
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingLandmark.objects.update_or_create(pk=1, defaults={'at': now})
+        TrendingScore.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+# ----------------------------------------
+# QUERYING
+# ----------------------------------------
+def trending_post_ids(tag=None, limit=TRENDING_LIMIT):
+    """Ids of the top `limit` trending posts, best first."""
+    rows = TrendingScore.objects.filter(score__gt=0)
+    if tag:
+        rows = rows.filter(tag=tag)
+    return list(rows.order_by('-score', '-post').values_list('post_id', flat=True)[:limit])
+
+
+def trending_posts(queryset, tag=None, limit=TRENDING_LIMIT):
+    """Run trending_post_ids() and load the posts from `queryset` in rank order."""
+    ids = trending_post_ids(tag=tag, limit=limit)
+    posts = queryset.in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
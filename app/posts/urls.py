@@ -3,8 +3,10 @@ from . import views
 
 urlpatterns = [
     path('', views.post, name='posts'),
+    path('more/', views.post_feed_more, name='post_feed_more'),
     path('new/', views.create_post, name='create_post'),
     path('<int:post_id>/', views.post_detail, name='post_detail'),
+    path('<int:post_id>/comments/', views.post_comments, name='post_comments'),
     path('<int:post_id>/edit/', views.edit_post, name='edit_post'),
     path('<int:post_id>/delete/', views.delete_post, name='delete_post'),
     path('<int:post_id>/like/', views.like_post, name='like_post'),
@@ -1,10 +1,32 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponseRedirect
+from django.db import transaction
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render, reverse
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
 
 from .forms import CommentForm, PostForm
 from .models import Comment, Post
+from .pagination import keyset_page
+from .geo import geocode, within_radius
+from .matching import matches_for
+from .search import search_posts
+from .trending import trending_posts
+from .viewer import viewer_state
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+NEARBY_LIMIT = 50
+NEARBY_DEFAULT_KM = 5
+NEARBY_MAX_KM = 50
+NEAR_PARAMS = ('near', 'lat', 'lng', 'km')
+
+
+def _wants_json(request):
+    # fetch() calls ask for JSON; plain links and forms keep getting
+    # redirects so everything still works without JavaScript
+    return 'application/json' in request.headers.get('Accept', '')
 
 
 
@@ -26,20 +48,101 @@ def about(request):
 # ----------------------------------------
 # POST LIST + TAG FILTER
 # ----------------------------------------
+def _feed_queryset(tag_filter):
+    posts = Post.objects.for_listing()
+    if tag_filter and tag_filter != "none":
+        posts = posts.filter(tag=tag_filter)
+    return posts
+
+
+def _nearby_point(request):
+    """
+    (lat, lng, km, place) for the "near" filter, from ?lat=&lng= (browser
+    location) or ?near=<place name>; None if not requested or unknown.
+    """
+    try:
+        km = float(request.GET.get('km', NEARBY_DEFAULT_KM))
+    except ValueError:
+        km = NEARBY_DEFAULT_KM
+    km = min(max(km, 0.1), NEARBY_MAX_KM)
+
+    try:
+        return float(request.GET['lat']), float(request.GET['lng']), km, None
+    except (KeyError, ValueError):
+        pass
+
+    place = geocode(request.GET.get('near', ''))
+    if place is None:
+        return None
+    return place.lat, place.lng, km, place
+
+
 def post(request):
     tag_filter = request.GET.get('tag', None)
-
-    if tag_filter and tag_filter != "none":
-        posts = Post.objects.filter(tag=tag_filter).order_by('-created_at')
+    search_query = request.GET.get('q', '').strip()
+    sort = request.GET.get('sort', '')
+    near_query = request.GET.get('near', '').strip()
+    nearby = _nearby_point(request)
+
+    if search_query:
+        # ranked results replace the chronological feed (top SEARCH_LIMIT only)
+        posts = search_posts(
+            Post.objects.for_listing(), search_query,
+            tag=tag_filter if tag_filter != "none" else None,
+        )
+        next_cursor = None
+    elif nearby or near_query:
+        # posts within `km` of a place (unknown place -> nothing)
+        posts = []
+        if nearby:
+            lat, lng, km, _ = nearby
+            posts = within_radius(_feed_queryset(tag_filter), lat, lng, km, NEARBY_LIMIT)
+        next_cursor = None
+    elif sort == 'trending':
+        # top TRENDING_LIMIT from the materialized ranking
+        posts = trending_posts(
+            Post.objects.for_listing(),
+            tag=tag_filter if tag_filter != "none" else None,
+        )
+        next_cursor = None
     else:
-        posts = Post.objects.all().order_by('-created_at')
+        posts, next_cursor = keyset_page(
+            _feed_queryset(tag_filter), request.GET.get('cursor'), POSTS_PER_PAGE
+        )
 
     return render(request, 'posts/list_posts.html', {
         'posts': posts,
-        'selected_tag': tag_filter
+        'selected_tag': tag_filter,
+        'search_query': search_query,
+        'sort': sort,
+        'near_query': near_query,
+        'nearby': nearby,
+        # kept by the tag, sort and "load more" links like q and sort
+        'near_params': urlencode({
+            name: request.GET[name] for name in NEAR_PARAMS if request.GET.get(name, '').strip()
+        }),
+        'next_cursor': next_cursor,
+        **viewer_state(request.user, posts),
     })
 
 
+# ----------------------------------------
+# POST LIST "LOAD MORE" (JSON)
+# ----------------------------------------
+def post_feed_more(request):
+    tag_filter = request.GET.get('tag', None)
+
+    posts, next_cursor = keyset_page(
+        _feed_queryset(tag_filter), request.GET.get('cursor'), POSTS_PER_PAGE
+    )
+
+    html = render_to_string('posts/post_feed_items.html', {
+        'posts': posts,
+        **viewer_state(request.user, posts),
+    }, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+
 # ----------------------------------------
 # CREATE POST (USER + SHELTER SUPPORT)
 # ----------------------------------------
@@ -88,9 +191,16 @@ def edit_post(request, post_id):
 # ----------------------------------------
 # POST DETAIL + COMMENTS + LIKE + BOOKMARK
 # ----------------------------------------
+def _comment_page(post, before=None):
+    """Latest COMMENTS_PER_PAGE comments (older than `before`), oldest first."""
+    comments, earlier_cursor = keyset_page(
+        post.comments.select_related('author__profile'), before, COMMENTS_PER_PAGE
+    )
+    return comments[::-1], earlier_cursor
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_listing(), id=post_id)
 
     # POST request = comment submit
     if request.method == 'POST':
@@ -102,26 +212,64 @@ def post_detail(request, post_id):
             new_comment = comment_form.save(commit=False)
             new_comment.post = post
             new_comment.author = request.user
-            new_comment.save()
+            # one transaction, so nobody caches the card between the new
+            # version and the new count (signals.count_new_comment)
+            with transaction.atomic():
+                new_comment.save()
+
+            if _wants_json(request):
+                return JsonResponse({
+                    'html': render_to_string('posts/comment.html', {'comment': new_comment}, request=request),
+                    'comment_id': new_comment.id,
+                    'comment_count': Post.objects.values_list('comment_count', flat=True).get(pk=post.pk),
+                }, status=201)
             return HttpResponseRedirect(request.path_info)
 
+        if _wants_json(request):
+            return JsonResponse({'errors': comment_form.errors}, status=400)
+
     else:
         comment_form = CommentForm()
 
-    # Like / Bookmark UI state
-    is_liked = False
-    is_bookmarked = False
-
-    if request.user.is_authenticated:
-        is_liked = post.likes.filter(id=request.user.id).exists()
-        is_bookmarked = post.bookmarks.filter(id=request.user.id).exists()
+    comments, earlier_cursor = _comment_page(post, request.GET.get('before'))
 
     return render(request, 'posts/detail_post.html', {
         'post': post,
         'comments': comments,
+        'earlier_cursor': earlier_cursor,
+        'last_comment_id': comments[-1].id if comments else 0,
         'comment_form': comment_form,
-        'is_liked': is_liked,
-        'is_bookmarked': is_bookmarked
+        'matches': matches_for(post),
+        **viewer_state(request.user, [post]),
+    })
+
+
+# ----------------------------------------
+# COMMENTS (JSON: earlier page / newer than an id)
+# ----------------------------------------
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    after = request.GET.get('after')
+
+    if after is not None:
+        # polling / append: everything newer than the last comment the client has
+        try:
+            after = int(after)
+        except ValueError:
+            return JsonResponse({'error': 'after must be a comment id'}, status=400)
+        comments = list(
+            post.comments.select_related('author__profile')
+            .filter(id__gt=after)
+            .order_by('created_at', 'id')[:COMMENTS_PER_PAGE]
+        )
+        earlier_cursor = None
+    else:
+        comments, earlier_cursor = _comment_page(post, request.GET.get('before'))
+
+    return JsonResponse({
+        'html': render_to_string('posts/comment_items.html', {'comments': comments}, request=request),
+        'last_comment_id': comments[-1].id if comments else after,
+        'earlier_cursor': earlier_cursor,
     })
 
 
@@ -145,30 +293,31 @@ def delete_post(request, post_id):
 
 
 # ----------------------------------------
-# LIKE POST
+# LIKE / BOOKMARK TOGGLES
 # ----------------------------------------
 @login_required
 def like_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-
-    if post.likes.filter(id=request.user.id).exists():
-        post.likes.remove(request.user)
-    else:
-        post.likes.add(request.user)
-
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    liked = post.toggle_like(request.user)  # also moves the trending score
+
+    if _wants_json(request):
+        return JsonResponse({
+            'post_id': post.id,
+            'liked': liked,
+            'like_count': Post.objects.values_list('like_count', flat=True).get(pk=post.pk),
+        })
     return HttpResponseRedirect(request.META.get('HTTP_REFERER', reverse('posts')))
 
 
-# ----------------------------------------
-# BOOKMARK POST
-# ----------------------------------------
 @login_required
 def bookmark_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-
-    if post.bookmarks.filter(id=request.user.id).exists():
-        post.bookmarks.remove(request.user)
-    else:
-        post.bookmarks.add(request.user)
-
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    bookmarked = post.toggle_bookmark(request.user)
+
+    if _wants_json(request):
+        return JsonResponse({
+            'post_id': post.id,
+            'bookmarked': bookmarked,
+            'bookmark_count': Post.objects.values_list('bookmark_count', flat=True).get(pk=post.pk),
+        })
     return HttpResponseRedirect(request.META.get('HTTP_REFERER', reverse('posts')))
@@ -1,7 +1,11 @@
 from django import forms
+from app.core.uploads import ChunkedUploadFormMixin
 from .models import ShelterProfile
 
-class ShelterRegistrationForm(forms.ModelForm):
+class ShelterRegistrationForm(ChunkedUploadFormMixin, forms.ModelForm):
+    # large scans arrive in resumable pieces (app/core/uploads.py)
+    chunked_upload_fields = ['verification_document']
+
     class Meta:
         model = ShelterProfile
         fields = [
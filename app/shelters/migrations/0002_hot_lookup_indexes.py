@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shelters', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shelterprofile',
+            index=models.Index(fields=['status'], name='shelter_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shelters', '0003_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shelterprofile',
+            name='image_meta',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -18,11 +18,21 @@ class ShelterProfile(models.Model):
 
     profile_image = models.ImageField(upload_to='shelter_profiles/', null=True, blank=True, verbose_name="profile image")
     cover_image = models.ImageField(upload_to='shelter_covers/', null=True, blank=True, verbose_name="cover image")
+    # cleaned and resized on upload, size and placeholder in image_meta
+    # (see app/posts/images.py)
+    image_fields = ('profile_image', 'cover_image')
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     
     verification_document = models.FileField(upload_to='shelter_verification_docs/', verbose_name="verification document")
     
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="status")
     created_at = models.DateTimeField(auto_now_add=True)
+    cache_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='shelter_status_idx'),
+        ]
 
     def __str__(self): # pragma: no cover
         return self.name
\ No newline at end of file
@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -66,4 +68,18 @@ class ShelterViewsTest(TestCase):
         self.assertEqual(shelter.name, 'New Name')
         self.assertRedirects(response, reverse('shelter_profile'))
 
-    
\ No newline at end of file
+    
+    def test_profile_views_fetch_the_shelter_once(self):
+        """The shelter is resolved once per request, with its user joined."""
+        shelter = ShelterProfile.objects.create(
+            user=self.user, name='Test Shelter', address='Test Address', phone='0123456789'
+        )
+        # once for the page, once for base.html's menu
+        for url, expected in ((reverse('shelter_profile'), 2),
+                              (reverse('public_shelter_profile', args=[shelter.pk]), 2)):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            reads = [q['sql'] for q in ctx.captured_queries if 'FROM "shelters_shelterprofile"' in q['sql']]
+            self.assertEqual(len(reads), expected, url)
+        self.assertIn('INNER JOIN "auth_user"', reads[0])
@@ -7,6 +7,7 @@ from .models import ShelterProfile
 from .forms import ShelterRegistrationForm, ShelterUpdateForm
 from app.posts.models import Post
 from app.posts.forms import PostForm
+from app.core.mixins import RequestObjectMixin
 
 class ShelterRegisterView(LoginRequiredMixin, CreateView):
     model = ShelterProfile
@@ -21,22 +22,28 @@ class ShelterRegisterView(LoginRequiredMixin, CreateView):
             return redirect('shelter_profile')
         return super().dispatch(request, *args, **kwargs) # pragma: no cover
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user  # owner of the chunked uploads
+        return kwargs
+
     def form_valid(self, form): # pragma: no cover
         form.instance.user = self.request.user
         return super().form_valid(form)
 
-class ShelterProfileView(LoginRequiredMixin, DetailView):
+class ShelterProfileView(LoginRequiredMixin, RequestObjectMixin, DetailView):
     model = ShelterProfile
     template_name = 'shelters/shelter_profile.html'
     context_object_name = 'shelter'
 
-    def get_object(self, queryset=None):
-        return get_object_or_404(ShelterProfile, user=self.request.user)
+    def lookup_object(self, queryset=None):
+        queryset = queryset if queryset is not None else self.get_queryset()
+        return get_object_or_404(queryset, user=self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        shelter = self.get_object()
-        context['shelter_posts'] = Post.objects.filter(shelter=shelter).order_by('-created_at')
+        shelter = self.object
+        context['shelter_posts'] = Post.objects.for_listing().filter(shelter=shelter).order_by('-created_at')
         return context
 
     
@@ -49,14 +56,15 @@ class ShelterUpdateView(LoginRequiredMixin, UpdateView):
     def get_object(self, queryset=None):
         return get_object_or_404(ShelterProfile, user=self.request.user)
     
-class PublicShelterProfileView(DetailView):
+class PublicShelterProfileView(RequestObjectMixin, DetailView):
     model = ShelterProfile
     template_name = 'shelters/public_shelter_profile.html' # สร้าง template ใหม่
     context_object_name = 'shelter'
+    related_fields = ('user',)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        shelter = self.get_object()
-        context['shelter_posts'] = Post.objects.filter(shelter=shelter).order_by('-created_at')
+        shelter = self.object
+        context['shelter_posts'] = Post.objects.for_listing().filter(shelter=shelter).order_by('-created_at')
         return context
     
@@ -0,0 +1,254 @@
+import codecs
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.forms.models import model_to_dict
+
+from app.posts.fragments import stamp
+
+from .forms import ProductForm
+from .models import Product
+from .search import index_products
+
+
+# ----------------------------------------
+# PRODUCT CATALOGUE IMPORT / EXPORT (CSV, JSON)
+# ----------------------------------------
+# Columns: id, name, description, price, stock. A row with an id updates
+# that product of the store (missing or blank columns keep their value), a
+# row without one adds a product. Every row goes through ProductForm, so the
+# rules are the same as for the add/edit pages; rows that fail are skipped
+# and reported by number (1 = the first product, the CSV header not counted).
+# So is a row repeating the id of an earlier one, instead of overwriting it.
+#
+# The file is read as a stream (CSV line by line, JSON one list item at a
+# time) and written BATCH_SIZE rows at a time: one query for the products
+# being updated, then bulk_create + bulk_update + the search index in one
+# transaction per batch. Bulk writes skip the model signals, so the batch
+# sets what they would: listed/store_type, cache_version, the search index.
+#
+# Export streams the same columns in id order, EXPORT_CHUNK_SIZE rows per
+# query, so the whole catalogue is never in memory; its output imports back.
+FIELDS = ('name', 'description', 'price', 'stock')
+EXPORT_FIELDS = ('id',) + FIELDS
+UPDATE_FIELDS = FIELDS + ('listed', 'store_type', 'cache_version')
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+READ_SIZE = 64 * 1024
+
+
+class CatalogueError(ValueError):
+    """The file itself cannot be read (encoding, JSON syntax, columns)."""
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []        # (row number, message), the first MAX_REPORTED_ERRORS
+        self.error_count = 0
+        self.stopped = ''       # why reading stopped early; earlier batches are saved
+
+    def error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((number, message))
+
+    @property
+    def more_errors(self):
+        return self.error_count - len(self.errors)
+
+
+# ----------------------------------------
+# READING
+# ----------------------------------------
+def read_csv(file):
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+    reader = csv.DictReader(lines)
+    try:
+        header = reader.fieldnames or []
+        if not set(header) & set(EXPORT_FIELDS):
+            raise CatalogueError("The first line must name the columns: %s." % ', '.join(EXPORT_FIELDS))
+        yield from reader
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise CatalogueError(f"The CSV file cannot be read ({e}).")
+
+
+def read_json(file):
+    """The items of a JSON list, decoded one at a time."""
+    stream = codecs.getreader('utf-8-sig')(file)
+    decoder = json.JSONDecoder()
+    # `buffer[pos:]` is what is left to decode; it is only cut down when
+    # more is read, so each character is copied a bounded number of times
+    buffer, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = '' if eof else stream.read(READ_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return bool(chunk)
+
+    def peek():
+        # the next non-blank character ('' at the end), reading on as needed
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not read_more():
+                return buffer[pos:pos + 1]
+
+    try:
+        if peek() != '[':
+            raise CatalogueError("A JSON file must hold a list of products.")
+        pos += 1
+        if peek() == ']':
+            return
+        while True:
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    # a number may go on in the next chunk
+                    if end < len(buffer) or eof:
+                        pos = end
+                        break
+                except json.JSONDecodeError:
+                    # an item cut at the end of what was read so far
+                    if eof:
+                        raise CatalogueError("The JSON file is not valid.")
+                read_more()
+            yield item
+            separator = peek()
+            if separator == ']':
+                return
+            if separator != ',':
+                raise CatalogueError("The JSON file is not valid.")
+            pos += 1
+            peek()
+    except UnicodeDecodeError as e:
+        raise CatalogueError(f"The JSON file cannot be read ({e}).")
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+# ----------------------------------------
+# IMPORT
+# ----------------------------------------
+def _form_errors(form):
+    return '; '.join(
+        f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+        for field, messages in form.errors.items()
+    )
+
+
+def _product_id(row):
+    value = str(row.get('id') or '').strip()
+    return int(value) if value.isdigit() else value or None
+
+
+def _import_batch(store, batch, report, seen):
+    ids = [_product_id(row) for _, row in batch if isinstance(row, dict)]
+    existing = store.products.in_bulk([pk for pk in ids if isinstance(pk, int)])
+    new, changed = [], []
+
+    for number, row in batch:
+        if not isinstance(row, dict):
+            report.error(number, "Each product must be an object with %s." % ', '.join(EXPORT_FIELDS))
+            continue
+        pk = _product_id(row)
+        instance = existing.get(pk) if pk is not None else None
+        if pk is not None and instance is None:
+            report.error(number, f"id: no product {pk} in this store.")
+            continue
+        if pk in seen:
+            report.error(number, f"id: product {pk} is already in an earlier row.")
+            continue
+        data = model_to_dict(instance, fields=FIELDS) if instance else {}
+        data.update({field: row[field] for field in FIELDS if row.get(field) not in (None, '')})
+        form = ProductForm(data=data, instance=instance)
+        if not form.is_valid():
+            report.error(number, _form_errors(form))
+            continue
+        product = form.save(commit=False)
+        product.store = store
+        # what the pre_save signals do
+        product.listed = store.status == 'APPROVED'
+        product.store_type = store.store_type
+        stamp(product)
+        (changed if instance else new).append(product)
+        if instance:
+            seen.add(pk)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(new)
+        Product.objects.bulk_update(changed, UPDATE_FIELDS)
+        index_products(new + changed, store.name)
+    report.created += len(new)
+    report.updated += len(changed)
+
+
+def import_products(store, rows, batch_size=BATCH_SIZE):
+    """Add or update the products of `store` from `rows` (dicts); returns an ImportReport."""
+    report = ImportReport()
+    batch, seen = [], set()     # seen: ids updated so far
+    try:
+        for number, row in enumerate(rows, start=1):
+            batch.append((number, row))
+            if len(batch) == batch_size:
+                _import_batch(store, batch, report, seen)
+                batch = []
+    except CatalogueError as e:
+        report.stopped = str(e)
+    if batch:
+        _import_batch(store, batch, report, seen)
+    return report
+
+
+# ----------------------------------------
+# EXPORT
+# ----------------------------------------
+class _Echo:
+    """csv.writer target that hands back each line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def _export_rows(store):
+    return (
+        Product.objects.filter(store=store).order_by('id')
+        .values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _grouped(lines, size=EXPORT_CHUNK_SIZE):
+    # one response chunk per `size` rows rather than one per row
+    group = []
+    for line in lines:
+        group.append(line)
+        if len(group) == size:
+            yield ''.join(group)
+            group = []
+    if group:
+        yield ''.join(group)
+
+
+def stream_csv(store):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _grouped(writer.writerow(values) for values in _export_rows(store))
+
+
+def stream_json(store):
+    yield '['
+    yield from _grouped(
+        ('\n' if i == 0 else ',\n') + json.dumps(dict(zip(EXPORT_FIELDS, values)), cls=DjangoJSONEncoder)
+        for i, values in enumerate(_export_rows(store))
+    )
+    yield '\n]\n'
+
+
+STREAMS = {'csv': (stream_csv, 'text/csv; charset=utf-8'), 'json': (stream_json, 'application/json')}
@@ -1,7 +1,11 @@
 from django import forms
+from app.core.uploads import ChunkedUploadFormMixin
 from .models import Store, Product, StoreReview, ProductReview
 
-class StoreRequestForm(forms.ModelForm):
+class StoreRequestForm(ChunkedUploadFormMixin, forms.ModelForm):
+    # large scans arrive in resumable pieces (app/core/uploads.py)
+    chunked_upload_fields = ['verification_document']
+
     class Meta:
         model = Store
         fields = ['name', 'description', 'store_type', 'profile_image', 'cover_image', 'verification_document', 'verification_statement']
@@ -30,6 +34,24 @@ class StoreRequestForm(forms.ModelForm):
             )
         return cleaned_data
 
+class MarketplaceFilterForm(forms.Form):
+    """The marketplace query string; invalid values are ignored, not reported."""
+    SORT_CHOICES = [
+        ('', 'Newest'),
+        ('price', 'Price: low to high'),
+        ('-price', 'Price: high to low'),
+        ('rating', 'Top rated'),
+    ]
+
+    q = forms.CharField(required=False, strip=True)
+    type = forms.ChoiceField(required=False, choices=[('', 'all')] + Store.STORE_TYPE_CHOICES)
+    sort = forms.ChoiceField(required=False, choices=SORT_CHOICES)
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    in_stock = forms.BooleanField(required=False)
+    min_rating = forms.TypedChoiceField(required=False, coerce=int, empty_value=None,
+                                        choices=[('', 'any')] + [(str(i), i) for i in range(1, 6)])
+
 class StoreUpdateForm(forms.ModelForm):
     class Meta:
         model = Store
@@ -62,6 +84,21 @@ class ProductForm(forms.ModelForm):
         self.fields['image'].widget.attrs.update({'class': 'w-full text-sm text-text dark:text-darktext border border-border dark:border-darkborder rounded-lg cursor-pointer bg-background dark:bg-darkbg'})
         self.fields['stock'].widget.attrs.update({'class': common_classes, 'type': 'number'})
 
+class ProductImportForm(forms.Form):
+    """A .csv or .json catalogue; the rows themselves are checked by catalogue.import_products()."""
+    file = forms.FileField(label="Catalogue file (.csv or .json)")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['file'].widget.attrs.update({'class': 'w-full text-sm text-text dark:text-darktext border border-border dark:border-darkborder rounded-lg cursor-pointer bg-background dark:bg-darkbg', 'accept': '.csv,.json'})
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        self.format = file.name.rsplit('.', 1)[-1].lower()
+        if self.format not in ('csv', 'json'):
+            raise forms.ValidationError("Choose a .csv or .json file.")
+        return file
+
 class StoreReviewForm(forms.ModelForm):
     class Meta:
         model = StoreReview
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.stores.models import Store
+from app.stores.search import index_store
+
+
+class Command(BaseCommand):
+    help = "Re-tokenize every store and product into the marketplace search index."
+
+    def handle(self, *args, **options):
+        count = 0
+        with transaction.atomic():
+            for store in Store.objects.only('id', 'name', 'description').iterator():
+                index_store(store)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} store(s) and their products."))
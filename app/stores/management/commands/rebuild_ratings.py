@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from app.posts.fragments import new_version
+from app.stores.models import Product, ProductReview, Store, StoreReview
+from app.stores.ratings import rating_average, rating_counts
+
+
+def _reconcile(model, review_model, field):
+    counts = rating_counts(review_model, field)
+    drifted = Q()
+    for name in counts:
+        drifted |= ~Q(**{name: F(f'real_{name}')})
+    pks = list(
+        model.objects.annotate(**{f'real_{name}': value for name, value in counts.items()})
+        .filter(drifted)
+        .values_list('pk', flat=True)
+    )
+    rows = model.objects.filter(pk__in=pks)
+    rows.update(**counts, cache_version=new_version())
+    rows.update(rating_avg=rating_average())
+    return len(pks)
+
+
+class Command(BaseCommand):
+    help = ("Recompute the stored rating sum, count, histogram and average of stores "
+            "and products from their reviews.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            stores = _reconcile(Store, StoreReview, 'store')
+            products = _reconcile(Product, ProductReview, 'product')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt ratings, {stores} store(s) and {products} product(s) had drifted."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0002_productreview_storereview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', '-created_at'], name='product_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(fields=['status', 'store_type'], name='store_status_type_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0003_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
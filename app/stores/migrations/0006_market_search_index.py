@@ -0,0 +1,94 @@
+import re
+
+from django.db import migrations
+
+
+# A frozen copy of the tokenizer and index SQL of app/stores/search.py (and
+# app/posts/search.py) as of this migration, so later changes to those
+# modules cannot change what it does. Row ids: product 2 * pk, store 2 * pk + 1.
+THAI = re.compile(r'[\u0E00-\u0E7F]+')
+TOKEN = re.compile(r'[\u0E00-\u0E7F]+|[^\W\u0E00-\u0E7F]+')
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN.finditer((text or '').lower()):
+        word = match.group()
+        if THAI.fullmatch(word) and len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def tsvector_literal(name, body):
+    parts = []
+    for position, token in enumerate(name + body, start=1):
+        weight = 'A' if position <= len(name) else 'B'
+        token = token.replace('\\', '\\\\').replace("'", "''")
+        parts.append(f"'{token}':{min(position, 16383)}{weight}")
+    return ' '.join(parts)
+
+
+def build_search_index(apps, schema_editor):
+    Store = apps.get_model('stores', 'Store')
+    Product = apps.get_model('stores', 'Product')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS stores_market_fts USING fts5("
+            "store_id UNINDEXED, name, body, "
+            "tokenize=\"unicode61 remove_diacritics 0 categories 'L* N* Co M*'\")"
+        )
+        insert = "INSERT INTO stores_market_fts (rowid, store_id, name, body) VALUES (%s, %s, %s, %s)"
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS stores_market_search ("
+            "id bigint PRIMARY KEY, store_id bigint NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS stores_market_search_document_gin "
+            "ON stores_market_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS stores_market_search_store_idx ON stores_market_search (store_id)"
+        )
+        insert = (
+            "INSERT INTO stores_market_search (id, store_id, document) VALUES (%s, %s, %s::tsvector) "
+            "ON CONFLICT (id) DO UPDATE SET store_id = EXCLUDED.store_id, document = EXCLUDED.document"
+        )
+    else:
+        return
+
+    def write(cursor, row, store_id, name, body):
+        if vendor == 'sqlite':
+            cursor.execute(insert, [row, store_id, ' '.join(name), ' '.join(body)])
+        else:
+            cursor.execute(insert, [row, store_id, tsvector_literal(name, body)])
+
+    with schema_editor.connection.cursor() as cursor:
+        for store in Store.objects.only('id', 'name', 'description').iterator():
+            write(cursor, 2 * store.pk + 1, store.pk, tokenize(store.name), tokenize(store.description))
+        for product in Product.objects.select_related('store').only(
+                'id', 'store_id', 'name', 'description', 'store__name').iterator():
+            write(cursor, 2 * product.pk, product.store_id, tokenize(product.name),
+                  tokenize(product.description) + tokenize(product.store.name))
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS stores_market_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS stores_market_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0005_image_meta'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+# a frozen copy of app/stores/ratings.py's rating_counts() and rating_average()
+def rating_counts(review_model, field):
+    def aggregate(expression, **filters):
+        rows = (
+            review_model.objects.filter(**{field: OuterRef('pk')}, **filters)
+            .values(field)
+            .annotate(n=expression)
+            .values('n')
+        )
+        return Coalesce(Subquery(rows), 0)
+
+    return {
+        'rating_sum': aggregate(Sum('rating')),
+        'rating_count': aggregate(Count('*')),
+        **{f'rating_{stars}': aggregate(Count('*'), rating=stars) for stars in range(1, 6)},
+    }
+
+
+def rating_average():
+    average = Cast('rating_sum', FloatField()) / Cast('rating_count', FloatField())
+    return Case(When(rating_count=0, then=Value(0.0)), default=average)
+
+
+def backfill_ratings(apps, schema_editor):
+    Store = apps.get_model('stores', 'Store')
+    Product = apps.get_model('stores', 'Product')
+    Store.objects.update(**rating_counts(apps.get_model('stores', 'StoreReview'), 'store'))
+    Product.objects.update(**rating_counts(apps.get_model('stores', 'ProductReview'), 'product'))
+    Store.objects.update(rating_avg=rating_average())
+    Product.objects.update(rating_avg=rating_average())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0006_market_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', '-created_at'], name='product_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(fields=['status', '-rating_avg'], name='store_status_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
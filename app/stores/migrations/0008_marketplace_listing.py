@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def copy_store_listing(apps, schema_editor):
+    Store = apps.get_model('stores', 'Store')
+    Product = apps.get_model('stores', 'Product')
+    Product.objects.update(
+        listed=Exists(Store.objects.filter(pk=OuterRef('store_id'), status='APPROVED')),
+        store_type=Subquery(Store.objects.filter(pk=OuterRef('store_id')).values('store_type')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0007_rating_summaries'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_rating_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='listed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='store_type',
+            field=models.CharField(blank=True, choices=[('PET', 'pet shop'), ('SUPPLIES', 'supplies shop')], editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['-created_at', '-id'], name='product_listed_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['price', 'id'], name='product_listed_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['-rating_avg', '-id'], name='product_listed_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['store_type', '-created_at', '-id'], name='product_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['store_type', 'price', 'id'], name='product_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['store_type', '-rating_avg', '-id'], name='product_type_rating_idx'),
+        ),
+        migrations.RunPython(copy_store_listing, migrations.RunPython.noop),
+    ]
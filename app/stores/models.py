@@ -1,8 +1,60 @@
 # app/stores/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
-class Store(models.Model):
+from .ratings import STARS, apply_rating
+
+
+class RatingSummary(models.Model):
+    """Review aggregates kept on the rated row (see ratings.py)."""
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        """[(stars, reviews, percent of reviews)], 5 stars first."""
+        return [
+            (stars, getattr(self, f'rating_{stars}'),
+             round(100 * getattr(self, f'rating_{stars}') / self.rating_count) if self.rating_count else 0)
+            for stars in reversed(STARS)
+        ]
+
+
+class RatedReview:
+    """StoreReview/ProductReview: a save adjusts the rated row's summary in the same transaction."""
+    rated_field = None
+
+    def rate(self, rating, sign):
+        field = self._meta.get_field(self.rated_field)
+        apply_rating(field.related_model, getattr(self, field.attname), rating, sign)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old = None
+            if self.pk is not None:
+                old = type(self).objects.select_for_update().filter(pk=self.pk).values_list('rating', flat=True).first()
+            super().save(*args, **kwargs)
+            if old != self.rating:
+                if old is not None:
+                    self.rate(old, -1)
+                self.rate(self.rating, 1)
+    # deletes (also bulk and cascading ones) go through post_delete in signals.py
+
+
+class Store(RatingSummary):
     # --- ย้ายโค้ดทั้งหมดนี้เข้ามาในคลาส Store ---
     STATUS_CHOICES = [
         ('PENDING', 'pending'),
@@ -23,6 +75,10 @@ class Store(models.Model):
 
     profile_image = models.ImageField(upload_to='store_profiles/', null=True, blank=True, verbose_name="profile image")
     cover_image = models.ImageField(upload_to='store_covers/', null=True, blank=True, verbose_name="cover image")
+    # cleaned and resized on upload, size and placeholder in image_meta
+    # (see app/posts/images.py)
+    image_fields = ('profile_image', 'cover_image')
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
 
     # --- เพิ่มฟิลด์สำหรับ Verification ---
     verification_document = models.FileField(upload_to='store_verification_docs/', null=True, blank=True, verbose_name="Verification Document")
@@ -32,22 +88,62 @@ class Store(models.Model):
     verification_document = models.FileField(upload_to='store_verification_docs/', null=True, blank=True, verbose_name="Verification Document")
     verification_statement = models.TextField(null=True, blank=True, verbose_name="Verification Statement")
 
+    cache_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'store_type'], name='store_status_type_idx'),
+            models.Index(fields=['status', '-rating_avg'], name='store_status_rating_idx'),
+        ]
+
     def __str__(self): # pragma: no cover
         return self.name
 
-class Product(models.Model):
+class Product(RatingSummary):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='products')
     name = models.CharField(max_length=255, verbose_name="product name")
     description = models.TextField(verbose_name="product description")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="product price")
     image = models.ImageField(upload_to='product_images/', blank=True, null=True, verbose_name="product image")
+    image_fields = ('image',)
+    image_meta = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.PositiveIntegerField(default=0, verbose_name="stock quantity")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # copies of store.status == 'APPROVED' and store.store_type (kept by
+    # stores/signals.py), so the marketplace filters and sorts on one table
+    listed = models.BooleanField(default=False, editable=False)
+    store_type = models.CharField(max_length=10, choices=Store.STORE_TYPE_CHOICES, blank=True, editable=False)
+
+    # product tiles are cached per version (see app/posts/fragments.py)
+    cache_version = models.BigIntegerField(default=0, editable=False)
+    fragment_depends_on = ('store',)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', '-created_at'], name='product_store_created_idx'),
+            # marketplace: one per sort, for all types and for one type, each
+            # matching its keyset (field, id) order; listed products only
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(listed=True),
+                         name='product_listed_created_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(listed=True),
+                         name='product_listed_price_idx'),
+            models.Index(fields=['-rating_avg', '-id'], condition=models.Q(listed=True),
+                         name='product_listed_rating_idx'),
+            models.Index(fields=['store_type', '-created_at', '-id'], condition=models.Q(listed=True),
+                         name='product_type_created_idx'),
+            models.Index(fields=['store_type', 'price', 'id'], condition=models.Q(listed=True),
+                         name='product_type_price_idx'),
+            models.Index(fields=['store_type', '-rating_avg', '-id'], condition=models.Q(listed=True),
+                         name='product_type_rating_idx'),
+        ]
+
     def __str__(self): # pragma: no cover
         return self.name
     
-class StoreReview(models.Model):
+class StoreReview(RatedReview, models.Model):
+    rated_field = 'store'
+
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='reviews')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)]) # 1-5 ดาว
@@ -62,7 +158,9 @@ class StoreReview(models.Model):
     def __str__(self):
         return f'{self.rating} stars for {self.store.name} by {self.author.username}'
 
-class ProductReview(models.Model):
+class ProductReview(RatedReview, models.Model):
+    rated_field = 'product'
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)]) # 1-5 ดาว
@@ -0,0 +1,63 @@
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from app.posts.fragments import new_version
+
+
+# ----------------------------------------
+# STORED RATING SUMMARIES (Store, Product)
+# ----------------------------------------
+# Pages show the average, the number of reviews and how they spread over
+# the stars; the marketplace sorts and filters by the average. Instead of
+# aggregating the reviews on every view, the rated row keeps
+#   rating_sum, rating_count, rating_1 .. rating_5 (the histogram)
+#   rating_avg   rating_sum / rating_count, 0 while unrated (indexed)
+# A review write or delete adjusts them with one UPDATE in the same
+# transaction (StoreReview/ProductReview.save(), stores/signals.py), and
+# `manage.py rebuild_ratings` recomputes them from the reviews.
+STARS = range(1, 6)
+
+
+def _average(total, count):
+    return Cast(total, FloatField()) / Cast(count, FloatField())
+
+
+def rating_change(rating, sign):
+    """UPDATE values adding (sign=1) or removing (sign=-1) one `rating`."""
+    total = F('rating_sum') + sign * rating
+    count = F('rating_count') + sign
+    return {
+        'rating_sum': total,
+        'rating_count': count,
+        f'rating_{rating}': F(f'rating_{rating}') + sign,
+        # the right-hand side sees the old values: the new count is 0 when it was -sign
+        'rating_avg': Case(When(rating_count=-sign, then=Value(0.0)), default=_average(total, count)),
+        'cache_version': new_version(),
+    }
+
+
+def apply_rating(model, pk, rating, sign):
+    model.objects.filter(pk=pk).update(**rating_change(rating, sign))
+
+
+def rating_counts(review_model, field):
+    """UPDATE values recounting sum, count and histogram from `review_model` (FK `field`)."""
+    def aggregate(expression, **filters):
+        rows = (
+            review_model.objects.filter(**{field: OuterRef('pk')}, **filters)
+            .values(field)
+            .annotate(n=expression)
+            .values('n')
+        )
+        return Coalesce(Subquery(rows), 0)
+
+    return {
+        'rating_sum': aggregate(Sum('rating')),
+        'rating_count': aggregate(Count('*')),
+        **{f'rating_{stars}': aggregate(Count('*'), rating=stars) for stars in STARS},
+    }
+
+
+def rating_average():
+    """UPDATE value of rating_avg from the stored sum and count."""
+    return Case(When(rating_count=0, then=Value(0.0)), default=_average(F('rating_sum'), F('rating_count')))
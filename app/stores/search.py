@@ -0,0 +1,304 @@
+from django.db import connection
+from django.db.models import Count, Q
+
+from app.posts.pagination import decode_cursor, encode_cursor, keyset_page
+from app.posts.search import MAX_QUERY_TOKENS, tokenize
+
+from .models import Product, Store
+
+
+# ----------------------------------------
+# MARKETPLACE SEARCH (products and stores)
+# ----------------------------------------
+# Same tokens as the post search (app/posts/search.py: Latin words, Thai
+# bigrams), in one index holding both products and stores, so one query
+# returns the ranked products, the ranked stores and the number of matching
+# products per store_type (the tabs) in a single pass over the index.
+#
+# Row ids tell the two apart: a product is stored at 2 * pk, a store at
+# 2 * pk + 1. Documents:
+#   * product -> name: product name;  body: description + store name
+#   * store   -> name: store name;    body: description
+# Only APPROVED stores (and their products) are returned; the status is read
+# from stores_store at query time, so approving a store needs no reindex.
+#
+# Backends:
+#   * SQLite   -> FTS5 virtual table stores_market_fts(store_id, name, body)
+#   * Postgres -> stores_market_search(id, store_id, document tsvector) + GIN
+#   * others   -> icontains fallback (unranked)
+SEARCH_LIMIT = 50
+INDEX_BATCH_SIZE = 500
+STORE_LIMIT = 6
+
+
+def product_row(pk):
+    return 2 * pk
+
+
+def store_row(pk):
+    return 2 * pk + 1
+
+
+def _vendor():
+    return connection.vendor
+
+
+# ----------------------------------------
+# INDEX MAINTENANCE (called from signals)
+# ----------------------------------------
+def _tsvector_literal(name, body):
+    # the tsvector text form, so Postgres keeps our tokens as they are
+    parts = []
+    for position, token in enumerate(name + body, start=1):
+        weight = 'A' if position <= len(name) else 'B'
+        token = token.replace('\\', '\\\\').replace("'", "''")
+        parts.append(f"'{token}':{min(position, 16383)}{weight}")
+    return ' '.join(parts)
+
+
+def _write(rows):
+    """rows: (row id, store_id, name tokens, body tokens) per document."""
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.executemany("DELETE FROM stores_market_fts WHERE rowid = %s", [[row[0]] for row in rows])
+            cursor.executemany(
+                "INSERT INTO stores_market_fts (rowid, store_id, name, body) VALUES (%s, %s, %s, %s)",
+                [[row, store_id, ' '.join(name), ' '.join(body)] for row, store_id, name, body in rows],
+            )
+        elif vendor == 'postgresql':
+            cursor.executemany(
+                "INSERT INTO stores_market_search (id, store_id, document) VALUES (%s, %s, %s::tsvector) "
+                "ON CONFLICT (id) DO UPDATE SET store_id = EXCLUDED.store_id, document = EXCLUDED.document",
+                [[row, store_id, _tsvector_literal(name, body)] for row, store_id, name, body in rows],
+            )
+
+
+def _product_document(product, store_name):
+    return (product_row(product.pk), product.store_id, tokenize(product.name),
+            tokenize(product.description) + tokenize(store_name))
+
+
+def index_product(product, store_name=None):
+    if store_name is None:
+        store_name = product.store.name
+    _write([_product_document(product, store_name)])
+
+
+def index_products(products, store_name):
+    """Index many products of one store in a single batch (bulk writes skip the signals)."""
+    _write([_product_document(product, store_name) for product in products])
+
+
+def index_store(store, products=True):
+    """Index `store` and, as they carry its name, its products (INDEX_BATCH_SIZE per write)."""
+    _write([(store_row(store.pk), store.pk, tokenize(store.name), tokenize(store.description))])
+    if not products:
+        return
+    rows = Product.objects.filter(store=store).only('id', 'store_id', 'name', 'description')
+    batch = []
+    for product in rows.iterator(chunk_size=INDEX_BATCH_SIZE):
+        batch.append(product)
+        if len(batch) == INDEX_BATCH_SIZE:
+            index_products(batch, store.name)
+            batch = []
+    if batch:
+        index_products(batch, store.name)
+
+
+def unindex(row):
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute("DELETE FROM stores_market_fts WHERE rowid = %s", [row])
+        elif vendor == 'postgresql':
+            cursor.execute("DELETE FROM stores_market_search WHERE id = %s", [row])
+
+
+class MarketResults:
+    def __init__(self, product_ids=(), store_ids=(), facets=None, more=False, last_score=None, cursor=None):
+        self.product_ids = list(product_ids)
+        self.store_ids = list(store_ids)
+        self.facets = facets or {}   # store_type -> number of matching products
+        self.more = more             # more products follow this page
+        self.last_score = last_score
+        self.cursor = cursor         # set by the fallback, which pages itself
+
+    def next_cursor(self, last_product, order=None):
+        """Cursor of the next page of products (None on the last page)."""
+        if not self.more or self.cursor:
+            return self.cursor
+        if order is not None:
+            return encode_cursor(last_product, order[0])
+        return f"{self.last_score!r}_{self.product_ids[-1]}"
+
+
+# ----------------------------------------
+# FILTERS
+# ----------------------------------------
+# The marketplace filters (MarketplaceFilterForm) as ORM lookups for the
+# browsing pages, and as SQL on the product row joined to each search hit,
+# so a search pages through and counts only the products that pass them.
+def filter_products(queryset, filters):
+    if filters.get('min_price') is not None:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+    if filters.get('max_price') is not None:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+    if filters.get('in_stock'):
+        queryset = queryset.filter(stock__gt=0)
+    if filters.get('min_rating'):
+        queryset = queryset.filter(rating_avg__gte=filters['min_rating'])
+    return queryset
+
+
+def _filter_sql(filters):
+    clauses, params = [], []
+    if filters.get('min_price') is not None:
+        clauses.append("p.price >= %s")
+        params.append(filters['min_price'])
+    if filters.get('max_price') is not None:
+        clauses.append("p.price <= %s")
+        params.append(filters['max_price'])
+    if filters.get('in_stock'):
+        clauses.append("p.stock > 0")
+    if filters.get('min_rating'):
+        clauses.append("p.rating_avg >= %s")
+        params.append(filters['min_rating'])
+    return ''.join(f" AND {clause}" for clause in clauses), params
+
+
+# ----------------------------------------
+# QUERYING
+# ----------------------------------------
+# hits:     every match in approved stores with its score (lower is better);
+#           products only if their row passes the filters, with the sort key
+# products: the page after the cursor, of the chosen type
+# stores:   the best stores
+# then the facet counts, over the filtered products of every type
+MARKET_SQL = """
+WITH hits AS MATERIALIZED (
+    {hits}
+),
+products AS (
+    SELECT 0 AS kind, id, store_type, score, ROW_NUMBER() OVER (ORDER BY {order}) AS pos
+    FROM hits WHERE is_store = 0 AND (%s = '' OR store_type = %s){after}
+),
+stores AS (
+    SELECT 1 AS kind, id, store_type, score, ROW_NUMBER() OVER (ORDER BY score, id DESC) AS pos
+    FROM hits WHERE is_store = 1
+)
+SELECT kind, id, store_type, score, pos FROM products WHERE pos <= %s
+UNION ALL
+SELECT kind, id, store_type, score, pos FROM stores WHERE pos <= %s
+UNION ALL
+SELECT 2, COUNT(*), store_type, NULL, 0 FROM hits WHERE is_store = 0 GROUP BY store_type
+ORDER BY kind, pos
+"""
+
+SQLITE_HITS = """
+    SELECT f.rowid / 2 AS id, f.rowid %% 2 AS is_store, s.store_type,
+           bm25(stores_market_fts, 0.0, 5.0, 1.0) AS score, {key} AS sort_key
+    FROM stores_market_fts f JOIN stores_store s ON s.id = f.store_id
+    LEFT JOIN stores_product p ON f.rowid %% 2 = 0 AND p.id = f.rowid / 2
+    WHERE stores_market_fts MATCH %s AND s.status = 'APPROVED'
+      AND (f.rowid %% 2 = 1 OR (p.id IS NOT NULL{filters}))
+"""
+
+POSTGRES_HITS = """
+    SELECT m.id / 2 AS id, m.id %% 2 AS is_store, s.store_type,
+           -ts_rank(m.document, %s::tsquery) AS score, {key} AS sort_key
+    FROM stores_market_search m JOIN stores_store s ON s.id = m.store_id
+    LEFT JOIN stores_product p ON m.id %% 2 = 0 AND p.id = m.id / 2
+    WHERE m.document @@ %s::tsquery AND s.status = 'APPROVED'
+      AND (m.id %% 2 = 1 OR (p.id IS NOT NULL{filters}))
+"""
+
+
+def _page_sql(order, cursor):
+    """(sort key of a hit, ORDER BY, condition for "after the cursor", its params)."""
+    if order is None:
+        # best match first, ties newest first; the cursor is '<score>_<id>'
+        key, column, descending, id_descending = 'NULL', 'score', False, True
+        try:
+            raw, pk = cursor.rsplit('_', 1)
+            position = float(raw), int(pk)
+        except (AttributeError, ValueError):
+            position = None
+    else:
+        field, descending = order
+        key, column, id_descending = f'p.{field}', 'sort_key', descending
+        model_field = Product._meta.get_field(field)
+        position = decode_cursor(cursor, model_field)
+        if position is not None:
+            position = model_field.get_db_prep_value(position[0], connection), position[1]
+
+    ordering = f"{column} {'DESC' if descending else 'ASC'}, id {'DESC' if id_descending else 'ASC'}"
+    if position is None:
+        return key, ordering, '', []
+    value, pk = position
+    before, id_before = ('<' if descending else '>'), ('<' if id_descending else '>')
+    after = f" AND ({column} {before} %s OR ({column} = %s AND id {id_before} %s))"
+    return key, ordering, after, [value, value, pk]
+
+
+def search_market(query, store_type='', filters=None, order=None, cursor=None,
+                  limit=SEARCH_LIMIT, store_limit=STORE_LIMIT):
+    """
+    Ids of the products (of `store_type`, if given) and stores matching
+    every token of `query`, and the per-store_type product counts. Products
+    must pass `filters` (MarketplaceFilterForm data) and come `limit` at a
+    time after `cursor`, best match first or by `order` ((field, descending)).
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return MarketResults()
+
+    filters = filters or {}
+    vendor = _vendor()
+    if vendor == 'sqlite':
+        match = ' '.join('"%s"' % token.replace('"', '""') for token in tokens)
+        hits, params = SQLITE_HITS, [match]
+    elif vendor == 'postgresql':
+        tsquery = ' & '.join("'%s'" % token.replace('\\', '\\\\').replace("'", "''") for token in tokens)
+        hits, params = POSTGRES_HITS, [tsquery, tsquery]
+    else:
+        return _fallback_search(query, store_type, filters, order, cursor, limit, store_limit)
+
+    filter_sql, filter_params = _filter_sql(filters)
+    key, ordering, after, after_params = _page_sql(order, cursor)
+    sql = MARKET_SQL.format(hits=hits.format(key=key, filters=filter_sql), order=ordering, after=after)
+    params = [*params, *filter_params, store_type or '', store_type or '', *after_params, limit + 1, store_limit]
+
+    results = MarketResults()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for kind, value, row_type, score, pos in cursor.fetchall():
+            if kind == 2:
+                results.facets[row_type] = value
+            elif kind == 1:
+                results.store_ids.append(value)
+            elif pos > limit:
+                results.more = True
+            else:
+                results.product_ids.append(value)
+                results.last_score = score
+    return results
+
+
+def _fallback_search(query, store_type, filters, order, cursor, limit, store_limit):
+    products = filter_products(Product.objects.filter(listed=True), filters).filter(
+        Q(name__icontains=query) | Q(description__icontains=query) | Q(store__name__icontains=query)
+    )
+    facets = dict(products.values_list('store_type').annotate(n=Count('id')).order_by())
+    if store_type:
+        products = products.filter(store_type=store_type)
+    field, descending = order or ('created_at', True)
+    page, next_cursor = keyset_page(products, cursor, limit, field, descending)
+    stores = Store.objects.filter(status='APPROVED', name__icontains=query)
+    return MarketResults(
+        [product.pk for product in page],
+        stores.order_by('-created_at').values_list('id', flat=True)[:store_limit],
+        facets,
+        more=next_cursor is not None,
+        cursor=next_cursor,
+    )
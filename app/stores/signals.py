@@ -0,0 +1,96 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from app.posts.fragments import stamp
+from app.posts.images import pending_images, queue_renditions
+
+from .models import Product, ProductReview, Store, StoreReview
+from .search import index_product, index_store, product_row, store_row, unindex
+
+
+# ----------------------------------------
+# PRODUCT TILE CACHE VERSIONS (see app/posts/fragments.py)
+# ----------------------------------------
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Store)
+def stamp_cache_version(sender, instance, **kwargs):
+    stamp(instance)
+
+
+# ----------------------------------------
+# UPLOADED IMAGES (see app/posts/images.py)
+# ----------------------------------------
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Store)
+def clean_image_uploads(sender, instance, **kwargs):
+    instance._pending_images = pending_images(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Store)
+def queue_image_renditions(sender, instance, **kwargs):
+    queue_renditions(instance)
+
+
+# ----------------------------------------
+# MARKETPLACE SEARCH INDEX (see search.py)
+# ----------------------------------------
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(pre_save, sender=Store)
+def note_store_rename(sender, instance, update_fields=None, **kwargs):
+    # products carry the store name: reindex them only when it changes
+    # (a new store has none yet)
+    instance._renamed = (
+        instance.pk is not None
+        and (update_fields is None or 'name' in update_fields)
+        and not Store.objects.filter(pk=instance.pk, name=instance.name).exists()
+    )
+
+
+@receiver(post_save, sender=Store)
+def update_store_search_index(sender, instance, created, **kwargs):
+    index_store(instance, products=instance.__dict__.pop('_renamed', False) and not created)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search_index(sender, instance, **kwargs):
+    unindex(product_row(instance.pk))
+
+
+@receiver(post_delete, sender=Store)
+def remove_store_from_search_index(sender, instance, **kwargs):
+    unindex(store_row(instance.pk))
+
+
+# ----------------------------------------
+# RATING SUMMARIES (see ratings.py)
+# ----------------------------------------
+# writes adjust them in RatedReview.save(); post_delete runs inside the
+# delete's transaction and also sees bulk and cascading deletes
+@receiver(post_delete, sender=StoreReview)
+@receiver(post_delete, sender=ProductReview)
+def remove_review_rating(sender, instance, **kwargs):
+    instance.rate(instance.rating, -1)
+
+
+# ----------------------------------------
+# MARKETPLACE LISTING (Product.listed / store_type)
+# ----------------------------------------
+@receiver(pre_save, sender=Product)
+def copy_store_listing(sender, instance, **kwargs):
+    instance.listed = instance.store.status == 'APPROVED'
+    instance.store_type = instance.store.store_type
+
+
+@receiver(post_save, sender=Store)
+def update_product_listing(sender, instance, created, **kwargs):
+    if created:
+        return
+    listed = instance.status == 'APPROVED'
+    (Product.objects.filter(store=instance)
+     .exclude(listed=listed, store_type=instance.store_type)
+     .update(listed=listed, store_type=instance.store_type))
@@ -1,7 +1,18 @@
+import json
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Store, Product
+from .models import Store, Product, ProductReview, StoreReview
+from .catalogue import import_products, read_json
+from .search import search_market
 
 # A utility function to create a store quickly in tests
 def create_store(owner, name, store_type, status):
@@ -192,4 +203,372 @@ class FormSubmissionTests(TestCase):
         
         # Refresh the object from the database to check for changes
         self.approved_store.refresh_from_db()
-        self.assertEqual(self.approved_store.name, 'My Updated Store Name')
\ No newline at end of file
+        self.assertEqual(self.approved_store.name, 'My Updated Store Name')
+
+class MarketplaceFragmentCacheTests(TestCase):
+    """
+    Product tiles are cached per product/store version.
+    """
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.store = create_store(self.owner, 'Pet Paradise', 'PET', 'APPROVED')
+        self.product = create_product(self.store, 'Cat Food', 19.99)
+
+    def test_product_edit_renews_tile(self):
+        self.client.get(reverse('marketplace'))
+        self.product.price = 29.99
+        self.product.save()
+        response = self.client.get(reverse('marketplace'))
+        self.assertContains(response, '29.99')
+
+    def test_store_rename_renews_tile(self):
+        self.client.get(reverse('marketplace'))
+        self.store.name = 'Pet Heaven'
+        self.store.save()
+        response = self.client.get(reverse('marketplace'))
+        self.assertContains(response, 'From store: Pet Heaven')
+
+
+class MarketplaceSearchTests(TestCase):
+    """
+    Marketplace search runs on the full-text index (app/stores/search.py).
+    """
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.pet_store = create_store(self.owner, 'Pet Paradise', 'PET', 'APPROVED')
+        self.supply_store = create_store(self.owner, 'ร้านอาหารแมว', 'SUPPLIES', 'APPROVED')
+        self.pending = create_store(self.owner, 'Hidden Cat Shop', 'PET', 'PENDING')
+
+        self.kibble = Product.objects.create(store=self.pet_store, name='Cat Kibble', description='Crunchy', price=10)
+        self.toy = Product.objects.create(store=self.pet_store, name='Feather Toy', description='Every cat loves it', price=5)
+        self.thai = Product.objects.create(store=self.supply_store, name='อาหารแมวเปียก', description='ปลาทูน่า', price=30)
+        Product.objects.create(store=self.pending, name='Cat Bed', description='...', price=50)
+
+    def test_ranks_products_and_counts_types(self):
+        results = search_market('cat')
+        # name matches first, pending stores never
+        self.assertEqual(results.product_ids, [self.kibble.pk, self.toy.pk])
+        self.assertEqual(results.store_ids, [])
+        self.assertEqual(results.facets, {'PET': 2})
+
+    def test_thai_words_match_inside_longer_names(self):
+        results = search_market('แมว')
+        self.assertEqual(results.product_ids, [self.thai.pk])
+        self.assertEqual(results.store_ids, [self.supply_store.pk])
+        self.assertEqual(search_market('ทูน่า').product_ids, [self.thai.pk])
+
+    def test_type_filter_keeps_facet_counts(self):
+        Product.objects.create(store=self.supply_store, name='Cat Litter', description='...', price=8)
+        response = self.client.get(reverse('marketplace'), {'q': 'cat', 'type': 'SUPPLIES'})
+        self.assertEqual([p.name for p in response.context['products']], ['Cat Litter'])
+        self.assertEqual(response.context['facets'], {'': 3, 'PET': 2, 'SUPPLIES': 1})
+        self.assertContains(response, '(2)')
+
+    def test_index_follows_edits(self):
+        self.pet_store.name = 'Kitten Corner'
+        self.pet_store.save()
+        self.assertEqual(search_market('kitten').store_ids, [self.pet_store.pk])
+        self.assertEqual(set(search_market('kitten').product_ids), {self.kibble.pk, self.toy.pk})
+
+        self.kibble.delete()
+        self.assertEqual(search_market('kibble').product_ids, [])
+        self.pending.status = 'APPROVED'
+        self.pending.save()
+        self.assertEqual(search_market('bed').product_ids, [self.pending.products.get().pk])
+
+    def test_search_is_one_query(self):
+        with self.assertNumQueries(1):
+            search_market('cat paradise')
+
+    def test_store_save_reindexes_products_only_on_rename(self):
+        self.pet_store.description = 'Food and toys'
+        with CaptureQueriesContext(connection) as queries:
+            self.pet_store.save()
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertFalse(any('"stores_product"' in sql for sql in reads))
+
+        self.pet_store.name = 'Kitten Corner'
+        with CaptureQueriesContext(connection) as queries:
+            self.pet_store.save()
+        inserts = [query for query in queries if 'INSERT INTO stores_market_fts' in query['sql']]
+        # the store row, then both products in one batch
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(set(search_market('kitten').product_ids), {self.kibble.pk, self.toy.pk})
+
+
+class RatingSummaryTests(TestCase):
+    """
+    Stores and products keep their review aggregates (app/stores/ratings.py).
+    """
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.store = create_store(self.owner, 'Pet Paradise', 'PET', 'APPROVED')
+        self.product = create_product(self.store, 'Cat Food', 19.99)
+        self.users = [User.objects.create_user(username=f'buyer{i}', password='password123') for i in range(3)]
+
+    def review(self, user, rating, target=None):
+        target = target or self.product
+        if isinstance(target, Store):
+            return StoreReview.objects.create(store=target, author=user, rating=rating, comment='...')
+        return ProductReview.objects.create(product=target, author=user, rating=rating, comment='...')
+
+    def test_reviews_update_the_summary(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        self.review(self.users[2], 2, target=self.store)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (9, 2))
+        self.assertEqual(self.product.rating_avg, 4.5)
+        self.assertEqual(self.product.rating_histogram[:2], [(5, 1, 50), (4, 1, 50)])
+        self.assertEqual(Store.objects.get(pk=self.store.pk).average_rating, 2)
+
+        first.rating = 1
+        first.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_5, self.product.rating_1), (5, 0, 1))
+
+        ProductReview.objects.all().delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.rating_avg), (0, 0, 0))
+        self.assertIsNone(self.product.average_rating)
+
+    def test_review_form_and_pages_use_the_summary(self):
+        self.client.login(username='buyer0', password='password123')
+        self.client.post(reverse('store_review_create', kwargs={'pk': self.store.pk}), {'rating': 4, 'comment': 'Nice'})
+        self.assertEqual(Store.objects.get(pk=self.store.pk).rating_count, 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('store_profile', kwargs={'pk': self.store.pk}))
+        self.assertContains(response, 'based on 1 review.')
+        self.assertFalse([q for q in queries if 'stores_storereview' in q['sql']])
+
+    def test_rebuild_ratings_fixes_drift(self):
+        self.review(self.users[0], 3)
+        Product.objects.filter(pk=self.product.pk).update(rating_sum=40, rating_count=9, rating_avg=4.4)
+        out = StringIO()
+        call_command('rebuild_ratings', stdout=out)
+        self.assertIn('1 product(s) had drifted', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.rating_3), (3, 1, 1))
+        self.assertEqual(self.product.rating_avg, 3)
+
+    def test_marketplace_sorts_and_filters_by_rating(self):
+        top = create_product(self.store, 'Dog Treats', 5)
+        self.review(self.users[0], 5, target=top)
+        self.review(self.users[1], 3)
+        response = self.client.get(reverse('marketplace'), {'sort': 'rating'})
+        self.assertEqual([p.name for p in response.context['products']], ['Dog Treats', 'Cat Food'])
+        response = self.client.get(reverse('marketplace'), {'min_rating': '4'})
+        self.assertEqual([p.name for p in response.context['products']], ['Dog Treats'])
+        response = self.client.get(reverse('marketplace'), {'q': 'food treats', 'min_rating': '4'})
+        self.assertEqual(list(response.context['products']), [])
+
+
+class MarketplaceBrowseTests(TestCase):
+    """
+    Filters, sorts and cursor pagination of the marketplace.
+    """
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        pets = create_store(self.owner, 'Pet Paradise', 'PET', 'APPROVED')
+        supplies = create_store(self.owner, 'Supply Barn', 'SUPPLIES', 'APPROVED')
+        self.products = [
+            Product.objects.create(store=pets if i % 2 else supplies, name=f'Item {i:02}', description='...',
+                                   price=10 + (i * 7) % 30, stock=i % 3)
+            for i in range(30)
+        ]
+
+    def walk(self, params):
+        """Follow the next-page links, returning every product name and the query count per page."""
+        names, queries, url = [], [], reverse('marketplace') + '?' + params
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            queries.append(len(captured))
+            names += [p.name for p in response.context['products']]
+            url = response.context['next_url'] and reverse('marketplace') + response.context['next_url']
+        return names, queries
+
+    def test_pages_cover_every_product_once_in_order(self):
+        names, queries = self.walk('')
+        self.assertEqual(names, [f'Item {i:02}' for i in reversed(range(30))])
+        self.assertEqual(len(set(queries)), 1)  # page 3 costs what page 1 does
+
+        names, _ = self.walk('sort=price')
+        by_price = sorted(self.products, key=lambda p: (p.price, p.pk))
+        self.assertEqual(names, [p.name for p in by_price])
+        names, _ = self.walk('sort=-price')
+        self.assertEqual(names, [p.name for p in reversed(by_price)])
+
+    def test_filters_and_preserved_parameters(self):
+        names, _ = self.walk('type=PET&in_stock=1&min_price=15&max_price=30&sort=price')
+        expected = [p for p in self.products if p.store.store_type == 'PET' and p.stock and 15 <= p.price <= 30]
+        self.assertEqual(sorted(names), sorted(p.name for p in expected))
+
+        response = self.client.get(reverse('marketplace'), {'type': 'PET', 'sort': 'price', 'min_price': 'abc'})
+        self.assertIn('type=PET', response.context['next_url'])
+        self.assertIn('sort=price', response.context['next_url'])
+        tabs = {tab['label']: tab['url'] for tab in response.context['type_tabs']}
+        self.assertEqual(tabs['Supplies'], '?type=SUPPLIES&sort=price&min_price=abc')
+        self.assertNotIn('type=', tabs['Show All'])
+
+        response = self.client.get(reverse('marketplace'), {'cursor': 'garbage', 'sort': 'rating'})
+        self.assertEqual(len(response.context['products']), 12)
+
+    def test_search_pages_through_filtered_matches(self):
+        names, _ = self.walk('q=item')
+        self.assertEqual(sorted(names), sorted(p.name for p in self.products))
+
+        by_price = sorted(self.products, key=lambda p: (p.price, p.pk))
+        names, _ = self.walk('q=item&sort=price')
+        self.assertEqual(names, [p.name for p in by_price])
+        names, _ = self.walk('q=item&sort=rating')
+        self.assertEqual(names, [p.name for p in reversed(self.products)])
+
+        # filtered inside the search query: pages and counts hold only what passes
+        names, _ = self.walk('q=item&in_stock=1&min_price=15&max_price=30&sort=-price')
+        expected = [p for p in reversed(by_price) if p.stock and 15 <= p.price <= 30]
+        self.assertEqual(names, [p.name for p in expected])
+        response = self.client.get(reverse('marketplace'), {'q': 'item', 'in_stock': '1', 'type': 'PET'})
+        in_stock = [p for p in self.products if p.stock]
+        self.assertEqual(response.context['facets'], {
+            '': len(in_stock),
+            'PET': sum(p.store.store_type == 'PET' for p in in_stock),
+            'SUPPLIES': sum(p.store.store_type == 'SUPPLIES' for p in in_stock),
+        })
+
+
+def table_reads(queries, table):
+    """Number of SELECTs reading `table` first (FROM), i.e. fetching its rows."""
+    return sum(1 for q in queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql'])
+
+
+class StoreViewObjectQueryTests(TestCase):
+    """
+    Manage/update views resolve their store or product once per request
+    (RequestObjectMixin), with the owner joined, whoever asks for it.
+    """
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        self.store = create_store(self.owner, 'Paws', 'PET', 'APPROVED')
+        self.product = create_product(self.store, 'Collar', 10)
+
+    def assertSingleRead(self, table, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(table_reads(ctx.captured_queries, table), 1, url)
+        self.assertEqual(table_reads(ctx.captured_queries, 'auth_user'), 1, url)  # the session user only
+        return response
+
+    def test_each_view_fetches_its_object_once(self):
+        self.client.login(username='owner', password='password123')
+        self.assertSingleRead('stores_store', 'get', reverse('store_manage', args=[self.store.pk]))
+        self.assertSingleRead('stores_store', 'get', reverse('store_update', args=[self.store.pk]))
+        self.assertSingleRead('stores_product', 'get', reverse('product_update', args=[self.product.pk]))
+        response = self.assertSingleRead('stores_product', 'post', reverse('product_update', args=[self.product.pk]),
+                                         {'name': 'Leash', 'description': 'Red', 'price': '12.00', 'stock': 1})
+        self.assertRedirects(response, reverse('store_manage', args=[self.store.pk]))
+
+    def test_store_update_refuses_non_owner_before_saving(self):
+        self.client.login(username='other', password='password123')
+        response = self.client.post(reverse('store_update', args=[self.store.pk]),
+                                    {'name': 'Taken', 'description': '', 'store_type': 'PET'})
+        self.assertEqual(response.status_code, 403)
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.name, 'Paws')
+
+
+class ProductCatalogueTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        self.store = create_store(self.owner, 'Paws', 'PET', 'APPROVED')
+        self.other_store = create_store(self.other, 'Claws', 'PET', 'APPROVED')
+        self.collar = Product.objects.create(store=self.store, name='Collar', description='Red', price=10, stock=3)
+        self.foreign = Product.objects.create(store=self.other_store, name='Bowl', description='Steel', price=5)
+        self.client.login(username='owner', password='password123')
+
+    def upload(self, name, content):
+        return self.client.post(reverse('product_import', args=[self.store.pk]),
+                                {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_import_adds_updates_and_reports_rows(self):
+        response = self.upload('catalogue.csv', (
+            "id,name,description,price,stock\n"
+            f"{self.collar.pk},,,12.50,7\n"           # blank cells keep their value
+            ",Leash,Long leash,15,2\n"
+            ",Broken,No price,abc,1\n"
+            f"{self.foreign.pk},Stolen,Not mine,1,1\n"
+            ",Harness,Fits all,20,0\n"
+        ))
+        self.assertEqual(response.status_code, 200)
+        report = response.context['report']
+        self.assertEqual((report.created, report.updated, report.error_count), (2, 1, 2))
+        self.assertEqual([number for number, _ in report.errors], [3, 4])
+        self.assertIn('price', report.errors[0][1])
+        self.assertContains(response, 'Row 4: id: no product')
+
+        self.collar.refresh_from_db()
+        self.assertEqual((self.collar.name, str(self.collar.price), self.collar.stock), ('Collar', '12.50', 7))
+        leash = Product.objects.get(name='Leash')
+        # what the signals would have set
+        self.assertTrue(leash.listed)
+        self.assertEqual(leash.store_type, 'PET')
+        self.assertNotEqual(leash.cache_version, 0)
+        self.assertIn(leash.id, search_market('leash').product_ids)
+        self.assertEqual(Product.objects.get(pk=self.foreign.pk).name, 'Bowl')
+
+    def test_json_import_in_batches(self):
+        items = ',\n'.join('{"name": "Toy %d", "description": "Squeaky", "price": "%d.00", "stock": 1}' % (i, i + 1)
+                           for i in range(7))
+        # tiny reads: items are cut across them
+        with mock.patch('app.stores.catalogue.READ_SIZE', 7), CaptureQueriesContext(connection) as ctx:
+            report = import_products(self.store, read_json(BytesIO(f'[{items}, 3]'.encode())), batch_size=3)
+        self.assertEqual((report.created, report.error_count), (7, 1))
+        self.assertEqual(report.errors[0][0], 8)
+        self.assertEqual(Product.objects.filter(store=self.store, name__startswith='Toy').count(), 7)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "stores_product"')]
+        self.assertEqual(len(inserts), 3)   # one per batch
+
+    def test_repeated_id_is_reported(self):
+        rows = [{'id': self.collar.pk, 'stock': 3}, {'name': 'Leash', 'description': 'Long', 'price': 5, 'stock': 1},
+                {'id': self.collar.pk, 'stock': 9}, {'id': str(self.collar.pk), 'stock': 4}]
+        for batch_size in (1, 4):
+            report = import_products(self.store, iter(rows), batch_size=batch_size)
+            self.assertEqual((report.updated, report.error_count), (1, 2))
+            self.assertEqual([number for number, _ in report.errors], [3, 4])
+            self.assertIn('earlier row', report.errors[0][1])
+            self.collar.refresh_from_db()
+            self.assertEqual(self.collar.stock, 3)
+
+    def test_json_numbers_cut_between_reads(self):
+        with mock.patch('app.stores.catalogue.READ_SIZE', 3):
+            self.assertEqual(list(read_json(BytesIO(b'[ 12345 , {"a": [1, 2]},\n 678]'))), [12345, {'a': [1, 2]}, 678])
+
+    def test_invalid_json_keeps_earlier_batches(self):
+        report = import_products(self.store, read_json(BytesIO(
+            b'[{"name": "Ball", "description": "Round", "price": 2, "stock": 1}, {"name": ')), batch_size=1)
+        self.assertEqual(report.created, 1)
+        self.assertIn('not valid', report.stopped)
+
+    def test_export_streams_what_import_reads(self):
+        response = self.client.get(reverse('product_export', args=[self.store.pk]))
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.splitlines(), ['id,name,description,price,stock', f'{self.collar.pk},Collar,Red,10.00,3'])
+
+        response = self.client.get(reverse('product_export', args=[self.store.pk]) + '?format=json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, [{'id': self.collar.pk, 'name': 'Collar', 'description': 'Red', 'price': '10.00', 'stock': 3}])
+
+    def test_only_the_owner_can_import_or_export(self):
+        self.client.login(username='other', password='password123')
+        self.assertEqual(self.client.get(reverse('product_export', args=[self.store.pk])).status_code, 403)
+        self.assertEqual(self.upload('catalogue.csv', "name,description,price,stock\nX,Y,1,1\n").status_code, 403)
+        self.assertFalse(Product.objects.filter(name='X').exists())
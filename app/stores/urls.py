@@ -10,6 +10,8 @@ from .views import (
     StoreUpdateView,
     ProductUpdateView,
     ProductDeleteView,
+    ProductImportView,
+    ProductExportView,
     StoreReviewListView,
     StoreReviewCreateView,
     ProductReviewListView,
@@ -25,6 +27,8 @@ urlpatterns = [
     path('request-new/', StoreRequestCreateView.as_view(), name='store_request'),
     path('<int:pk>/manage/', StoreManageView.as_view(), name='store_manage'),
     path('<int:pk>/add-product/', ProductCreateView.as_view(), name='product_create'),
+    path('<int:pk>/import-products/', ProductImportView.as_view(), name='product_import'),
+    path('<int:pk>/export-products/', ProductExportView.as_view(), name='product_export'),
     path('<int:pk>/edit/', StoreUpdateView.as_view(), name='store_update'),
     path('product/<int:pk>/edit/', ProductUpdateView.as_view(), name='product_update'),
     path('product/<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
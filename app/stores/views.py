@@ -1,13 +1,16 @@
 from django.shortcuts import get_object_or_404, redirect
-from django.db.models import Avg
-from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView
+from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView, FormView, View
+from django.views.generic.detail import SingleObjectMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy, reverse
-from django.http import HttpResponseForbidden
-from django.db import models
+from django.http import HttpResponseForbidden, StreamingHttpResponse
 from .models import Store, Product, StoreReview, ProductReview
 from django.contrib import messages
-from .forms import StoreRequestForm, ProductForm, StoreUpdateForm, StoreReviewForm, ProductReviewForm
+from .search import filter_products, search_market
+from .catalogue import READERS, STREAMS, import_products
+from app.core.mixins import RequestObjectMixin
+from app.posts.pagination import keyset_page
+from .forms import MarketplaceFilterForm, StoreRequestForm, ProductForm, ProductImportForm, StoreUpdateForm, StoreReviewForm, ProductReviewForm
 
 class StoreRequestCreateView(LoginRequiredMixin, CreateView):
     model = Store
@@ -15,6 +18,11 @@ class StoreRequestCreateView(LoginRequiredMixin, CreateView):
     template_name = 'stores/store_request_form.html'
     success_url = reverse_lazy('store_list')
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user  # owner of the chunked uploads
+        return kwargs
+
     def form_valid(self, form):
         form.instance.owner = self.request.user
         return super().form_valid(form)
@@ -35,43 +43,93 @@ class StoreProfileView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         store = self.get_object()
-        reviews = store.reviews.all()
         context['products'] = Product.objects.filter(store=store, store__status='APPROVED').order_by('-created_at')
-        context['reviews'] = reviews
-        context['average_rating'] = reviews.aggregate(Avg('rating'))['rating__avg']
+        # stored on the row, no aggregate over the reviews (see ratings.py)
+        context['average_rating'] = store.average_rating
         return context
 
+PRODUCTS_PER_PAGE = 12
+
+# sort -> (field, descending); each has a (listed, [store_type,] field, id)
+# index on Product, so every page is an index range scan of
+# PRODUCTS_PER_PAGE + 1 rows
+MARKET_SORTS = {
+    '': ('created_at', True),
+    'price': ('price', False),
+    '-price': ('price', True),
+    'rating': ('rating_avg', True),   # stored average, see ratings.py
+}
+
 class MarketplaceView(ListView):
     model = Product
     template_name = 'stores/marketplace.html'
     context_object_name = 'products'
-    paginate_by = 12
 
     def get_queryset(self):
-        queryset = Product.objects.filter(store__status='APPROVED').select_related('store').order_by('-created_at')
-        search_query = self.request.GET.get('q', None)
-        store_type = self.request.GET.get('type', None)
-
-        if search_query:
-            queryset = queryset.filter(
-                models.Q(name__icontains=search_query) | 
-                models.Q(description__icontains=search_query) |
-                models.Q(store__name__icontains=search_query)
+        self.filters = MarketplaceFilterForm(self.request.GET)
+        self.filters.is_valid()
+        filters = self.filters.cleaned_data
+        # listed/store_type are copied from the store, so filter and order use one index
+        queryset = Product.objects.filter(listed=True).select_related('store')
+        store_type = filters.get('type') or ''
+        order = MARKET_SORTS[filters.get('sort') or '']
+        cursor = self.request.GET.get('cursor')
+
+        # ranked products, stores and tab counts from the search index (search.py)
+        self.search_results = None
+        if filters.get('q'):
+            # best match first unless a sort was picked
+            order = order if filters.get('sort') else None
+            self.search_results = search_market(
+                filters['q'], store_type, filters, order, cursor, PRODUCTS_PER_PAGE
             )
-        if store_type in ['PET', 'SUPPLIES']:
-            queryset = queryset.filter(store__store_type=store_type)
-        return queryset
+            products = queryset.in_bulk(self.search_results.product_ids)
+            products = [products[pk] for pk in self.search_results.product_ids if pk in products]
+            self.next_cursor = self.search_results.next_cursor(products[-1] if products else None, order)
+            return products
+
+        queryset = filter_products(queryset, filters)
+        if store_type:
+            queryset = queryset.filter(store_type=store_type)
+        products, self.next_cursor = keyset_page(queryset, cursor, PRODUCTS_PER_PAGE, *order)
+        return products
+
+    def _url(self, **changes):
+        """This page's query string with `changes` applied (None drops a key), cursor dropped."""
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        for key, value in changes.items():
+            if value:
+                params[key] = value
+            else:
+                params.pop(key, None)
+        return f"?{params.urlencode()}" if params else reverse('marketplace')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        search_query = self.request.GET.get('q', '')
-        found_stores = None
-        if search_query:
-            found_stores = Store.objects.filter(status='APPROVED', name__icontains=search_query)
-        
+        results = self.search_results
+        found_stores = facets = None
+        if results is not None:
+            stores = Store.objects.in_bulk(results.store_ids)
+            found_stores = [stores[pk] for pk in results.store_ids if pk in stores]
+            facets = {'': sum(results.facets.values()), **results.facets}
+
+        filters = self.filters.cleaned_data
+        selected_type = filters.get('type') or ''
+        context['type_tabs'] = [
+            {'label': label, 'url': self._url(type=key), 'selected': key == selected_type,
+             'count': facets.get(key, 0) if facets is not None else None}
+            for key, label in [('', 'Show All'), ('PET', 'Pet'), ('SUPPLIES', 'Supplies')]
+        ]
+        context['next_url'] = self._url(cursor=self.next_cursor) if self.next_cursor else None
         context['found_stores'] = found_stores
-        context['search_query'] = search_query
-        context['selected_type'] = self.request.GET.get('type', '')
+        context['facets'] = facets
+        context['filters'] = self.filters
+        context['sort_choices'] = MarketplaceFilterForm.SORT_CHOICES
+        context['search_query'] = filters.get('q', '')
+        context['selected_type'] = selected_type
+        context['selected_sort'] = filters.get('sort') or ''
+        context['min_rating'] = str(filters.get('min_rating') or '')
         return context
 
 class ProductDetailView(DetailView):
@@ -82,28 +140,20 @@ class ProductDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         product = self.get_object()
-        reviews = product.reviews.all()
-        context['reviews'] = reviews
-        context['average_rating'] = reviews.aggregate(Avg('rating'))['rating__avg']
+        context['average_rating'] = product.average_rating
         return context
 
-class StoreManageView(LoginRequiredMixin, DetailView):
+class StoreManageView(LoginRequiredMixin, RequestObjectMixin, DetailView):
     model = Store
     template_name = 'stores/store_manage.html'
     context_object_name = 'store'
-
-    def dispatch(self, request, *args, **kwargs):
-        store = self.get_object()
-        handler = super().dispatch(request, *args, **kwargs)
-        if getattr(handler, 'status_code', 200) in (301, 302):
-            return handler
-        if store.owner != request.user:
-            return HttpResponseForbidden("You are not the owner of this store")
-        return handler
+    related_fields = ('owner',)
+    owner_field = 'owner'
+    owner_denied_message = "You are not the owner of this store"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        store = self.get_object()
+        store = self.object
         search_query = self.request.GET.get('q', '')
         products_queryset = Product.objects.filter(store=store)
         if search_query:
@@ -111,9 +161,7 @@ class StoreManageView(LoginRequiredMixin, DetailView):
         
         context['products'] = products_queryset.order_by('-created_at')
         context['search_query'] = search_query
-        reviews = store.reviews.all()
-        context['reviews'] = reviews
-        context['average_rating'] = reviews.aggregate(Avg('rating'))['rating__avg']
+        context['average_rating'] = store.average_rating
         return context
 
 class ProductCreateView(LoginRequiredMixin, CreateView):
@@ -144,44 +192,38 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse('store_manage', kwargs={'pk': self.store.pk})
     
-class StoreUpdateView(LoginRequiredMixin, UpdateView):
+class StoreUpdateView(LoginRequiredMixin, RequestObjectMixin, UpdateView):
     model = Store
     form_class = StoreUpdateForm
     template_name = 'stores/store_update_form.html'
     context_object_name = 'store'
+    related_fields = ('owner',)
+    # checked before the form is processed
+    owner_field = 'owner'
+    owner_denied_message = "You do not have permission to edit this store."
 
     def get_success_url(self):
         return reverse_lazy('store_manage', kwargs={'pk': self.object.pk})
 
-    def dispatch(self, request, *args, **kwargs):
-        # ownership check
-        store = self.get_object()
-        handler = super().dispatch(request, *args, **kwargs)
-        if getattr(handler, 'status_code', 200) in (301, 302):
-            return handler
-        if store.owner != request.user:
-            return HttpResponseForbidden("You do not have permission to edit this store.")
-        return handler
-
-class ProductUpdateView(LoginRequiredMixin, UpdateView):
+class ProductUpdateView(LoginRequiredMixin, RequestObjectMixin, UpdateView):
     model = Product
     form_class = ProductForm
     template_name = 'stores/product_update_form.html'
     context_object_name = 'product'
+    related_fields = ('store__owner',)
 
     def get_queryset(self):
         # only allow updating products that belong to the user's store
-        return Product.objects.filter(store__owner=self.request.user)
+        return super().get_queryset().filter(store__owner=self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['store'] = self.get_object().store
+        context['store'] = self.object.store
         return context
 
     def get_success_url(self):
         # when update is successful, redirect to store manage page
-        product = self.get_object()
-        return reverse_lazy('store_manage', kwargs={'pk': product.store.pk})
+        return reverse_lazy('store_manage', kwargs={'pk': self.object.store_id})
 
 class ProductDeleteView(LoginRequiredMixin, DeleteView):
     model = Product
@@ -197,6 +239,44 @@ class ProductDeleteView(LoginRequiredMixin, DeleteView):
         product = self.get_object()
         return reverse_lazy('store_manage', kwargs={'pk': product.store.pk})
     
+class ProductImportView(LoginRequiredMixin, RequestObjectMixin, SingleObjectMixin, FormView):
+    """Add or update many products from a CSV/JSON file (see catalogue.py)."""
+    model = Store
+    form_class = ProductImportForm
+    template_name = 'stores/product_import.html'
+    context_object_name = 'store'
+    owner_field = 'owner'
+    owner_denied_message = "You are not the owner of this store"
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return super().get(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object.status != 'APPROVED':
+            return HttpResponseForbidden("You can only add products to approved stores")
+        return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        rows = READERS[form.format](form.cleaned_data['file'])
+        report = import_products(self.object, rows)
+        return self.render_to_response(self.get_context_data(form=form, report=report))
+
+class ProductExportView(LoginRequiredMixin, RequestObjectMixin, SingleObjectMixin, View):
+    """The store's products as CSV (default) or JSON (?format=json), streamed."""
+    model = Store
+    owner_field = 'owner'
+    owner_denied_message = "You are not the owner of this store"
+
+    def get(self, request, *args, **kwargs):
+        store = self.get_object()
+        fmt = request.GET.get('format', 'csv')
+        stream, content_type = STREAMS.get(fmt) or STREAMS['csv']
+        response = StreamingHttpResponse(stream(store), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="store-{store.pk}-products.{fmt if fmt in STREAMS else "csv"}"'
+        return response
+
 class StoreReviewListView(DetailView):
     """แสดงรายการรีวิวทั้งหมดของร้านค้า"""
     model = Store
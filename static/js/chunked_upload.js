@@ -0,0 +1,205 @@
+// Resumable uploads for <input type="file" data-chunked-upload="/uploads/">.
+//
+// As soon as a file is chosen it is sent in pieces (see app/core/uploads.py):
+// start an upload with its size and SHA-256, PUT one chunk at a time, and
+// on a network error wait and carry on from the offset the server reports.
+// The upload is remembered in localStorage, so choosing the same file again
+// after a reload resumes it instead of starting over. When it is complete
+// the upload id goes into the hidden input named by data-upload-target and
+// the file input loses its name, so submitting the form sends the id, not
+// the file. Without JavaScript the plain upload is used.
+(function() {
+  const csrfMeta = document.querySelector('meta[name="csrf-token"]');
+  const headers = { 'X-CSRFToken': csrfMeta ? csrfMeta.content : '', 'Accept': 'application/json' };
+  const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+  // SHA-256 of the file, read HASH_SLICE bytes at a time: crypto.subtle can
+  // only digest a buffer holding the whole file, which is what chunked
+  // uploads are there to avoid.
+  const HASH_SLICE = 4 * 1024 * 1024;
+  const K = new Int32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+  ]);
+
+  function sha256Hasher() {
+    const h = new Int32Array([
+      0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+    ]);
+    const w = new Int32Array(64);
+    const block = new Uint8Array(64);
+    let filled = 0, length = 0;
+
+    function compress(bytes, at) {
+      for (let i = 0; i < 16; i++, at += 4) {
+        w[i] = (bytes[at] << 24) | (bytes[at + 1] << 16) | (bytes[at + 2] << 8) | bytes[at + 3];
+      }
+      for (let i = 16; i < 64; i++) {
+        const x = w[i - 15], y = w[i - 2];
+        const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+        const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+        w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+      }
+      let a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+      for (let i = 0; i < 64; i++) {
+        const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+        const t1 = (k + S1 + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+        const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+        const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+        k = g; g = f; f = e; e = (d + t1) | 0;
+        d = c; c = b; b = a; a = (t1 + t2) | 0;
+      }
+      h[0] += a; h[1] += b; h[2] += c; h[3] += d; h[4] += e; h[5] += f; h[6] += g; h[7] += k;
+    }
+
+    function update(bytes) {
+      let at = 0;
+      length += bytes.length;
+      if (filled) {
+        const take = Math.min(64 - filled, bytes.length);
+        block.set(bytes.subarray(0, take), filled);
+        filled += take;
+        at = take;
+        if (filled < 64) return;
+        compress(block, 0);
+        filled = 0;
+      }
+      for (; at + 64 <= bytes.length; at += 64) compress(bytes, at);
+      block.set(bytes.subarray(at), 0);
+      filled = bytes.length - at;
+    }
+
+    function hex() {
+      const bits = length * 8;
+      const tail = new Uint8Array((filled < 56 ? 64 : 128) - filled);
+      tail[0] = 0x80;
+      const view = new DataView(tail.buffer);
+      view.setUint32(tail.length - 8, Math.floor(bits / 0x100000000));
+      view.setUint32(tail.length - 4, bits >>> 0);
+      update(tail);
+      return Array.from(h, x => (x >>> 0).toString(16).padStart(8, '0')).join('');
+    }
+
+    return { update, hex };
+  }
+
+  async function sha256(file) {
+    const hasher = sha256Hasher();
+    for (let at = 0; at < file.size; at += HASH_SLICE) {
+      hasher.update(new Uint8Array(await file.slice(at, at + HASH_SLICE).arrayBuffer()));
+    }
+    return hasher.hex();
+  }
+
+  async function request(url, options) {
+    const response = await fetch(url, { credentials: 'same-origin', ...options, headers: { ...headers, ...(options.headers || {}) } });
+    const data = await response.json().catch(() => ({}));
+    return { status: response.status, data };
+  }
+
+  async function start(input, file, digest) {
+    const key = `chunked-upload:${digest}:${file.size}`;
+    const saved = localStorage.getItem(key);
+    if (saved) {
+      const { status, data } = await request(saved, { method: 'GET' });
+      if (status === 200) return { key, upload: data };
+      localStorage.removeItem(key);
+    }
+    const body = new FormData();
+    body.append('filename', file.name);
+    body.append('size', file.size);
+    body.append('sha256', digest);
+    const { status, data } = await request(input.dataset.chunkedUpload, { method: 'POST', body });
+    if (status !== 201) throw new Error(data.error || 'Upload failed.');
+    localStorage.setItem(key, data.url);
+    return { key, upload: data };
+  }
+
+  async function send(file, upload, progress) {
+    let delay = 1000;
+    while (!upload.complete) {
+      const end = Math.min(upload.offset + upload.chunk_size, file.size);
+      progress(upload.offset / file.size);
+      let result;
+      try {
+        result = await request(upload.url, {
+          method: 'PUT',
+          headers: { 'Content-Range': `bytes ${upload.offset}-${end - 1}/${file.size}`, 'Content-Type': 'application/octet-stream' },
+          body: file.slice(upload.offset, end),
+        });
+      } catch (e) {
+        // offline or dropped: wait, then ask where the upload stands
+        await sleep(delay);
+        delay = Math.min(delay * 2, 30000);
+        result = await request(upload.url, { method: 'GET' }).catch(() => ({ status: 0, data: {} }));
+        if (result.status === 200) upload = result.data;
+        continue;
+      }
+      delay = 1000;
+      if (result.status === 200 || result.status === 409 || result.status === 422) {
+        upload = { ...upload, ...result.data };  // 409/422 carry the offset to go on from
+      } else {
+        throw new Error(result.data.error || 'Upload failed.');
+      }
+    }
+    progress(1);
+    return upload;
+  }
+
+  function enhance(input) {
+    const form = input.form;
+    const target = document.getElementById(input.dataset.uploadTarget);
+    const status = document.createElement('p');
+    status.className = 'mt-2 text-xs text-gray-500 dark:text-gray-400';
+    input.insertAdjacentElement('afterend', status);
+    let busy = false;
+
+    input.addEventListener('change', async function() {
+      const file = input.files[0];
+      if (input.dataset.name) input.name = input.dataset.name;
+      if (target) target.value = '';
+      if (!file) return;
+      if (file.size > parseInt(input.dataset.maxSize, 10)) {
+        status.textContent = `This file is larger than ${Math.floor(input.dataset.maxSize / 1048576)} MB.`;
+        return;
+      }
+      busy = true;
+      try {
+        status.textContent = 'Preparing upload…';
+        const digest = await sha256(file);
+        const { key, upload } = await start(input, file, digest);
+        const done = await send(file, upload, share => {
+          status.textContent = `Uploading… ${Math.round(share * 100)}%`;
+        });
+        localStorage.removeItem(key);
+        target.value = done.id;
+        input.dataset.name = input.name;
+        input.removeAttribute('name');
+        status.textContent = 'Uploaded.';
+      } catch (e) {
+        status.textContent = `${e.message} The file will be sent with the form instead.`;
+      } finally {
+        busy = false;
+      }
+    });
+
+    if (form) {
+      form.addEventListener('submit', function(e) {
+        if (busy) {
+          e.preventDefault();
+          status.textContent = 'Please wait until the upload has finished.';
+        }
+      });
+    }
+  }
+
+  if (window.fetch) {
+    document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(enhance);
+  }
+})();
@@ -0,0 +1,112 @@
+// Comments on the post detail page without full page reloads.
+//
+// * #comment-form is submitted with fetch(); the server answers with the
+//   rendered comment, which we append to #comment-list.
+// * Every POLL_MS we ask for comments newer than the last one we have
+//   (?after=<id>), so other people's comments show up on their own.
+// * "Load earlier comments" fetches the previous page (?before=<cursor>)
+//   and prepends it.
+// Without JavaScript the form posts normally and the link is a plain link.
+(function() {
+  const POLL_MS = 15000;
+
+  const list = document.getElementById('comment-list');
+  if (!list) return;
+
+  const form = document.getElementById('comment-form');
+  const earlier = document.getElementById('load-earlier-comments');
+  const countEl = document.getElementById('comment-count');
+  const csrfMeta = document.querySelector('meta[name="csrf-token"]');
+
+  function fragment(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    return template.content;
+  }
+
+  function append(html) {
+    const placeholder = document.getElementById('no-comments');
+    if (placeholder && html.trim()) placeholder.remove();
+    // skip comments we already have (our own, posted while a poll was in flight)
+    let added = 0;
+    fragment(html).querySelectorAll('[data-comment-id]').forEach(node => {
+      if (!list.querySelector(`[data-comment-id="${node.dataset.commentId}"]`)) {
+        list.appendChild(node);
+        added += 1;
+      }
+    });
+    return added;
+  }
+
+  function remember(lastId) {
+    if (lastId && Number(lastId) > Number(list.dataset.lastId || 0)) list.dataset.lastId = lastId;
+  }
+
+  function getJSON(url) {
+    return fetch(url, { headers: { 'Accept': 'application/json' } }).then(response => {
+      if (!response.ok) throw new Error(response.status);
+      return response.json();
+    });
+  }
+
+  function poll() {
+    if (document.hidden) return;
+    getJSON(`${list.dataset.url}?after=${list.dataset.lastId || 0}`)
+      .then(data => {
+        const added = append(data.html);
+        remember(data.last_comment_id);
+        if (countEl && added) countEl.textContent = Number(countEl.textContent) + added;
+      })
+      .catch(() => {});
+  }
+
+  if (form) {
+    form.addEventListener('submit', function(e) {
+      e.preventDefault();
+      const button = form.querySelector('button[type="submit"]');
+      if (button) button.disabled = true;
+
+      fetch(window.location.pathname, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: {
+          'Accept': 'application/json',
+          'X-CSRFToken': csrfMeta ? csrfMeta.content : '',
+        },
+      })
+        .then(response => {
+          const type = response.headers.get('Content-Type') || '';
+          if (!type.includes('application/json')) throw new Error('not json');
+          return response.json().then(data => ({ ok: response.ok, data }));
+        })
+        .then(({ ok, data }) => {
+          if (!ok) return;  // validation errors: keep the text so the user can fix it
+          append(data.html);
+          remember(data.comment_id);
+          if (countEl) countEl.textContent = data.comment_count;
+          form.reset();
+        })
+        .catch(() => form.submit())
+        .finally(() => { if (button) button.disabled = false; });
+    });
+  }
+
+  if (earlier) {
+    earlier.addEventListener('click', function(e) {
+      e.preventDefault();
+      getJSON(`${list.dataset.url}?before=${earlier.dataset.cursor}`)
+        .then(data => {
+          list.insertBefore(fragment(data.html), list.firstChild);
+          if (data.earlier_cursor) {
+            earlier.dataset.cursor = data.earlier_cursor;
+            earlier.href = `?before=${data.earlier_cursor}`;
+          } else {
+            earlier.remove();
+          }
+        })
+        .catch(() => { window.location.href = earlier.href; });
+    });
+  }
+
+  setInterval(poll, POLL_MS);
+})();
@@ -0,0 +1,81 @@
+// Like / bookmark toggles without a full page reload.
+//
+// Any <a data-post-toggle="like|bookmark"> keeps working as a normal link.
+// With JavaScript we flip the icon straight away (optimistic UI), POST to
+// the same URL asking for JSON, then settle on the state and count the
+// server sends back. A signed-out user (401, or redirected to the login
+// page) is sent there; on any other failure the button goes back to how it
+// was and says so. The link is never followed as a fallback: the server may
+// already have applied the toggle, and following it would toggle again.
+(function() {
+  const csrfMeta = document.querySelector('meta[name="csrf-token"]');
+
+  function setState(link, active, count) {
+    const icon = link.querySelector('svg[data-active-class]');
+    if (icon) {
+      icon.dataset.activeClass.split(' ').forEach(cls => icon.classList.toggle(cls, active));
+    }
+    const counter = link.querySelector('[data-count]');
+    if (counter && count !== undefined) counter.textContent = count;
+  }
+
+  function showError(link) {
+    const note = document.createElement('span');
+    note.setAttribute('role', 'alert');
+    note.className = 'ml-2 text-xs text-red-500';
+    note.textContent = 'Could not update, please try again.';
+    link.insertAdjacentElement('afterend', note);
+    setTimeout(() => note.remove(), 4000);
+  }
+
+  function isActive(link) {
+    const icon = link.querySelector('svg[data-active-class]');
+    return !!icon && icon.classList.contains(icon.dataset.activeClass.split(' ')[0]);
+  }
+
+  document.addEventListener('click', function(e) {
+    const link = e.target.closest('a[data-post-toggle]');
+    if (!link || link.dataset.busy) return;
+    e.preventDefault();
+
+    const kind = link.dataset.postToggle;
+    const wasActive = isActive(link);
+    const counter = link.querySelector('[data-count]');
+    const oldCount = counter ? counter.textContent : undefined;
+
+    // optimistic update
+    setState(link, !wasActive, counter ? Math.max(0, parseInt(oldCount, 10) + (wasActive ? -1 : 1)) : undefined);
+    link.dataset.busy = '1';
+
+    fetch(link.href, {
+      method: 'POST',
+      headers: {
+        'Accept': 'application/json',
+        'X-CSRFToken': csrfMeta ? csrfMeta.content : '',
+      },
+    })
+      .then(response => {
+        if (response.status === 401) {
+          window.location.href = link.href;  // login_required sends it on to the login page
+          return null;
+        }
+        if (response.redirected) {
+          window.location.href = response.url;  // the login page
+          return null;
+        }
+        const type = response.headers.get('Content-Type') || '';
+        if (!response.ok || !type.includes('application/json')) throw new Error('toggle failed');
+        return response.json();
+      })
+      .then(data => {
+        if (!data) return;
+        const active = kind === 'like' ? data.liked : data.bookmarked;
+        setState(link, active, data[kind + '_count']);
+      })
+      .catch(() => {
+        setState(link, wasActive, oldCount);
+        showError(link);
+      })
+      .finally(() => { delete link.dataset.busy; });
+  });
+})();